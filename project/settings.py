@@ -135,6 +135,82 @@ STATIC_URL = 'static/'
 
 LOGIN_URL = '/auth_management/login/'
 
+# Backend de pub/sub para los canales en tiempo real (ASGI).
+# El backend en memoria solo sirve con un único proceso de uvicorn.
+PUBSUB_BACKEND = 'support_chat.pubsub.InMemoryPubSubBackend'
+
+# Agrupa en un único INSERT los mensajes de chat de solicitudes concurrentes (útil bajo ráfagas).
+SUPPORT_CHAT_MICRO_BATCH_WRITES = False
+# Segundos máximos que una solicitud espera a que el escritor por micro-lotes confirme sus mensajes.
+SUPPORT_CHAT_MICRO_BATCH_TIMEOUT_SECONDS = 5
+
+# Horario de agentes (hora de inicio, hora de término) usado mientras no exista un AgentSchedule activo.
+SUPPORT_CHAT_DEFAULT_BUSINESS_HOURS = (9, 18)
+# Cada cuántos segundos se recompila el horario de agentes cacheado, para ver cambios hechos en otros procesos.
+SUPPORT_CHAT_SCHEDULE_REFRESH_SECONDS = 300
+# Igual que el anterior, para el índice de intenciones del bot (BotIntent).
+SUPPORT_CHAT_BOT_RULES_REFRESH_SECONDS = 300
+# Cantidad de mensajes normalizados cuya respuesta del bot se mantiene en caché (LRU).
+SUPPORT_CHAT_BOT_RESPONSE_CACHE_SIZE = 4096
+# Días sin mensajes tras los cuales `manage.py archive_chat_sessions` archiva una sesión.
+SUPPORT_CHAT_ARCHIVE_RETENTION_DAYS = 30
+# Segundos que una posición en la caché de seguimiento se sirve sin volver a la base de datos.
+TRACKING_POSITION_CACHE_TTL_SECONDS = 30
+# Máximo de pedidos en la caché de última posición (se desalojan los menos consultados).
+TRACKING_POSITION_CACHE_MAX_ENTRIES = 10000
+# Filtro de ingesta de ubicaciones (0 desactiva cada criterio): se descartan los pings a menos
+# de N metros o N segundos del último escrito, salvo que pasen N segundos sin escribir (heartbeat).
+TRACKING_INGEST_MIN_DISTANCE_METERS = 10
+TRACKING_INGEST_MIN_INTERVAL_SECONDS = 2
+TRACKING_INGEST_MAX_STALENESS_SECONDS = 60
+# Segundos tras los que el índice espacial de repartidores se reconstruye desde la base de datos.
+TRACKING_DRIVER_INDEX_REFRESH_SECONDS = 300
+# Radio máximo (metros) de la búsqueda de repartidores cercanos.
+TRACKING_NEAREST_DRIVERS_MAX_DISTANCE_METERS = 20000
+# ETA: pings usados para la velocidad promedio, velocidad supuesta sin pings suficientes
+# y velocidad mínima considerada (m/s).
+TRACKING_ETA_SPEED_WINDOW = 10
+TRACKING_ETA_DEFAULT_SPEED_MPS = 6.0
+TRACKING_ETA_MIN_SPEED_MPS = 1.0
+# Geocodificador de direcciones de entrega y archivo del backend local (JSON {"dirección": [lat, lon]}).
+TRACKING_GEOCODER_BACKEND = 'tracking.geocoding.FileGeocoderBackend'
+TRACKING_GEOCODER_FILE = BASE_DIR / 'src' / 'tracking' / 'data' / 'geocoder_addresses.json'
+
+# Pagos: si es True, PaymentInitiateView solo registra la transacción PENDING y la llamada a la
+# pasarela se hace en segundo plano, en un pool de PAYMENTS_WORKER_THREADS hilos.
+PAYMENTS_ASYNC_PROCESSING = False
+PAYMENTS_WORKER_THREADS = 4
+# Pagos: segundos tras los cuales `manage.py expire_pending_payments` marca como FAILED una
+# transacción que sigue PENDING sin haberse enviado a la pasarela (ej. su trabajo se perdió al
+# reiniciar el proceso). Las ya enviadas esperan el callback de la pasarela.
+PAYMENTS_PENDING_TIMEOUT_SECONDS = 3600
+# Pagos: segundos que se conserva la respuesta asociada a una cabecera Idempotency-Key y
+# cantidad de respuestas que se mantienen además en memoria del proceso.
+PAYMENTS_IDEMPOTENCY_TTL_SECONDS = 86400
+PAYMENTS_IDEMPOTENCY_CACHE_SIZE = 10000
+# Segundos tras los cuales una solicitud con Idempotency-Key aún en curso se da por perdida y
+# un reintento puede tomar su clave; debe superar la duración máxima de una solicitud.
+PAYMENTS_IDEMPOTENCY_LEASE_SECONDS = 120
+# Pagos: pasarela usada por las vistas. 'payments.gateway_client.HttpPaymentGatewayService' la
+# llama por HTTP (para desarrollo: `manage.py run_fake_gateway`, que escucha en PAYMENTS_GATEWAY_URL).
+PAYMENTS_GATEWAY_BACKEND = 'payments.services.MockPaymentGatewayService'
+PAYMENTS_GATEWAY_URL = 'http://127.0.0.1:8090'
+PAYMENTS_GATEWAY_API_KEY = ''
+# Cliente HTTP de la pasarela: timeouts por llamada (segundos), conexiones del pool (keep-alive),
+# reintentos con backoff exponencial y jitter (o tras el Retry-After de la pasarela, con tope), y
+# circuit breaker (fallos seguidos que lo abren y segundos que permanece abierto).
+PAYMENTS_GATEWAY_CONNECT_TIMEOUT_SECONDS = 2
+PAYMENTS_GATEWAY_READ_TIMEOUT_SECONDS = 5
+PAYMENTS_GATEWAY_MAX_CONNECTIONS = 20
+PAYMENTS_GATEWAY_KEEPALIVE_SECONDS = 30
+PAYMENTS_GATEWAY_MAX_RETRIES = 2
+PAYMENTS_GATEWAY_RETRY_BACKOFF_SECONDS = 0.2
+PAYMENTS_GATEWAY_RETRY_AFTER_MAX_SECONDS = 2
+PAYMENTS_GATEWAY_BREAKER_FAILURE_THRESHOLD = 5
+PAYMENTS_GATEWAY_BREAKER_RESET_SECONDS = 30
+# Pagos: máximo de confirmaciones aceptadas por solicitud en /payments/confirm/batch/.
+PAYMENTS_CONFIRM_BATCH_MAX_ITEMS = 5000
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,167 @@
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from payments.services import MockPaymentGatewayService
+
+logger = logging.getLogger("payments")
+
+
+class _FakeGatewayHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog (5) drops connections when a client pool opens many at once.
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # A client that timed out closes the connection before a hung request is answered.
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            logger.debug("Fake gateway: client %s went away.", client_address)
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeGatewayServer:
+    """
+    Local HTTP server that speaks the API of HttpPaymentGatewayService, for development and tests.
+    Answers like MockPaymentGatewayService (cards starting with 4111 are declined) and can inject
+    latency (`latency` plus up to `jitter` seconds), 503 errors (`failure_rate`), 429 answers with
+    a `retry_after` seconds Retry-After header (`throttle_rate`) and requests that hang for
+    `hang_seconds` (`hang_rate`). Repeated Idempotency-Key values get the first answer.
+
+    Usage: `with FakeGatewayServer(failure_rate=0.2) as server: ... server.url ...`
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, hang_rate: float = 0.0, hang_seconds: float = 30.0,
+                 throttle_rate: float = 0.0, retry_after: float = 1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.gateway = MockPaymentGatewayService()
+        self.stats = {"requests": 0, "failures_injected": 0, "hangs_injected": 0,
+                      "throttles_injected": 0, "replayed": 0}
+        self._lock = threading.Lock()
+        self._payments = {}
+        self._responses_by_key = {}
+        self._thread = None
+        self._server = _FakeGatewayHTTPServer((host, port), self._handler_class())
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGatewayServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-gateway", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, as a real gateway would.
+            disable_nagle_algorithm = True  # Headers and body are written separately.
+
+            def do_GET(self):
+                server._handle(self)
+
+            def do_POST(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                logger.debug("Fake gateway: " + format, *args)
+
+        return Handler
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        with self._lock:
+            self.stats["requests"] += 1
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if self.hang_rate and random.random() < self.hang_rate:
+            with self._lock:
+                self.stats["hangs_injected"] += 1
+            delay = self.hang_seconds
+        if delay:
+            time.sleep(delay)
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            with self._lock:
+                self.stats["throttles_injected"] += 1
+            return self._send(request, 429, {"status": False, "message": "Injected rate limit."},
+                              headers={"Retry-After": str(self.retry_after)})
+        if self.failure_rate and random.random() < self.failure_rate:
+            with self._lock:
+                self.stats["failures_injected"] += 1
+            return self._send(request, 503, {"status": False, "message": "Injected gateway failure."})
+
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return self._send(request, 400, {"status": False, "message": "Invalid JSON."})
+        status, data = self._dispatch(request.command, request.path, payload, request.headers.get("Idempotency-Key"))
+        self._send(request, status, data)
+
+    def _dispatch(self, method: str, path: str, payload: dict, idempotency_key: str | None) -> tuple[int, dict]:
+        if method == "POST" and path == "/v1/payments":
+            with self._lock:
+                if idempotency_key in self._responses_by_key:
+                    self.stats["replayed"] += 1
+                    return self._responses_by_key[idempotency_key]
+            data = self.gateway.process_payment(
+                payload.get("transaction_id", ""), payload.get("amount"), payload.get("currency"),
+                payload.get("card") or {}, bool(payload.get("tokenize")),
+            )
+            result = (200 if data["status"] else 402, data)
+            with self._lock:
+                self._payments[data["gateway_reference_id"]] = data
+                if idempotency_key:
+                    self._responses_by_key[idempotency_key] = result
+            return result
+        if method == "POST" and path == "/v1/tokens":
+            return 200, {"status": True, **self.gateway.tokenize_card(payload.get("card") or {})}
+        if method == "GET" and path.startswith("/v1/payments/"):
+            reference = path.rsplit("/", 1)[-1]
+            with self._lock:
+                known = reference in self._payments
+            if not known:
+                return 404, {"status": False, "message": "Unknown payment reference."}
+            return 200, self.gateway.confirm_payment(reference)
+        return 404, {"status": False, "message": "Not found."}
+
+    @staticmethod
+    def _send(request: BaseHTTPRequestHandler, status: int, data: dict, headers: dict | None = None) -> None:
+        body = json.dumps(data).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(body)
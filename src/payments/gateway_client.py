@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from email.utils import parsedate_to_datetime
+
+import httpx
+from django.conf import settings
+
+from payments.services import GatewayUnavailableError, PaymentGatewayService
+
+logger = logging.getLogger("payments")
+
+# Statuses worth retrying: the gateway is overloaded or briefly unavailable.
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+# Transport errors raised before the request could reach the gateway.
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker. After `failure_threshold` consecutive failures it opens and
+    rejects calls for `reset_timeout` seconds; then it lets a single trial call through
+    (half-open) and closes again if it succeeds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True
+            # Open, or half-open with the trial call still in flight.
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Payment gateway circuit opened after %s failures.", self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class HttpPaymentGatewayService(PaymentGatewayService):
+    """
+    Gateway reached over HTTP with pooled keep-alive connections (httpx).
+    Every call has connect/read timeouts, retries transient failures with exponential backoff
+    and full jitter (or after the Retry-After the gateway asks for), and goes through a circuit
+    breaker, which rate limiting (HTTP 429) does not trip, so that a slow or failing gateway
+    fails fast instead of tying up request and worker threads.
+    Payment calls send the transaction id as Idempotency-Key, so retries cannot charge twice.
+    The a* methods are native async and share the breaker with the sync ones.
+
+    API: POST /v1/payments, POST /v1/tokens and GET /v1/payments/<reference>, all returning
+    the same dict shape as MockPaymentGatewayService.
+    """
+
+    def __init__(self, base_url: str | None = None, api_key: str | None = None, transport=None, async_transport=None):
+        self.base_url = (base_url or settings.PAYMENTS_GATEWAY_URL).rstrip("/")
+        self.api_key = settings.PAYMENTS_GATEWAY_API_KEY if api_key is None else api_key
+        self.max_retries = settings.PAYMENTS_GATEWAY_MAX_RETRIES
+        self.backoff_seconds = settings.PAYMENTS_GATEWAY_RETRY_BACKOFF_SECONDS
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.PAYMENTS_GATEWAY_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.PAYMENTS_GATEWAY_BREAKER_RESET_SECONDS,
+        )
+        self._transport = transport
+        self._async_transport = async_transport
+        self._client = None
+        self._client_lock = threading.Lock()
+        # An httpx.AsyncClient is bound to the event loop it was first used in.
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def process_payment(self, transaction_id: str, amount: Decimal, currency: str, card_details: dict, save_method: bool = False) -> dict:
+        return self._request("POST", "/v1/payments", **self._payment_request(transaction_id, amount, currency, card_details, save_method))
+
+    def tokenize_card(self, card_details: dict) -> dict:
+        return self._request("POST", "/v1/tokens", json={"card": card_details})
+
+    def confirm_payment(self, gateway_reference_id: str) -> dict:
+        return self._request("GET", f"/v1/payments/{gateway_reference_id}")
+
+    async def aprocess_payment(self, transaction_id: str, amount: Decimal, currency: str, card_details: dict, save_method: bool = False) -> dict:
+        return await self._arequest("POST", "/v1/payments", **self._payment_request(transaction_id, amount, currency, card_details, save_method))
+
+    async def atokenize_card(self, card_details: dict) -> dict:
+        return await self._arequest("POST", "/v1/tokens", json={"card": card_details})
+
+    async def aconfirm_payment(self, gateway_reference_id: str) -> dict:
+        return await self._arequest("GET", f"/v1/payments/{gateway_reference_id}")
+
+    def close(self) -> None:
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    @staticmethod
+    def _payment_request(transaction_id: str, amount: Decimal, currency: str, card_details: dict, save_method: bool) -> dict:
+        return {
+            "json": {
+                "transaction_id": transaction_id,
+                "amount": str(amount),
+                "currency": currency,
+                "card": card_details,
+                "tokenize": save_method,
+            },
+            "headers": {"Idempotency-Key": transaction_id},
+        }
+
+    def _client_options(self) -> dict:
+        headers = {"Accept": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return {
+            "base_url": self.base_url,
+            "headers": headers,
+            "timeout": httpx.Timeout(
+                settings.PAYMENTS_GATEWAY_READ_TIMEOUT_SECONDS,
+                connect=settings.PAYMENTS_GATEWAY_CONNECT_TIMEOUT_SECONDS,
+            ),
+            "limits": httpx.Limits(
+                max_connections=settings.PAYMENTS_GATEWAY_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PAYMENTS_GATEWAY_MAX_CONNECTIONS,
+                keepalive_expiry=settings.PAYMENTS_GATEWAY_KEEPALIVE_SECONDS,
+            ),
+        }
+
+    def _get_client(self) -> httpx.Client:
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(transport=self._transport, **self._client_options())
+            return self._client
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(transport=self._async_transport, **self._client_options())
+            self._async_clients[loop] = client
+        return client
+
+    def _retry_delay(self, attempt: int) -> float:
+        # Full jitter: spreads the retries of concurrent callers instead of synchronizing them.
+        return random.uniform(0, self.backoff_seconds * (2 ** attempt))
+
+    def _request(self, method: str, path: str, **kwargs) -> dict:
+        client = self._get_client()
+        sent = False
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker(path, sent)
+            try:
+                response = client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                response, error = None, e
+                sent = sent or not isinstance(e, NOT_SENT_ERRORS)
+            else:
+                sent = sent or response.status_code != 429
+                if response.status_code not in RETRYABLE_STATUSES and response.status_code < 500:
+                    self.breaker.record_success()
+                    return self._parse_response(response)
+                error = f"HTTP {response.status_code}"
+            delay = self._record_failed_attempt(method, path, attempt, response, error)
+            if attempt < self.max_retries:
+                time.sleep(delay)
+        raise GatewayUnavailableError(f"La pasarela de pago no respondio: {error}", request_sent=sent)
+
+    async def _arequest(self, method: str, path: str, **kwargs) -> dict:
+        client = self._get_async_client()
+        sent = False
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker(path, sent)
+            try:
+                response = await client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                response, error = None, e
+                sent = sent or not isinstance(e, NOT_SENT_ERRORS)
+            else:
+                sent = sent or response.status_code != 429
+                if response.status_code not in RETRYABLE_STATUSES and response.status_code < 500:
+                    self.breaker.record_success()
+                    return self._parse_response(response)
+                error = f"HTTP {response.status_code}"
+            delay = self._record_failed_attempt(method, path, attempt, response, error)
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
+        raise GatewayUnavailableError(f"La pasarela de pago no respondio: {error}", request_sent=sent)
+
+    def _record_failed_attempt(self, method: str, path: str, attempt: int, response: httpx.Response | None, error) -> float:
+        """
+        Feeds a failed attempt to the breaker and returns the wait before the next one: the
+        response's Retry-After (capped at PAYMENTS_GATEWAY_RETRY_AFTER_MAX_SECONDS) or the backoff.
+        """
+        logger.warning("Gateway %s %s failed (attempt %s): %s", method, path, attempt + 1, error)
+        if response is not None and response.status_code == 429:
+            # Rate limited: the gateway is up, so this is not an outage for the breaker.
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        retry_after = self._retry_after(response) if response is not None else None
+        if retry_after is None:
+            return self._retry_delay(attempt)
+        return min(retry_after, settings.PAYMENTS_GATEWAY_RETRY_AFTER_MAX_SECONDS)
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float | None:
+        """
+        Seconds asked for by a Retry-After header (delta-seconds or HTTP-date), or None.
+        """
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=dt_timezone.utc)
+        return max(0.0, (retry_at - datetime.now(dt_timezone.utc)).total_seconds())
+
+    def _check_breaker(self, path: str, sent: bool) -> None:
+        if not self.breaker.allow_request():
+            logger.warning("Gateway circuit open; rejecting call to %s.", path)
+            raise GatewayUnavailableError("La pasarela de pago no esta disponible temporalmente.", request_sent=sent)
+
+    @staticmethod
+    def _parse_response(response: httpx.Response) -> dict:
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        if response.is_error:
+            # Declines and validation errors: a final answer from the gateway, not an outage.
+            data.setdefault("message", f"Gateway rejected the request (HTTP {response.status_code}).")
+            data["status"] = False
+        return data
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from payments.models import IdempotencyRecord
+
+logger = logging.getLogger("payments")
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 200
+
+
+def _request_hash(data) -> str:
+    canonical = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _caller_digest(caller: str) -> str:
+    # Fixed length, so that scope, caller and key always fit in IdempotencyRecord.key.
+    return hashlib.sha256(caller.encode("utf-8")).hexdigest()[:24]
+
+
+class IdempotencyStore:
+    """
+    Stores the response of requests sent with an Idempotency-Key header so that retries
+    replay it instead of running the request again.
+    Completed responses are kept in an in-process LRU (PAYMENTS_IDEMPOTENCY_CACHE_SIZE) in
+    front of the IdempotencyRecord table, whose unique key also serializes concurrent
+    duplicates. Keys are scoped by endpoint and caller, so two callers never share one, and
+    expire after PAYMENTS_IDEMPOTENCY_TTL_SECONDS.
+    A request still in progress after PAYMENTS_IDEMPOTENCY_LEASE_SECONDS is assumed dead (e.g.
+    the process restarted) and a retry with the same body takes its key over; the lease must
+    be longer than the slowest request, or a slow one may run twice.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    def handle(self, request, scope: str, handler: Callable[[], Response], caller: str = "") -> Response:
+        """
+        Runs handler() at most once per (scope, caller, Idempotency-Key). Without the header
+        the request is processed normally.
+        :param caller: Who sent the request (e.g. user or gateway id).
+        """
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return handler()
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"error": f"La cabecera {IDEMPOTENCY_HEADER} admite hasta {MAX_KEY_LENGTH} caracteres."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        record_key = f"{scope}:{_caller_digest(caller)}:{key}"
+        request_hash = _request_hash(request.data)
+        record = self._get_cached(record_key)
+        if record is None:
+            record, created = self._begin(record_key, request_hash)
+            if created:
+                return self._run(record, handler)
+        return self._replay(record, request_hash)
+
+    def purge_expired(self) -> int:
+        deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+    def _begin(self, record_key: str, request_hash: str) -> tuple[IdempotencyRecord, bool]:
+        expires_at = timezone.now() + timedelta(seconds=settings.PAYMENTS_IDEMPOTENCY_TTL_SECONDS)
+        try:
+            with db_transaction.atomic():
+                return IdempotencyRecord.objects.create(
+                    key=record_key, request_hash=request_hash, expires_at=expires_at,
+                ), True
+        except IntegrityError:
+            pass
+
+        record = IdempotencyRecord.objects.get(key=record_key)
+        now = timezone.now()
+        expired = record.expires_at <= now
+        # In progress past its lease: the request that held it died, so this retry takes it over.
+        abandoned = (
+            not record.is_complete()
+            and record.request_hash == request_hash
+            and record.created_at <= now - timedelta(seconds=settings.PAYMENTS_IDEMPOTENCY_LEASE_SECONDS)
+        )
+        if expired or abandoned:
+            if abandoned:
+                logger.warning("Taking over idempotency key %s, in progress since %s.", record.key, record.created_at)
+            updated = IdempotencyRecord.objects.filter(
+                pk=record.pk, created_at=record.created_at, expires_at=record.expires_at,
+            ).update(
+                request_hash=request_hash, response_status=None, response_body=None, created_at=now, expires_at=expires_at,
+            )
+            if updated:
+                record.request_hash, record.response_status, record.response_body = request_hash, None, None
+                record.created_at, record.expires_at = now, expires_at
+                return record, True
+            record.refresh_from_db()
+        if record.is_complete():
+            self._set_cached(record)
+        return record, False
+
+    def _run(self, record: IdempotencyRecord, handler: Callable[[], Response]) -> Response:
+        try:
+            response = handler()
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            # Server errors are not stored: the client may retry with the same key.
+            record.delete()
+            return response
+
+        record.response_status = response.status_code
+        record.response_body = json.loads(json.dumps(response.data, cls=DjangoJSONEncoder))
+        record.save(update_fields=["response_status", "response_body"])
+        self._set_cached(record)
+        return response
+
+    def _replay(self, record: IdempotencyRecord, request_hash: str) -> Response:
+        if record.request_hash != request_hash:
+            return Response({"error": f"La cabecera {IDEMPOTENCY_HEADER} ya se uso con otra solicitud."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if not record.is_complete():
+            return Response({"error": "Una solicitud con la misma clave de idempotencia aun se esta procesando."},
+                            status=status.HTTP_409_CONFLICT)
+        logger.info("Replaying stored response for idempotency key %s.", record.key)
+        return Response(record.response_body, status=record.response_status, headers={"Idempotent-Replayed": "true"})
+
+    def _get_cached(self, record_key: str) -> IdempotencyRecord | None:
+        with self._lock:
+            record = self._cache.get(record_key)
+            if record is None:
+                return None
+            if record.expires_at <= timezone.now():
+                del self._cache[record_key]
+                return None
+            self._cache.move_to_end(record_key)
+            return record
+
+    def _set_cached(self, record: IdempotencyRecord) -> None:
+        with self._lock:
+            self._cache[record.key] = record
+            self._cache.move_to_end(record.key)
+            while len(self._cache) > settings.PAYMENTS_IDEMPOTENCY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+
+idempotency_store = IdempotencyStore()
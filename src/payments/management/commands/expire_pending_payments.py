@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.services import PaymentProcessor, get_gateway_service
+
+
+class Command(BaseCommand):
+    help = ("Marks as FAILED the payments still PENDING after PAYMENTS_PENDING_TIMEOUT_SECONDS that were never sent "
+            "to the gateway (e.g. lost on a restart).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=float, default=None,
+                            help="Age in seconds; defaults to PAYMENTS_PENDING_TIMEOUT_SECONDS.")
+        parser.add_argument("--interval", type=float, default=None,
+                            help="Repeat every N seconds instead of running once.")
+
+    def handle(self, *args, **options):
+        processor = PaymentProcessor(gateway_service=get_gateway_service())
+        while True:
+            expired = processor.expire_pending_payments(options["older_than"])
+            self.stdout.write(self.style.SUCCESS(f"Stale pending payments marked as FAILED: {expired}."))
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from payments.idempotency import idempotency_store
+
+
+class Command(BaseCommand):
+    help = "Deletes expired Idempotency-Key records."
+
+    def handle(self, *args, **options):
+        deleted = idempotency_store.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Expired idempotency keys deleted: {deleted}."))
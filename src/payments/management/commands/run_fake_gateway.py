@@ -0,0 +1,43 @@
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments.fake_gateway import FakeGatewayServer
+
+
+class Command(BaseCommand):
+    help = "Runs a local fake payment gateway for HttpPaymentGatewayService, with optional latency and failure injection."
+
+    def add_arguments(self, parser):
+        default_port = urlsplit(settings.PAYMENTS_GATEWAY_URL).port or 8090
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=default_port)
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response.")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra random seconds per response.")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503.")
+        parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction of requests that hang for --hang-seconds.")
+        parser.add_argument("--hang-seconds", type=float, default=30.0)
+        parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429.")
+        parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with HTTP 429.")
+
+    def handle(self, *args, **options):
+        server = FakeGatewayServer(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"],
+            jitter=options["jitter"],
+            failure_rate=options["failure_rate"],
+            hang_rate=options["hang_rate"],
+            hang_seconds=options["hang_seconds"],
+            throttle_rate=options["throttle_rate"],
+            retry_after=options["retry_after"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Fake gateway listening on {server.url}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.stdout.write(f"Stats: {server.stats}")
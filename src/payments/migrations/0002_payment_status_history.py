@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentStatusHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, help_text='Estado anterior (vacio al crear la transaccion)', max_length=10)),
+                ('to_status', models.CharField(choices=[('PENDING', 'Pendiente'), ('COMPLETED', 'Completado'), ('FAILED', 'Fallido'), ('REFUNDED', 'Reembolsado'), ('CANCELLED', 'Cancelado')], help_text='Estado nuevo', max_length=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True, help_text='Fecha y hora del cambio de estado')),
+                ('transaction', models.ForeignKey(help_text='Transaccion cuyo estado cambio', on_delete=django.db.models.deletion.CASCADE, related_name='status_history', to='payments.paymenttransaction')),
+            ],
+            options={
+                'verbose_name': 'Historial de Estado de Pago',
+                'verbose_name_plural': 'Historial de Estados de Pago',
+                'ordering': ['changed_at', 'id'],
+                'indexes': [models.Index(fields=['transaction', 'changed_at'], name='payment_status_hist_tx_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_payment_status_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Endpoint y valor de la cabecera Idempotency-Key', max_length=255, unique=True)),
+                ('request_hash', models.CharField(help_text='SHA-256 del cuerpo de la solicitud original', max_length=64)),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, help_text='Codigo HTTP de la respuesta almacenada', null=True)),
+                ('response_body', models.JSONField(blank=True, help_text='Cuerpo de la respuesta almacenada', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Fecha y hora de la primera solicitud')),
+                ('expires_at', models.DateTimeField(db_index=True, help_text='Fecha y hora desde la que la clave puede reutilizarse')),
+            ],
+            options={
+                'verbose_name': 'Clave de Idempotencia',
+                'verbose_name_plural': 'Claves de Idempotencia',
+            },
+        ),
+    ]
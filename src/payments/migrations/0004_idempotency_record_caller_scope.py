@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_idempotency_record'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='idempotencyrecord',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, help_text='Fecha y hora en que la solicitud en curso tomo la clave'),
+        ),
+        migrations.AlterField(
+            model_name='idempotencyrecord',
+            name='key',
+            field=models.CharField(help_text='Endpoint, llamador y valor de la cabecera Idempotency-Key', max_length=255, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_idempotency_record_caller_scope'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymenttransaction',
+            name='submitted_at',
+            field=models.DateTimeField(blank=True, help_text='Fecha y hora en que el cobro se envio a la pasarela (vacio si nunca se envio)', null=True),
+        ),
+    ]
@@ -36,6 +36,10 @@ class PaymentTransaction(models.Model):
         REFUNDED = "REFUNDED", "Reembolsado"
         CANCELLED = "CANCELLED", "Cancelado"
 
+    # Once final, a payment only moves on from COMPLETED to REFUNDED.
+    FINAL_STATUSES = frozenset({PaymentStatus.COMPLETED, PaymentStatus.FAILED, PaymentStatus.REFUNDED, PaymentStatus.CANCELLED})
+    ALLOWED_FINAL_TRANSITIONS = frozenset({(PaymentStatus.COMPLETED, PaymentStatus.REFUNDED)})
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user_id = models.CharField(max_length=255, db_index=True, help_text="ID del usuario que realiza la compra")
     amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Monto total de la transaccion")
@@ -48,6 +52,7 @@ class PaymentTransaction(models.Model):
     )
     gateway_id = models.CharField(max_length=255, blank=True, null=True, help_text="ID de referencia de la pasarela de pago")
     gateway_response = models.JSONField(blank=True, null=True, help_text="Respuesta completa de la pasarela de pago")
+    submitted_at = models.DateTimeField(blank=True, null=True, help_text="Fecha y hora en que el cobro se envio a la pasarela (vacio si nunca se envio)")
     created_at = models.DateTimeField(auto_now_add=True, help_text="Fecha y hora de creacion de la transaccion")
     updated_at = models.DateTimeField(auto_now=True, help_text="Fecha y hora de la ultima actualizacion de la transaccion")
 
@@ -61,18 +66,116 @@ class PaymentTransaction(models.Model):
     def __str__(self):
         return f"Transaccion {self.id} - Usuario: {self.user_id} - Monto: {self.amount} {self.currency} - Estado: {self.status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Snapshot of the persisted status, used by save() to detect transitions without a read.
+        instance._persisted_status = instance.__dict__.get("status")
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or "status" in fields:
+            self._persisted_status = self.status
+
     def save(self, *args, **kwargs):
-        if self.pk and not self._state.adding and PaymentTransaction.objects.filter(pk=self.pk).exists():
-            old_instance = PaymentTransaction.objects.get(pk=self.pk)
-            if old_instance.status != self.status:
-                logger.info("Transaction %s status change: '%s' -> '%s'", self.id, old_instance.status, self.status)
+        """
+        Saves the transaction and appends a PaymentStatusHistory row when the status changed
+        since it was loaded or last saved. QuerySet.update() bypasses this tracking.
+        An existing row whose status was not snapshotted (e.g. an instance returned by
+        bulk_create) costs one extra read of the stored status.
+        """
+        adding = self._state.adding
+        previous_status = getattr(self, "_persisted_status", None)
+        update_fields = kwargs.get("update_fields")
+        status_saved = update_fields is None or "status" in update_fields
+        if status_saved and not adding and previous_status is None:
+            previous_status = type(self)._base_manager.filter(pk=self.pk).values_list("status", flat=True).first()
         super().save(*args, **kwargs)
 
+        if not status_saved:
+            return
+        if adding or previous_status != self.status:
+            if not adding:
+                logger.info("Transaction %s status change: '%s' -> '%s'", self.id, previous_status, self.status)
+            PaymentStatusHistory.objects.create(
+                transaction=self,
+                from_status="" if adding else previous_status,
+                to_status=self.status,
+            )
+        self._persisted_status = self.status
+
+    @classmethod
+    def is_allowed_transition(cls, from_status: str, to_status: str) -> bool:
+        if to_status not in cls.PaymentStatus.values:
+            return False
+        return (
+            from_status == to_status
+            or from_status not in cls.FINAL_STATUSES
+            or (from_status, to_status) in cls.ALLOWED_FINAL_TRANSITIONS
+        )
+
     @property
     def transaction_id(self) -> str:
         return str(self.id)
 
 
+class PaymentStatusHistory(models.Model):
+    """
+    Append-only log of payment status transitions.
+    """
+
+    transaction = models.ForeignKey(
+        PaymentTransaction,
+        on_delete=models.CASCADE,
+        related_name="status_history",
+        help_text="Transaccion cuyo estado cambio",
+    )
+    from_status = models.CharField(max_length=10, blank=True, help_text="Estado anterior (vacio al crear la transaccion)")
+    to_status = models.CharField(max_length=10, choices=PaymentTransaction.PaymentStatus.choices, help_text="Estado nuevo")
+    changed_at = models.DateTimeField(auto_now_add=True, help_text="Fecha y hora del cambio de estado")
+
+    class Meta:
+        verbose_name = "Historial de Estado de Pago"
+        verbose_name_plural = "Historial de Estados de Pago"
+        ordering = ["changed_at", "id"]
+        indexes = [
+            models.Index(fields=["transaction", "changed_at"], name="payment_status_hist_tx_idx"),
+        ]
+
+    def __str__(self):
+        return f"Transaccion {self.transaction_id}: '{self.from_status}' -> '{self.to_status}'"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("El historial de estados de pago es de solo insercion.")
+        super().save(*args, **kwargs)
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Stored response of a request sent with an Idempotency-Key header.
+    A row without response_status marks a request still in progress.
+    """
+
+    key = models.CharField(max_length=255, unique=True, help_text="Endpoint, llamador y valor de la cabecera Idempotency-Key")
+    request_hash = models.CharField(max_length=64, help_text="SHA-256 del cuerpo de la solicitud original")
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Codigo HTTP de la respuesta almacenada")
+    response_body = models.JSONField(null=True, blank=True, help_text="Cuerpo de la respuesta almacenada")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="Fecha y hora en que la solicitud en curso tomo la clave")
+    expires_at = models.DateTimeField(db_index=True, help_text="Fecha y hora desde la que la clave puede reutilizarse")
+
+    class Meta:
+        verbose_name = "Clave de Idempotencia"
+        verbose_name_plural = "Claves de Idempotencia"
+
+    def __str__(self):
+        return f"{self.key} -> {self.response_status}"
+
+    def is_complete(self):
+        return self.response_status is not None
+
+
 class SavedPaymentMethod(models.Model):
     """
     Stores tokenized payment methods for users (requirement F9).
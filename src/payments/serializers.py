@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from payments.models import SavedPaymentMethod
+from django.conf import settings
+from payments.models import PaymentTransaction, SavedPaymentMethod
 
 class CardDetailsSerializer(serializers.Serializer):
     """
@@ -39,11 +40,30 @@ class PaymentConfirmationSerializer(serializers.Serializer):
     """
     transaction_id = serializers.UUIDField(help_text="ID interno de la transacción de pago")
     gateway_reference_id = serializers.CharField(max_length=255, help_text="ID de referencia de la pasarela de pago")
-    status = serializers.CharField(max_length=10, help_text="Estado final de la transacción (ej. 'COMPLETED', 'FAILED')")
+    status = serializers.ChoiceField(choices=PaymentTransaction.PaymentStatus.choices, help_text="Estado final de la transacción (ej. 'COMPLETED', 'FAILED')")
     # Podría incluir un campo JSON para la respuesta completa de la pasarela si fuera necesario.
     gateway_response = serializers.JSONField(required=False, help_text="Respuesta completa de la pasarela de pago")
 
 
+class PaymentConfirmationBatchItemSerializer(PaymentConfirmationSerializer):
+    """
+    Confirmación dentro de un lote: mismos campos y validación que una confirmación individual.
+    """
+
+
+class PaymentConfirmationBatchSerializer(serializers.Serializer):
+    """
+    Serializador para un lote de confirmaciones de pago: {"confirmations": [{...}, ...]}.
+    Cada elemento se valida por separado con PaymentConfirmationBatchItemSerializer.
+    """
+    confirmations = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.PAYMENTS_CONFIRM_BATCH_MAX_ITEMS,
+        help_text="Confirmaciones a aplicar, en orden",
+    )
+
+
 class SavedPaymentMethodSerializer(serializers.ModelSerializer):
     """
     Serializador para la representación de métodos de pago guardados.
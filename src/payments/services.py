@@ -1,11 +1,18 @@
 import logging
+import threading
 import uuid
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
 from decimal import Decimal
 
-from django.db import transaction as db_transaction
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction as db_transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
 
-from payments.models import PaymentTransaction, SavedPaymentMethod
+from payments.models import PaymentStatusHistory, PaymentTransaction, SavedPaymentMethod
 
 logger = logging.getLogger("payments")
 
@@ -30,6 +37,43 @@ class PaymentGatewayService(ABC):
         """Confirm payment status with the gateway."""
         raise NotImplementedError
 
+    # Async variants. By default they run the sync call in a worker thread; gateways with a
+    # native async client (see payments.gateway_client) override them.
+
+    async def aprocess_payment(self, transaction_id: str, amount: Decimal, currency: str, card_details: dict, save_method: bool = False) -> dict:
+        return await sync_to_async(self.process_payment, thread_sensitive=False)(
+            transaction_id, amount, currency, card_details, save_method
+        )
+
+    async def atokenize_card(self, card_details: dict) -> dict:
+        return await sync_to_async(self.tokenize_card, thread_sensitive=False)(card_details)
+
+    async def aconfirm_payment(self, gateway_reference_id: str) -> dict:
+        return await sync_to_async(self.confirm_payment, thread_sensitive=False)(gateway_reference_id)
+
+
+class GatewayUnavailableError(Exception):
+    """
+    The gateway could not be reached: circuit open, timeouts or server errors after all retries.
+    request_sent is False only when no attempt can have reached the gateway (circuit open,
+    connection refused, rate limited); otherwise the payment may have been charged.
+    """
+
+    def __init__(self, message: str, request_sent: bool = True):
+        super().__init__(message)
+        self.request_sent = request_sent
+
+
+class InvalidTransitionError(Exception):
+    """
+    A gateway callback asked for a status change that PaymentTransaction.is_allowed_transition refuses.
+    """
+
+    def __init__(self, transaction: PaymentTransaction, status: str):
+        self.transaction = transaction
+        self.status = status
+        super().__init__(f"Transicion no permitida para la transaccion {transaction.id}: '{transaction.status}' -> '{status}'.")
+
 
 class MockPaymentGatewayService(PaymentGatewayService):
     """
@@ -84,26 +128,93 @@ class MockPaymentGatewayService(PaymentGatewayService):
         return {"status": True, "message": "Simulated confirmation success."}
 
 
+_gateway_service = None
+_gateway_service_lock = threading.Lock()
+
+
+def get_gateway_service() -> PaymentGatewayService:
+    """
+    Returns the shared instance of the gateway configured in settings.PAYMENTS_GATEWAY_BACKEND.
+    """
+    global _gateway_service
+    if _gateway_service is None:
+        with _gateway_service_lock:
+            if _gateway_service is None:
+                _gateway_service = import_string(settings.PAYMENTS_GATEWAY_BACKEND)()
+    return _gateway_service
+
+
+class PaymentWorkerPool:
+    """
+    Local worker pool that runs gateway calls outside the request thread.
+    Jobs live only in this process: stand-in for an external task queue.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers or settings.PAYMENTS_WORKER_THREADS,
+                    thread_name_prefix="payments-worker",
+                )
+            return self._executor.submit(self._run, fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    @staticmethod
+    def _run(fn, *args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.error("Payment worker job %s failed: %s", getattr(fn, "__name__", fn), e, exc_info=True)
+            raise
+        finally:
+            # Worker threads do not go through the request cycle that recycles connections.
+            close_old_connections()
+
+
+payment_worker_pool = PaymentWorkerPool()
+
+
 class PaymentProcessor:
     """
     High-level service to manage payment flow using a gateway implementation.
     """
 
-    def __init__(self, gateway_service: PaymentGatewayService):
+    def __init__(self, gateway_service: PaymentGatewayService, worker_pool: PaymentWorkerPool | None = None):
         self.gateway_service = gateway_service
         self.payment_method_service = PaymentMethodService()
+        self.worker_pool = worker_pool or payment_worker_pool
 
-    @db_transaction.atomic
     def initiate_payment(self, user_id: str, amount: Decimal, currency: str, card_details: dict, save_method: bool = False) -> PaymentTransaction:
+        """
+        Processes the payment synchronously. A failed attempt is committed as FAILED, with its
+        status history, before the error is raised, so it always leaves a record (unless the
+        caller wraps this in its own atomic block and rolls that back).
+        If the gateway may have received the charge but gave no answer, the transaction is
+        returned still PENDING; its callback settles it.
+        """
         if amount <= 0:
             raise ValueError("El monto del pago debe ser positivo.")
 
-        transaction = PaymentTransaction.objects.create(
-            user_id=user_id,
-            amount=amount,
-            currency=currency,
-            status=PaymentTransaction.PaymentStatus.PENDING,
-        )
+        with db_transaction.atomic():
+            transaction = PaymentTransaction.objects.create(
+                user_id=user_id,
+                amount=amount,
+                currency=currency,
+                status=PaymentTransaction.PaymentStatus.PENDING,
+                # The gateway call follows right away, so no separate write marks the submission.
+                submitted_at=timezone.now(),
+            )
         logger.info("Transaction %s created for user %s. Status: PENDING.", transaction.id, user_id)
 
         try:
@@ -118,52 +229,246 @@ class PaymentProcessor:
             transaction.gateway_id = gateway_response.get("gateway_reference_id")
             transaction.gateway_response = gateway_response
 
-            if gateway_response.get("status"):
-                transaction.status = PaymentTransaction.PaymentStatus.COMPLETED
-                logger.info("Transaction %s completed. Gateway ref: %s.", transaction.id, transaction.gateway_id)
-
-                token_data = gateway_response.get("token_data")
-                if save_method and token_data:
-                    self.payment_method_service.save_method(
-                        user_id=user_id,
-                        gateway_token=token_data["token"],
-                        card_brand=token_data.get("card_brand"),
-                        last_four=token_data.get("last_four_digits"),
-                        exp_date=token_data.get("expiration_date"),
-                        is_default=False,
-                    )
-                    logger.info("Tokenized payment method saved for user %s.", user_id)
-            else:
-                transaction.status = PaymentTransaction.PaymentStatus.FAILED
+            if not gateway_response.get("status"):
                 logger.error("Transaction %s failed: %s", transaction.id, gateway_response.get("message", "Unknown error"))
                 raise Exception(f"Fallo en la pasarela de pago: {gateway_response.get('message', 'Error desconocido')}")
 
+            with db_transaction.atomic():
+                if save_method:
+                    self._save_tokenized_method(user_id, gateway_response.get("token_data"))
+                transaction.status = PaymentTransaction.PaymentStatus.COMPLETED
+                transaction.save()
+            logger.info("Transaction %s completed. Gateway ref: %s.", transaction.id, transaction.gateway_id)
+
         except Exception as e:
-            transaction.status = PaymentTransaction.PaymentStatus.FAILED
+            if isinstance(e, GatewayUnavailableError) and e.request_sent:
+                self._record_unknown_outcome(transaction, e)
+                return transaction
             logger.error("Error processing payment for transaction %s: %s", transaction.id, e, exc_info=True)
+            # Committed on its own, outside any block the error is about to roll back.
+            transaction.status = PaymentTransaction.PaymentStatus.FAILED
+            with db_transaction.atomic():
+                transaction.save()
             raise e
-        finally:
-            transaction.save()
 
         return transaction
 
+    def initiate_payment_async(self, user_id: str, amount: Decimal, currency: str, card_details: dict, save_method: bool = False) -> PaymentTransaction:
+        """
+        Persists a PENDING transaction and queues the gateway call on the worker pool once
+        committed. The outcome arrives through the worker, handle_gateway_callback, or both.
+        Card details stay in memory only; if the process dies first the transaction stays PENDING
+        until expire_pending_payments marks it FAILED.
+        """
+        if amount <= 0:
+            raise ValueError("El monto del pago debe ser positivo.")
+
+        with db_transaction.atomic():
+            transaction = PaymentTransaction.objects.create(
+                user_id=user_id,
+                amount=amount,
+                currency=currency,
+                status=PaymentTransaction.PaymentStatus.PENDING,
+            )
+            logger.info("Transaction %s created for user %s. Status: PENDING (queued).", transaction.id, user_id)
+            db_transaction.on_commit(lambda: self.worker_pool.submit(
+                self.process_pending_payment, str(transaction.id), user_id, amount, currency, card_details, save_method,
+            ))
+        return transaction
+
+    def process_pending_payment(self, transaction_id: str, user_id: str, amount: Decimal, currency: str, card_details: dict, save_method: bool = False) -> PaymentTransaction:
+        """
+        Worker job: calls the gateway without holding a transaction or row lock, then settles
+        the transaction in a short atomic block. If the gateway may have received the charge but
+        gave no answer, the transaction stays PENDING until its callback settles it.
+        """
+        # Recorded before the call: from here on the charge may exist even if this process dies.
+        PaymentTransaction.objects.filter(id=transaction_id, submitted_at__isnull=True).update(submitted_at=timezone.now())
+        try:
+            gateway_response = self.gateway_service.process_payment(
+                transaction_id=transaction_id,
+                amount=amount,
+                currency=currency,
+                card_details=card_details,
+                save_method=save_method,
+            )
+        except GatewayUnavailableError as e:
+            if e.request_sent:
+                return self._record_unknown_outcome(PaymentTransaction.objects.get(id=transaction_id), e)
+            logger.error("Gateway call failed for transaction %s: %s", transaction_id, e)
+            gateway_response = {"status": False, "message": str(e)}
+        except Exception as e:
+            logger.error("Gateway call failed for transaction %s: %s", transaction_id, e, exc_info=True)
+            gateway_response = {"status": False, "message": str(e)}
+        return self._settle_pending_payment(transaction_id, user_id, gateway_response, save_method)
+
+    def _record_unknown_outcome(self, transaction: PaymentTransaction, error: GatewayUnavailableError) -> PaymentTransaction:
+        """
+        Keeps the transaction PENDING after a call whose outcome is unknown: the gateway may have
+        charged it, and a later callback (or a retry under the same Idempotency-Key, the
+        transaction id) reports the result. Only the error is stored.
+        """
+        logger.warning("Transaction %s left PENDING: the gateway gave no answer (%s).", transaction.id, error)
+        transaction.gateway_response = {"status": None, "message": str(error)}
+        transaction.updated_at = timezone.now()
+        PaymentTransaction.objects.filter(id=transaction.id, status=PaymentTransaction.PaymentStatus.PENDING).update(
+            gateway_response=transaction.gateway_response, updated_at=transaction.updated_at,
+        )
+        return transaction
+
+    @db_transaction.atomic
+    def _settle_pending_payment(self, transaction_id: str, user_id: str, gateway_response: dict, save_method: bool) -> PaymentTransaction:
+        transaction = PaymentTransaction.objects.select_for_update().get(id=transaction_id)
+        if transaction.status != PaymentTransaction.PaymentStatus.PENDING:
+            # A gateway callback settled it first; keep that outcome.
+            logger.info("Transaction %s already settled as %s; ignoring worker result.", transaction_id, transaction.status)
+            return transaction
+
+        transaction.gateway_id = gateway_response.get("gateway_reference_id")
+        transaction.gateway_response = gateway_response
+        if gateway_response.get("status"):
+            transaction.status = PaymentTransaction.PaymentStatus.COMPLETED
+            logger.info("Transaction %s completed. Gateway ref: %s.", transaction_id, transaction.gateway_id)
+            if save_method:
+                self._save_tokenized_method(user_id, gateway_response.get("token_data"))
+        else:
+            transaction.status = PaymentTransaction.PaymentStatus.FAILED
+            logger.error("Transaction %s failed: %s", transaction_id, gateway_response.get("message", "Unknown error"))
+        transaction.save()
+        return transaction
+
+    def expire_pending_payments(self, older_than_seconds: float | None = None) -> int:
+        """
+        Marks as FAILED the transactions still PENDING after PAYMENTS_PENDING_TIMEOUT_SECONDS
+        that were never sent to the gateway. Queued card details live only in the worker's
+        memory, so a restart leaves those rows PENDING with no job left to settle them.
+        Rows already sent (submitted_at set) may have been charged: they are only logged and
+        wait for the gateway's callback, since a FAILED payment cannot be reopened.
+        Returns the number of transactions expired.
+        """
+        if older_than_seconds is None:
+            older_than_seconds = settings.PAYMENTS_PENDING_TIMEOUT_SECONDS
+        cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+        stale_pending = PaymentTransaction.objects.filter(status=PaymentTransaction.PaymentStatus.PENDING, created_at__lt=cutoff)
+        unresolved = stale_pending.filter(submitted_at__isnull=False).count()
+        if unresolved:
+            logger.warning("%s payments sent to the gateway are still PENDING since before %s; waiting for their callback.", unresolved, cutoff)
+        expired = 0
+        with db_transaction.atomic():
+            stale = stale_pending.select_for_update().filter(submitted_at__isnull=True)
+            for transaction in stale.iterator(chunk_size=500):
+                transaction.status = PaymentTransaction.PaymentStatus.FAILED
+                transaction.gateway_response = {"status": False, "message": "Expired while pending: no gateway outcome was received."}
+                transaction.save(update_fields=["status", "gateway_response", "updated_at"])
+                expired += 1
+        if expired:
+            logger.warning("Expired %s payments still PENDING since before %s.", expired, cutoff)
+        return expired
+
+    def _save_tokenized_method(self, user_id: str, token_data: dict | None) -> None:
+        if not token_data:
+            return
+        self.payment_method_service.save_method(
+            user_id=user_id,
+            gateway_token=token_data["token"],
+            card_brand=token_data.get("card_brand"),
+            last_four=token_data.get("last_four_digits"),
+            exp_date=token_data.get("expiration_date"),
+            is_default=False,
+        )
+        logger.info("Tokenized payment method saved for user %s.", user_id)
+
+    def get_transaction(self, transaction_id: str) -> PaymentTransaction:
+        return PaymentTransaction.objects.get(id=transaction_id)
+
     @db_transaction.atomic
-    def handle_gateway_callback(self, transaction_id: str, gateway_response: dict, status: str) -> PaymentTransaction:
+    def handle_gateway_callback(self, transaction_id: str, gateway_response: dict, status: str, gateway_reference_id: str | None = None) -> PaymentTransaction:
+        """
+        Applies one gateway callback under the same rules as handle_gateway_callbacks_batch:
+        a move out of a final status (other than COMPLETED -> REFUNDED) raises InvalidTransitionError.
+        """
         try:
-            transaction = PaymentTransaction.objects.get(id=transaction_id)
+            # Locked like in _settle_pending_payment, so a callback and the worker cannot interleave.
+            transaction = PaymentTransaction.objects.select_for_update().get(id=transaction_id)
             logger.info("Handling callback for transaction %s. New status: %s.", transaction_id, status)
+            if not PaymentTransaction.is_allowed_transition(transaction.status, status):
+                logger.warning("Transaction %s: rejected callback transition '%s' -> '%s'.", transaction_id, transaction.status, status)
+                raise InvalidTransitionError(transaction, status)
 
             transaction.gateway_response = gateway_response
+            transaction.gateway_id = gateway_reference_id or transaction.gateway_id
             transaction.status = status
             transaction.save()
             return transaction
         except PaymentTransaction.DoesNotExist:
             logger.error("Transaction %s not found for callback.", transaction_id)
             raise ValueError(f"Transacción {transaction_id} no encontrada.")
+        except InvalidTransitionError:
+            raise
         except Exception as e:
             logger.error("Error handling callback for transaction %s: %s", transaction_id, e, exc_info=True)
             raise e
 
+    @db_transaction.atomic
+    def handle_gateway_callbacks_batch(self, callbacks: list[dict]) -> list[dict]:
+        """
+        Applies many gateway callbacks ({transaction_id, gateway_reference_id, status,
+        gateway_response}) with one SELECT ... IN, one bulk_update and one bulk_create of
+        status history rows. Callbacks are applied in order, so the last one for a transaction
+        wins. A callback that would move a transaction out of a final status (other than
+        COMPLETED -> REFUNDED) is not applied.
+        Returns one result per callback: {transaction_id, result, status}, with result
+        "updated", "unchanged", "not_found" or "invalid_transition" (status is then the current one).
+        """
+        transactions = {
+            str(transaction.id): transaction
+            for transaction in PaymentTransaction.objects.select_for_update().filter(
+                id__in={str(callback["transaction_id"]) for callback in callbacks}
+            )
+        }
+
+        results = []
+        changed = {}
+        history = []
+        for callback in callbacks:
+            transaction_id = str(callback["transaction_id"])
+            transaction = transactions.get(transaction_id)
+            if transaction is None:
+                logger.error("Transaction %s not found for callback.", transaction_id)
+                results.append({"transaction_id": transaction_id, "result": "not_found", "status": None})
+                continue
+
+            status = callback["status"]
+            gateway_response = callback.get("gateway_response")
+            gateway_id = callback.get("gateway_reference_id") or transaction.gateway_id
+            if not PaymentTransaction.is_allowed_transition(transaction.status, status):
+                logger.warning("Transaction %s: rejected callback transition '%s' -> '%s'.", transaction_id, transaction.status, status)
+                results.append({"transaction_id": transaction_id, "result": "invalid_transition", "status": transaction.status})
+                continue
+            if (transaction.status, transaction.gateway_response, transaction.gateway_id) == (status, gateway_response, gateway_id):
+                results.append({"transaction_id": transaction_id, "result": "unchanged", "status": status})
+                continue
+
+            if transaction.status != status:
+                # bulk_update skips PaymentTransaction.save(), so the transition is logged here.
+                logger.info("Transaction %s status change: '%s' -> '%s'", transaction_id, transaction.status, status)
+                history.append(PaymentStatusHistory(transaction=transaction, from_status=transaction.status, to_status=status))
+            transaction.status = status
+            transaction.gateway_response = gateway_response
+            transaction.gateway_id = gateway_id
+            changed[transaction_id] = transaction
+            results.append({"transaction_id": transaction_id, "result": "updated", "status": status})
+
+        if changed:
+            now = timezone.now()
+            for transaction in changed.values():
+                transaction.updated_at = now
+                transaction._persisted_status = transaction.status
+            PaymentTransaction.objects.bulk_update(changed.values(), ["status", "gateway_id", "gateway_response", "updated_at"])
+            PaymentStatusHistory.objects.bulk_create(history)
+        logger.info("Handled %s gateway callbacks: %s transactions updated.", len(callbacks), len(changed))
+        return results
+
 
 class PaymentMethodService:
     """
@@ -243,10 +548,11 @@ class PaymentService:
             save_method=save_method,
         )
 
-    def handle_gateway_callback(self, transaction_id: str, status: str, gateway_response: dict | None = None) -> PaymentTransaction:
+    def handle_gateway_callback(self, transaction_id: str, status: str, gateway_response: dict | None = None, gateway_reference_id: str | None = None) -> PaymentTransaction:
         gateway_response = gateway_response or {}
         return self.payment_processor.handle_gateway_callback(
             transaction_id=transaction_id,
             gateway_response=gateway_response,
             status=status,
+            gateway_reference_id=gateway_reference_id,
         )
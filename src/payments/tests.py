@@ -1,3 +1,364 @@
-from django.test import TestCase
+import io
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from payments.fake_gateway import FakeGatewayServer
+from payments.gateway_client import CircuitBreaker, GatewayUnavailableError, HttpPaymentGatewayService
+from payments.idempotency import idempotency_store
+from payments.models import IdempotencyRecord, PaymentStatusHistory, PaymentTransaction
+from payments.services import MockPaymentGatewayService, PaymentProcessor, PaymentWorkerPool
+
+APPROVED_CARD = {"card_number": "5555555555554444", "expiry_month": "12", "expiry_year": "2030", "cvc": "123"}
+DECLINED_CARD = {**APPROVED_CARD, "card_number": "4111111111111111"}
+
+
+def history_of(transaction):
+    return list(transaction.status_history.values_list("from_status", "to_status"))
+
+
+class PaymentStatusHistoryTests(TestCase):
+    def setUp(self):
+        self.processor = PaymentProcessor(gateway_service=MockPaymentGatewayService())
+
+    def test_completed_payment(self):
+        transaction = self.processor.initiate_payment("u1", Decimal("10.00"), "USD", APPROVED_CARD)
+        self.assertEqual(transaction.status, PaymentTransaction.PaymentStatus.COMPLETED)
+        self.assertEqual(history_of(transaction), [("", "PENDING"), ("PENDING", "COMPLETED")])
+
+    def test_failed_payment_is_recorded(self):
+        with self.assertLogs("payments", level="ERROR"), self.assertRaises(Exception):
+            self.processor.initiate_payment("u1", Decimal("10.00"), "USD", DECLINED_CARD)
+        transaction = PaymentTransaction.objects.get(user_id="u1")
+        self.assertEqual(transaction.status, PaymentTransaction.PaymentStatus.FAILED)
+        self.assertEqual(history_of(transaction), [("", "PENDING"), ("PENDING", "FAILED")])
+
+    def test_save_without_status_snapshot_reads_stored_status(self):
+        [transaction] = PaymentTransaction.objects.bulk_create([PaymentTransaction(user_id="u1", amount=Decimal("5.00"))])
+        transaction.status = PaymentTransaction.PaymentStatus.CANCELLED
+        transaction.save()
+        self.assertEqual(history_of(transaction), [("PENDING", "CANCELLED")])
+
+    def test_refresh_from_db_resets_status_snapshot(self):
+        transaction = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("5.00"))
+        PaymentTransaction.objects.filter(pk=transaction.pk).update(status=PaymentTransaction.PaymentStatus.FAILED)
+        transaction.refresh_from_db()
+        transaction.save()
+        self.assertEqual(PaymentStatusHistory.objects.filter(transaction=transaction).count(), 1)
+
+
+class PaymentConfirmTests(TestCase):
+    def confirm(self, transaction, status, gateway_reference_id="gw-1"):
+        body = {"transaction_id": str(transaction.id), "gateway_reference_id": gateway_reference_id, "status": status}
+        return self.client.post(reverse("payment-confirm"), body, content_type="application/json")
+
+    def test_applies_status_and_gateway_reference(self):
+        transaction = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"))
+        self.assertEqual(self.confirm(transaction, "COMPLETED").status_code, 200)
+        transaction.refresh_from_db()
+        self.assertEqual((transaction.status, transaction.gateway_id), ("COMPLETED", "gw-1"))
+        self.assertEqual(self.confirm(transaction, "REFUNDED").status_code, 200)
+        self.assertEqual(self.confirm(transaction, "BOGUS").status_code, 400)
+
+    def test_callback_cannot_reopen_a_failed_or_expired_payment(self):
+        failed = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"), status="FAILED")
+        expired = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"))
+        PaymentTransaction.objects.filter(pk=expired.pk).update(created_at=timezone.now() - timedelta(hours=2))
+        with self.assertLogs("payments", level="WARNING"):
+            PaymentProcessor(MockPaymentGatewayService()).expire_pending_payments()
+
+        for transaction in (failed, expired):
+            for status in ("COMPLETED", "PENDING"):
+                with self.assertLogs("payments", level="WARNING"):
+                    response = self.confirm(transaction, status)
+                self.assertEqual(response.status_code, 409)
+                self.assertEqual((response.json()["result"], response.json()["status"]), ("invalid_transition", "FAILED"))
+            transaction.refresh_from_db()
+            self.assertEqual((transaction.status, transaction.gateway_id), ("FAILED", None))
+
+
+class PaymentConfirmBatchTests(TestCase):
+    def setUp(self):
+        self.pending = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"))
+        self.completed = PaymentTransaction.objects.create(
+            user_id="u1", amount=Decimal("20.00"), status=PaymentTransaction.PaymentStatus.COMPLETED,
+        )
+
+    def confirm(self, *confirmations):
+        response = self.client.post(reverse("payment-confirm-batch"), {"confirmations": list(confirmations)},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_applies_status_and_gateway_reference(self):
+        body = self.confirm(
+            {"transaction_id": str(self.pending.id), "gateway_reference_id": "gw-1", "status": "COMPLETED"},
+            {"transaction_id": "00000000-0000-0000-0000-000000000000", "gateway_reference_id": "gw-2", "status": "FAILED"},
+            {"transaction_id": str(self.pending.id), "status": "BOGUS"},
+        )
+        self.assertEqual((body["updated"], body["not_found"], len(body["rejected"])), (1, 1, 1))
+        self.pending.refresh_from_db()
+        self.assertEqual((self.pending.status, self.pending.gateway_id), ("COMPLETED", "gw-1"))
+        self.assertEqual(history_of(self.pending), [("", "PENDING"), ("PENDING", "COMPLETED")])
+
+        body = self.confirm({"transaction_id": str(self.pending.id), "gateway_reference_id": "gw-1", "status": "COMPLETED"})
+        self.assertEqual(body["unchanged"], 1)
+
+    def test_final_status_only_moves_to_refunded(self):
+        body = self.confirm(
+            {"transaction_id": str(self.completed.id), "gateway_reference_id": "gw-3", "status": "REFUNDED"},
+            {"transaction_id": str(self.completed.id), "gateway_reference_id": "gw-3", "status": "COMPLETED"},
+        )
+        self.assertEqual([result["result"] for result in body["results"]], ["updated", "invalid_transition"])
+        self.completed.refresh_from_db()
+        self.assertEqual(self.completed.status, "REFUNDED")
+        self.assertEqual(history_of(self.completed), [("", "COMPLETED"), ("COMPLETED", "REFUNDED")])
+
+    def test_large_batch_uses_constant_queries(self):
+        transactions = PaymentTransaction.objects.bulk_create([
+            PaymentTransaction(user_id=f"u{i}", amount=Decimal("1.00")) for i in range(2000)
+        ])
+        callbacks = [
+            {"transaction_id": transaction.id, "gateway_reference_id": f"gw-{i}", "status": "COMPLETED"}
+            for i, transaction in enumerate(transactions)
+        ]
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            results = PaymentProcessor(MockPaymentGatewayService()).handle_gateway_callbacks_batch(callbacks)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual({result["result"] for result in results}, {"updated"})
+        self.assertEqual(PaymentStatusHistory.objects.filter(from_status="PENDING", to_status="COMPLETED").count(), 2000)
+        # One SELECT plus batched UPDATE/INSERT statements, independent of one query per item.
+        self.assertLess(len(queries), 50)
+        self.assertLess(elapsed, 10)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        idempotency_store._cache.clear()
+
+    def initiate(self, key, user_id="u1", amount="10.00"):
+        body = {"user_id": user_id, "amount": amount, "currency": "USD", "card_details": APPROVED_CARD}
+        return self.client.post(reverse("payment-initiate"), body, content_type="application/json",
+                                headers={"Idempotency-Key": key})
+
+    def test_retry_replays_the_first_response(self):
+        first = self.initiate("k1")
+        self.assertEqual(first.status_code, 202)
+        idempotency_store._cache.clear()  # The replay must also work from the table.
+        retry = self.initiate("k1")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(PaymentTransaction.objects.count(), 1)
+
+    def test_same_key_with_another_body_is_rejected(self):
+        self.initiate("k1")
+        self.assertEqual(self.initiate("k1", amount="11.00").status_code, 422)
+
+    def test_keys_are_scoped_by_caller(self):
+        self.initiate("k1", user_id="u1")
+        other = self.initiate("k1", user_id="u2")
+        self.assertEqual(other.status_code, 202)
+        self.assertNotIn("Idempotent-Replayed", other.headers)
+        self.assertEqual(PaymentTransaction.objects.count(), 2)
+
+    def test_abandoned_request_is_taken_over_after_its_lease(self):
+        self.initiate("k1")
+        record = IdempotencyRecord.objects.get()
+        # As if the first request were still running.
+        IdempotencyRecord.objects.filter(pk=record.pk).update(response_status=None, response_body=None)
+        idempotency_store._cache.clear()
+        self.assertEqual(self.initiate("k1").status_code, 409)
+
+        IdempotencyRecord.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs("payments", level="WARNING"):
+            retry = self.initiate("k1")
+        self.assertEqual(retry.status_code, 202)
+        self.assertNotIn("Idempotent-Replayed", retry.headers)
+
+
+class ExpirePendingPaymentsTests(TestCase):
+    def test_only_stale_unsent_pending_payments_expire(self):
+        stale = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"))
+        fresh = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"))
+        done = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"), status="COMPLETED")
+        sent = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"), submitted_at=timezone.now())
+        PaymentTransaction.objects.filter(pk__in=[stale.pk, done.pk, sent.pk]).update(created_at=timezone.now() - timedelta(hours=2))
+
+        with self.assertLogs("payments", level="WARNING"):
+            call_command("expire_pending_payments", stdout=io.StringIO())
+
+        statuses = dict(PaymentTransaction.objects.values_list("pk", "status"))
+        self.assertEqual((statuses[stale.pk], statuses[fresh.pk], statuses[done.pk], statuses[sent.pk]),
+                         ("FAILED", "PENDING", "COMPLETED", "PENDING"))
+        self.assertEqual(history_of(stale), [("", "PENDING"), ("PENDING", "FAILED")])
+
+
+class InlineWorkerPool(PaymentWorkerPool):
+    """
+    Runs each job in the calling thread, inside the test's transaction.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.jobs = []
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        self.jobs.append(fn)
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class AsyncPaymentTests(TestCase):
+    def setUp(self):
+        self.pool = InlineWorkerPool()
+        self.processor = PaymentProcessor(MockPaymentGatewayService(), worker_pool=self.pool)
+
+    def process(self, transaction, card=APPROVED_CARD):
+        return self.processor.process_pending_payment(str(transaction.id), "u1", Decimal("10.00"), "USD", card)
+
+    def test_job_is_submitted_only_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            transaction = self.processor.initiate_payment_async("u1", Decimal("10.00"), "USD", APPROVED_CARD)
+        self.assertEqual((transaction.status, self.pool.jobs), ("PENDING", []))
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(self.pool.jobs), 1)
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, "COMPLETED")
+        self.assertIsNotNone(transaction.submitted_at)
+        self.assertEqual(history_of(transaction), [("", "PENDING"), ("PENDING", "COMPLETED")])
+
+    def test_decline_is_settled_as_failed(self):
+        transaction = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"))
+        with self.assertLogs("payments", level="ERROR"):
+            self.process(transaction, DECLINED_CARD)
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, "FAILED")
+        self.assertTrue(transaction.gateway_id.startswith("mock_fail_"))
+        self.assertEqual(history_of(transaction), [("", "PENDING"), ("PENDING", "FAILED")])
+
+    def test_worker_result_after_a_callback_is_ignored(self):
+        transaction = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"))
+        self.processor.handle_gateway_callback(transaction.id, {"status": False}, "FAILED", "gw-callback")
+        with self.assertLogs("payments", level="INFO") as logs:
+            self.process(transaction)
+        self.assertIn("ignoring worker result", "\n".join(logs.output))
+        transaction.refresh_from_db()
+        self.assertEqual((transaction.status, transaction.gateway_id), ("FAILED", "gw-callback"))
+        self.assertEqual(history_of(transaction), [("", "PENDING"), ("PENDING", "FAILED")])
+
+
+class UnavailableGateway(MockPaymentGatewayService):
+    def __init__(self, request_sent):
+        self.request_sent = request_sent
+
+    def process_payment(self, *args, **kwargs):
+        raise GatewayUnavailableError("timeout", request_sent=self.request_sent)
+
+
+class GatewayUnavailableTests(TestCase):
+    """
+    A timeout does not mean the charge failed: the payment waits for the gateway's callback.
+    """
+
+    def test_unknown_outcome_stays_pending_until_the_callback(self):
+        processor = PaymentProcessor(UnavailableGateway(request_sent=True))
+        with self.assertLogs("payments", level="WARNING"):
+            transaction = processor.initiate_payment("u1", Decimal("10.00"), "USD", APPROVED_CARD)
+        transaction.refresh_from_db()
+        self.assertEqual((transaction.status, transaction.gateway_response["status"]), ("PENDING", None))
+
+        PaymentTransaction.objects.filter(pk=transaction.pk).update(created_at=timezone.now() - timedelta(hours=2))
+        with self.assertLogs("payments", level="WARNING"):
+            self.assertEqual(processor.expire_pending_payments(), 0)
+        processor.handle_gateway_callback(transaction.id, {"status": True}, "COMPLETED", "gw-1")
+        transaction.refresh_from_db()
+        self.assertEqual((transaction.status, transaction.gateway_id), ("COMPLETED", "gw-1"))
+
+    def test_worker_leaves_unknown_outcome_pending(self):
+        transaction = PaymentTransaction.objects.create(user_id="u1", amount=Decimal("10.00"))
+        processor = PaymentProcessor(UnavailableGateway(request_sent=True))
+        with self.assertLogs("payments", level="WARNING"):
+            processor.process_pending_payment(str(transaction.id), "u1", Decimal("10.00"), "USD", APPROVED_CARD)
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, "PENDING")
+        self.assertIsNotNone(transaction.submitted_at)
+
+    def test_request_never_sent_fails(self):
+        processor = PaymentProcessor(UnavailableGateway(request_sent=False))
+        with self.assertLogs("payments", level="ERROR"), self.assertRaises(Exception):
+            processor.initiate_payment("u1", Decimal("10.00"), "USD", APPROVED_CARD)
+        self.assertEqual(PaymentTransaction.objects.get().status, "FAILED")
+
+
+@override_settings(
+    PAYMENTS_GATEWAY_MAX_RETRIES=2,
+    PAYMENTS_GATEWAY_RETRY_BACKOFF_SECONDS=0.01,
+    PAYMENTS_GATEWAY_READ_TIMEOUT_SECONDS=0.2,
+    PAYMENTS_GATEWAY_BREAKER_FAILURE_THRESHOLD=3,
+    PAYMENTS_GATEWAY_BREAKER_RESET_SECONDS=60,
+)
+class HttpPaymentGatewayServiceTests(SimpleTestCase):
+    def gateway_for(self, **fake_options):
+        server = FakeGatewayServer(**fake_options).start()
+        self.addCleanup(server.stop)
+        gateway = HttpPaymentGatewayService(base_url=server.url)
+        self.addCleanup(gateway.close)
+        return server, gateway
+
+    def pay(self, gateway, card=APPROVED_CARD, transaction_id="tx-1"):
+        return gateway.process_payment(transaction_id, Decimal("10.00"), "USD", card)
+
+    def test_success_and_decline_are_answers(self):
+        _, gateway = self.gateway_for()
+        self.assertTrue(self.pay(gateway)["status"])
+        self.assertFalse(self.pay(gateway, DECLINED_CARD, transaction_id="tx-2")["status"])
+        self.assertEqual(gateway.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_server_errors_are_retried_then_raise(self):
+        server, gateway = self.gateway_for(failure_rate=1.0)
+        with self.assertLogs("payments", level="WARNING"), self.assertRaises(GatewayUnavailableError):
+            self.pay(gateway)
+        self.assertEqual(server.stats["requests"], 3)
+
+    def test_hanging_gateway_times_out(self):
+        server, gateway = self.gateway_for(hang_rate=1.0, hang_seconds=2)
+        started = time.perf_counter()
+        with self.assertLogs("payments", level="WARNING"), self.assertRaises(GatewayUnavailableError) as raised:
+            self.pay(gateway)
+        self.assertTrue(raised.exception.request_sent)
+        self.assertLess(time.perf_counter() - started, 1.5)
+        self.assertEqual(server.stats["hangs_injected"], 3)
+
+    def test_breaker_opens_and_fails_fast(self):
+        server, gateway = self.gateway_for(failure_rate=1.0)
+        with self.assertLogs("payments", level="WARNING"):
+            with self.assertRaises(GatewayUnavailableError):
+                self.pay(gateway)
+            with self.assertRaises(GatewayUnavailableError) as raised:
+                self.pay(gateway)
+        self.assertFalse(raised.exception.request_sent)
+        self.assertEqual(gateway.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(server.stats["requests"], 3)
+
+    def test_rate_limit_waits_retry_after_without_tripping_breaker(self):
+        server, gateway = self.gateway_for(throttle_rate=1.0, retry_after=0.1)
+        started = time.perf_counter()
+        with self.assertLogs("payments", level="WARNING"), self.assertRaises(GatewayUnavailableError) as raised:
+            self.pay(gateway)
+        self.assertFalse(raised.exception.request_sent)
+        self.assertGreaterEqual(time.perf_counter() - started, 0.2)
+        self.assertEqual(server.stats["throttles_injected"], 3)
+        self.assertEqual(gateway.breaker.state, CircuitBreaker.CLOSED)
@@ -2,6 +2,8 @@ from django.urls import path
 from payments.views import (
     PaymentInitiateView,
     PaymentConfirmView,
+    PaymentConfirmBatchView,
+    PaymentStatusView,
     SavedPaymentMethodListView,
     SavedPaymentMethodDetailView
 )
@@ -12,6 +14,12 @@ urlpatterns = [
     
     # URL para la confirmación de pagos (ej. webhooks de pasarela)
     path('confirm/', PaymentConfirmView.as_view(), name='payment-confirm'),
+
+    # URL para confirmaciones en lote (ej. ráfagas de webhooks o archivo de liquidación)
+    path('confirm/batch/', PaymentConfirmBatchView.as_view(), name='payment-confirm-batch'),
+
+    # URL para consultar el estado de una transacción (ej. pagos procesados en segundo plano)
+    path('transactions/<uuid:transaction_id>/status/', PaymentStatusView.as_view(), name='payment-status'),
     
     # URL para listar los métodos de pago guardados de un usuario
     # Requiere el user_id para filtrar
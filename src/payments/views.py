@@ -1,28 +1,56 @@
 import logging
+from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView, DestroyAPIView
+from django.urls import reverse
 
 from payments.serializers import (
-    PaymentInitiationSerializer, PaymentConfirmationSerializer, SavedPaymentMethodSerializer
+    PaymentInitiationSerializer, PaymentConfirmationSerializer, PaymentConfirmationBatchSerializer,
+    PaymentConfirmationBatchItemSerializer, SavedPaymentMethodSerializer
 )
-from payments.services import PaymentProcessor, MockPaymentGatewayService, PaymentMethodService
+from payments.services import InvalidTransitionError, PaymentProcessor, PaymentMethodService, get_gateway_service
 from payments.models import PaymentTransaction
+from payments.idempotency import idempotency_store
 
 logger = logging.getLogger('payments')
 
 # Instanciamos los servicios con las dependencias
-payment_gateway_service = MockPaymentGatewayService() # Usamos el mock para desarrollo/pruebas
+payment_gateway_service = get_gateway_service() # Mock por defecto; ver PAYMENTS_GATEWAY_BACKEND
 payment_processor = PaymentProcessor(gateway_service=payment_gateway_service)
 payment_method_service = PaymentMethodService()
 
+
+def user_caller(request) -> str:
+    """
+    Llamador de las solicitudes de pago, para acotar sus claves de idempotencia: el usuario
+    autenticado o, sin autenticacion, el user_id del cuerpo.
+    """
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    user_id = request.data.get('user_id', '') if hasattr(request.data, 'get') else ''
+    return f"user:{user_id}"
+
+
+def gateway_caller(request) -> str:
+    """
+    Llamador de los webhooks: el principal autenticado o, sin autenticacion, la pasarela configurada.
+    """
+    if request.user.is_authenticated:
+        return f"gateway:{request.user.pk}"
+    return f"gateway:{settings.PAYMENTS_GATEWAY_BACKEND}"
+
 class PaymentInitiateView(APIView):
     """
     Vista para iniciar un nuevo proceso de pago.
     Endpoint: POST /api/payments/initiate/
+    Acepta la cabecera Idempotency-Key: un reintento con la misma clave devuelve la respuesta original.
     """
     def post(self, request):
+        return idempotency_store.handle(request, 'payment-initiate', lambda: self._initiate(request), user_caller(request))
+
+    def _initiate(self, request):
         serializer = PaymentInitiationSerializer(data=request.data)
         if serializer.is_valid():
             user_id = serializer.validated_data['user_id']
@@ -32,6 +60,15 @@ class PaymentInitiateView(APIView):
             save_method = serializer.validated_data.get('save_method', False)
 
             try:
+                if settings.PAYMENTS_ASYNC_PROCESSING:
+                    transaction = payment_processor.initiate_payment_async(user_id, amount, currency, card_details, save_method)
+                    return Response({
+                        'transaction_id': transaction.id,
+                        'status': transaction.status,
+                        'message': 'Pago recibido. Consulte el estado para conocer el resultado.',
+                        'status_url': reverse('payment-status', kwargs={'transaction_id': transaction.id}),
+                    }, status=status.HTTP_202_ACCEPTED)
+
                 transaction = payment_processor.initiate_payment(user_id, amount, currency, card_details, save_method)
                 return Response({
                     'transaction_id': transaction.id,
@@ -48,23 +85,37 @@ class PaymentConfirmView(APIView):
     """
     Vista para que las pasarelas de pago notifiquen el estado final de una transacción (webhook).
     Endpoint: POST /api/payments/confirm/
+    Acepta la cabecera Idempotency-Key: un webhook repetido con la misma clave no se vuelve a procesar.
+    Un cambio que no admite PaymentTransaction.is_allowed_transition responde 409 (invalid_transition).
     """
     def post(self, request):
+        return idempotency_store.handle(request, 'payment-confirm', lambda: self._confirm(request), gateway_caller(request))
+
+    def _confirm(self, request):
         serializer = PaymentConfirmationSerializer(data=request.data)
         if serializer.is_valid():
             transaction_id = serializer.validated_data['transaction_id']
             gateway_response = serializer.validated_data.get('gateway_response')
             status_param = serializer.validated_data['status']
+            gateway_reference_id = serializer.validated_data['gateway_reference_id']
 
             try:
                 transaction = payment_processor.handle_gateway_callback(
-                    transaction_id, gateway_response, status_param
+                    transaction_id, gateway_response, status_param, gateway_reference_id
                 )
                 return Response({
                     'transaction_id': transaction.id,
                     'status': transaction.status,
                     'message': 'Estado de transacción actualizado exitosamente.'
                 }, status=status.HTTP_200_OK)
+            except InvalidTransitionError as e:
+                # Mismas reglas que el lote: un estado final no se reabre (salvo COMPLETED -> REFUNDED).
+                return Response({
+                    'transaction_id': e.transaction.id,
+                    'result': 'invalid_transition',
+                    'status': e.transaction.status,
+                    'error': str(e),
+                }, status=status.HTTP_409_CONFLICT)
             except (PaymentTransaction.DoesNotExist, ValueError) as e:
                 return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
             except Exception as e:
@@ -72,6 +123,72 @@ class PaymentConfirmView(APIView):
                 return Response({'error': 'Error interno del servidor al procesar la confirmación.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class PaymentConfirmBatchView(APIView):
+    """
+    Vista para aplicar en una sola solicitud las notificaciones que la pasarela envía en ráfaga
+    (ej. archivo de liquidación diaria): {"confirmations": [{transaction_id, gateway_reference_id, status, gateway_response}, ...]}.
+    Devuelve el resultado de cada confirmación y los elementos inválidos.
+    Endpoint: POST /api/payments/confirm/batch/
+    Acepta la cabecera Idempotency-Key, igual que PaymentConfirmView.
+    """
+    def post(self, request):
+        return idempotency_store.handle(request, 'payment-confirm-batch', lambda: self._confirm_batch(request),
+                                        gateway_caller(request))
+
+    def _confirm_batch(self, request):
+        batch_serializer = PaymentConfirmationBatchSerializer(data=request.data)
+        if not batch_serializer.is_valid():
+            return Response(batch_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        callbacks = []
+        indexes = []
+        rejected = []
+        for index, raw_item in enumerate(batch_serializer.validated_data['confirmations']):
+            item_serializer = PaymentConfirmationBatchItemSerializer(data=raw_item)
+            if item_serializer.is_valid():
+                callbacks.append(item_serializer.validated_data)
+                indexes.append(index)
+            else:
+                rejected.append({'index': index, 'errors': item_serializer.errors})
+
+        results = []
+        if callbacks:
+            try:
+                results = payment_processor.handle_gateway_callbacks_batch(callbacks)
+            except Exception as e:
+                logger.error(f"Error al confirmar lote de {len(callbacks)} pagos: {e}", exc_info=True)
+                return Response({'error': 'Error interno del servidor al procesar el lote de confirmaciones.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            for index, result in zip(indexes, results):
+                result['index'] = index
+
+        counts = {'updated': 0, 'unchanged': 0, 'not_found': 0, 'invalid_transition': 0}
+        for result in results:
+            counts[result['result']] += 1
+        return Response({
+            'message': 'Lote de confirmaciones procesado.',
+            'received': len(batch_serializer.validated_data['confirmations']),
+            **counts,
+            'results': results,
+            'rejected': rejected,
+        }, status=status.HTTP_200_OK)
+
+class PaymentStatusView(APIView):
+    """
+    Vista para consultar el estado de una transacción (ej. tras un pago procesado en segundo plano).
+    Endpoint: GET /api/payments/transactions/<uuid:transaction_id>/status/
+    """
+    def get(self, request, transaction_id):
+        try:
+            transaction = payment_processor.get_transaction(transaction_id)
+        except PaymentTransaction.DoesNotExist:
+            return Response({'error': f'Transacción {transaction_id} no encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'transaction_id': transaction.id,
+            'status': transaction.status,
+            'gateway_id': transaction.gateway_id,
+            'updated_at': transaction.updated_at,
+        }, status=status.HTTP_200_OK)
+
 class SavedPaymentMethodListView(ListAPIView):
     """
     Vista para listar los métodos de pago guardados de un usuario.
@@ -1,3 +1,25 @@
 from django.contrib import admin
 
-# Register your models here.
+from support_chat.models import AgentHoliday, AgentSchedule, AgentWorkingHours, BotIntent
+
+
+class AgentWorkingHoursInline(admin.TabularInline):
+    model = AgentWorkingHours
+    extra = 0
+
+
+class AgentHolidayInline(admin.TabularInline):
+    model = AgentHoliday
+    extra = 0
+
+
+@admin.register(AgentSchedule)
+class AgentScheduleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'time_zone', 'is_active', 'updated_at')
+    inlines = [AgentWorkingHoursInline, AgentHolidayInline]
+
+
+@admin.register(BotIntent)
+class BotIntentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'priority', 'is_active', 'updated_at')
+    list_filter = ('is_active',)
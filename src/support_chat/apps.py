@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SupportChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'support_chat'
+
+    def ready(self):
+        # Registrar las señales que invalidan las cachés en memoria (horario y reglas del bot).
+        from support_chat import signals  # noqa: F401
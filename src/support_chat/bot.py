@@ -0,0 +1,122 @@
+"""
+Motor de respuestas del bot basado en reglas (BotIntent).
+Las frases clave se precompilan en un trie de palabras normalizadas, de modo que
+encontrar la intención de un mensaje cuesta O(palabras del mensaje) sin importar
+cuántas reglas existan; además se cachean las respuestas por mensaje normalizado.
+"""
+
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from time import monotonic
+
+from django.conf import settings
+
+from support_chat.models import BotIntent
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_words(text: str) -> tuple[str, ...]:
+    """
+    Convierte un texto a la tupla de palabras usada para comparar:
+    minúsculas, sin tildes ni signos de puntuación.
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return tuple(_WORD_RE.findall(text))
+
+
+class IntentIndex:
+    """
+    Índice inmutable de frases clave: trie cuyas aristas son palabras y cuyos nodos
+    terminales guardan las intenciones de la frase. Incluye su propia caché LRU.
+    """
+    _TERMINAL = None  # Clave del nodo que guarda las intenciones (ninguna palabra es None).
+
+    def __init__(self, intents: list[dict], cache_size: int):
+        """
+        :param intents: Dicts con 'name', 'keywords', 'response' y 'priority'.
+        :param cache_size: Cantidad de mensajes normalizados cuya respuesta se cachea.
+        """
+        self._intents = intents
+        self._root = {}
+        for index, intent in enumerate(intents):
+            for keyword in intent['keywords']:
+                words = normalize_words(keyword)
+                if not words:
+                    continue
+                node = self._root
+                for word in words:
+                    node = node.setdefault(word, {})
+                node.setdefault(self._TERMINAL, set()).add(index)
+        self._match_words = lru_cache(maxsize=cache_size)(self._match_words)
+
+    def match(self, message: str) -> dict | None:
+        """
+        Devuelve la intención que mejor coincide con el mensaje, o None.
+        Puntaje: palabras clave coincidentes; desempata la prioridad y luego el orden de carga.
+        """
+        return self._match_words(normalize_words(message))
+
+    def _match_words(self, words: tuple[str, ...]) -> dict | None:
+        scores = {}
+        for start in range(len(words)):
+            node = self._root
+            for position in range(start, len(words)):
+                node = node.get(words[position])
+                if node is None:
+                    break
+                for index in node.get(self._TERMINAL, ()):
+                    scores[index] = scores.get(index, 0) + position - start + 1
+        if not scores:
+            return None
+        best = max(scores, key=lambda index: (scores[index], self._intents[index]['priority'], -index))
+        return self._intents[best]
+
+
+class BotRuleCache:
+    """
+    Caché en memoria del índice de intenciones del proceso.
+    Se reconstruye al invalidarse (las señales de support_chat.signals lo hacen al
+    modificar una regla en este proceso) o al vencer el intervalo de refresco.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._loaded_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._index = None
+
+    def get(self) -> IntentIndex:
+        index = self._index
+        if index is not None and not self._is_stale():
+            return index
+        with self._lock:
+            if self._index is None or self._is_stale():
+                self._index = self._load()
+                self._loaded_at = monotonic()
+            return self._index
+
+    def _is_stale(self) -> bool:
+        return monotonic() - self._loaded_at > settings.SUPPORT_CHAT_BOT_RULES_REFRESH_SECONDS
+
+    def _load(self) -> IntentIndex:
+        intents = [
+            {
+                'name': intent.name,
+                'keywords': intent.get_keyword_list(),
+                'response': intent.response,
+                'priority': intent.priority,
+            }
+            for intent in BotIntent.objects.filter(is_active=True)
+        ]
+        return IntentIndex(intents, settings.SUPPORT_CHAT_BOT_RESPONSE_CACHE_SIZE)
+
+
+# Instancia compartida por el proceso; las señales de support_chat.signals la invalidan.
+bot_rule_cache = BotRuleCache()
@@ -0,0 +1,56 @@
+"""
+Comando de gestión para archivar las sesiones de chat inactivas.
+
+Uso puntual (ej. desde cron, una vez al día):
+    python manage.py archive_chat_sessions
+Como proceso programado de larga duración:
+    python manage.py archive_chat_sessions --interval 3600
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from support_chat.services import ChatArchiveService
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los mensajes de las sesiones cuyo último mensaje supera la ventana de retención "
+        "a un archivo comprimido por sesión (ChatSessionArchive)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=settings.SUPPORT_CHAT_ARCHIVE_RETENTION_DAYS,
+            help="Días sin mensajes tras los cuales se archiva una sesión.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Cantidad de sesiones leídas por consulta.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Si es mayor que 0, repite el archivado cada N segundos hasta que se detenga el proceso.",
+        )
+
+    def handle(self, *args, **options):
+        service = ChatArchiveService()
+        while True:
+            sessions, messages = service.archive_inactive_sessions(
+                retention_days=options["retention_days"],
+                batch_size=options["batch_size"],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Sesiones archivadas: {sessions}. Mensajes archivados: {messages}."
+            ))
+            if options["interval"] <= 0:
+                break
+            time.sleep(options["interval"])
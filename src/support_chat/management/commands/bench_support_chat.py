@@ -0,0 +1,190 @@
+"""
+Benchmark de carga de los endpoints de mensajes de support_chat (ChatMessageAPIView).
+
+Simula N salas concurrentes (un hilo por sala) en las que un cliente envía mensajes y
+consulta los nuevos a tasas configurables, y reporta latencias p50/p95/p99, consultas
+SQL por solicitud y throughput. Corre dentro del proceso contra una base de datos de
+prueba creada y destruida por el propio comando (nunca contra la base configurada),
+con el mismo motor que DATABASES['default'] (SQLite o PostgreSQL). Las solicitudes que
+fallan (ej. bloqueos de SQLite bajo escritura concurrente) se cuentan como errores.
+
+Ejemplo:
+    python manage.py bench_support_chat --rooms 50 --duration 30 --post-interval 2 --poll-interval 1
+"""
+
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+class _QueryCounter:
+    """
+    Wrapper de ejecución que cuenta las consultas SQL del hilo actual.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class _Results:
+    """
+    Acumula, de forma segura entre hilos, las mediciones por tipo de solicitud.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(int)
+        self.errors = defaultdict(int)
+
+    def record(self, kind: str, latency: float, queries: int, ok: bool) -> None:
+        with self._lock:
+            self.latencies[kind].append(latency)
+            self.queries[kind] += queries
+            if not ok:
+                self.errors[kind] += 1
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = "Mide latencia, consultas por solicitud y throughput de la API de mensajes de support_chat bajo concurrencia."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=20, help="Salas (sesiones) concurrentes.")
+        parser.add_argument("--duration", type=float, default=10.0, help="Duración de la prueba en segundos.")
+        parser.add_argument("--post-interval", type=float, default=2.0,
+                            help="Segundos entre mensajes enviados por cada sala.")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Segundos entre consultas de mensajes de cada sala.")
+        parser.add_argument("--poll-mode", choices=["cursor", "full"], default="cursor",
+                            help="'cursor' consulta con after_id + ETag; 'full' pide el historial completo.")
+        parser.add_argument("--history", type=int, default=0,
+                            help="Mensajes previos con los que se siembra cada sala.")
+        parser.add_argument("--seed", type=int, default=None, help="Semilla para desfasar las salas de forma reproducible.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and not connection.settings_dict["TEST"].get("NAME"):
+            # La base SQLite de prueba por defecto es en memoria con caché compartida, que bloquea
+            # tablas completas entre hilos; un archivo se comporta como en producción.
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.gettempdir(), "bench_support_chat.sqlite3")
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results, elapsed = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self._report(options, results, elapsed)
+
+    def _run(self, options):
+        from support_chat.models import ChatMessage, ChatSession
+
+        sessions = [ChatSession.objects.create() for _ in range(options["rooms"])]
+        if options["history"]:
+            ChatMessage.objects.bulk_create([
+                ChatMessage(session=session, sender="client", content=f"historial {index}")
+                for session in sessions
+                for index in range(options["history"])
+            ])
+
+        results = _Results()
+        rng = random.Random(options["seed"])
+        offsets = [rng.random() for _ in sessions]
+        start_barrier = threading.Barrier(len(sessions) + 1)
+        threads = [
+            threading.Thread(target=self._room, args=(session.id, offset, options, results, start_barrier))
+            for session, offset in zip(sessions, offsets)
+        ]
+        for thread in threads:
+            thread.start()
+        start_barrier.wait()
+        started_at = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started_at
+
+    def _room(self, session_id, offset, options, results, start_barrier):
+        client = Client(raise_request_exception=False)
+        counter = _QueryCounter()
+        url = f"/support_chat/api/sessions/{session_id}/messages/"
+        last_id = 0
+        etag = None
+        try:
+            with connection.execute_wrapper(counter):
+                start_barrier.wait()
+                now = time.perf_counter()
+                deadline = now + options["duration"]
+                # Desfase inicial para que las salas no disparen todas en el mismo instante.
+                next_post = now + offset * options["post_interval"]
+                next_poll = now + offset * options["poll_interval"]
+                sequence = 0
+                while True:
+                    next_event = min(next_post, next_poll)
+                    if next_event >= deadline:
+                        break
+                    time.sleep(max(0.0, next_event - time.perf_counter()))
+
+                    counter.count = 0
+                    request_started = time.perf_counter()
+                    if next_post <= next_poll:
+                        kind = "post"
+                        sequence += 1
+                        next_post += options["post_interval"]
+                        response = client.post(url, {"content": f"mensaje {sequence}"}, content_type="application/json")
+                        ok = response.status_code == 201
+                    else:
+                        kind = "poll"
+                        next_poll += options["poll_interval"]
+                        if options["poll_mode"] == "cursor":
+                            headers = {"If-None-Match": etag} if etag else {}
+                            response = client.get(url, {"after_id": last_id}, headers=headers)
+                        else:
+                            response = client.get(url)
+                        ok = response.status_code in (200, 304)
+                        if response.status_code == 200:
+                            etag = response.headers.get("ETag")
+                            messages = response.json()
+                            if messages:
+                                last_id = messages[-1]["id"]
+                    results.record(kind, time.perf_counter() - request_started, counter.count, ok)
+        finally:
+            connection.close()
+
+    def _report(self, options, results, elapsed):
+        self.stdout.write(
+            f"Salas: {options['rooms']} | Duración: {elapsed:.1f} s | Modo de consulta: {options['poll_mode']} | "
+            f"Motor: {connection.vendor}"
+        )
+        header = f"{'tipo':<6}{'solicitudes':>12}{'errores':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'consultas/sol':>15}{'sol/s':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        total_requests = 0
+        for kind in ("post", "poll"):
+            latencies = sorted(results.latencies.get(kind, []))
+            count = len(latencies)
+            total_requests += count
+            queries_per_request = results.queries[kind] / count if count else 0.0
+            self.stdout.write(
+                f"{kind:<6}{count:>12}{results.errors[kind]:>9}"
+                f"{_percentile(latencies, 50) * 1000:>9.2f}{_percentile(latencies, 95) * 1000:>9.2f}"
+                f"{_percentile(latencies, 99) * 1000:>9.2f}{queries_per_request:>15.2f}{count / elapsed:>9.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Throughput total: {total_requests / elapsed:.1f} solicitudes/s"))
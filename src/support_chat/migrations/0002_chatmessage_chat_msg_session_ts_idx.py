@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2025-12-10 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support_chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'timestamp'], name='chat_msg_session_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support_chat', '0002_chatmessage_chat_msg_session_ts_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('time_zone', models.CharField(default=settings.TIME_ZONE, help_text="Zona horaria IANA del horario (ej. 'America/Santiago').", max_length=64, verbose_name='Zona Horaria')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Horario de Atención',
+                'verbose_name_plural': 'Horarios de Atención',
+            },
+        ),
+        migrations.CreateModel(
+            name='AgentWorkingHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Día de la Semana')),
+                ('start_time', models.TimeField(verbose_name='Hora de Inicio')),
+                ('end_time', models.TimeField(verbose_name='Hora de Término')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='working_hours', to='support_chat.agentschedule', verbose_name='Horario')),
+            ],
+            options={
+                'verbose_name': 'Tramo de Atención',
+                'verbose_name_plural': 'Tramos de Atención',
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AgentHoliday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('description', models.CharField(blank=True, max_length=255, verbose_name='Descripción')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to='support_chat.agentschedule', verbose_name='Horario')),
+            ],
+            options={
+                'verbose_name': 'Feriado',
+                'verbose_name_plural': 'Feriados',
+                'ordering': ['date'],
+                'unique_together': {('schedule', 'date')},
+            },
+        ),
+    ]
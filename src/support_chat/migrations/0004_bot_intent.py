@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support_chat', '0003_agent_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotIntent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Intención')),
+                ('keywords', models.TextField(help_text="Una frase por línea; se comparan sin mayúsculas ni tildes (ej. 'reembolso', 'donde esta mi pedido').", verbose_name='Frases Clave')),
+                ('response', models.TextField(verbose_name='Respuesta')),
+                ('priority', models.PositiveSmallIntegerField(default=0, verbose_name='Prioridad')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activa')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Intención del Bot',
+                'verbose_name_plural': 'Intenciones del Bot',
+                'ordering': ['-priority', 'name'],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+DEFAULT_INTENTS = [
+    {
+        'name': 'estado_pedido',
+        'keywords': "estado de mi pedido\ndonde esta mi pedido\nseguimiento\ntracking\nmi pedido",
+        'response': "Puedes revisar el estado y la ubicación de tu pedido en la sección de seguimiento. "
+                    "Si necesitas más ayuda, un agente revisará tu consulta el próximo día hábil.",
+    },
+    {
+        'name': 'reembolso',
+        'keywords': "reembolso\ndevolucion\ndevolver\ncancelar pedido\nme cobraron",
+        'response': "Las solicitudes de reembolso se procesan dentro de 5 a 10 días hábiles. "
+                    "Un agente revisará tu caso el próximo día hábil.",
+    },
+    {
+        'name': 'envio',
+        'keywords': "envio\ndespacho\ncosto de envio\ncuanto tarda\nentrega",
+        'response': "Los despachos se entregan entre 1 y 5 días hábiles según la comuna de destino. "
+                    "El costo de envío se muestra antes de confirmar la compra.",
+    },
+]
+
+
+def create_default_intents(apps, schema_editor):
+    BotIntent = apps.get_model('support_chat', 'BotIntent')
+    for intent in DEFAULT_INTENTS:
+        BotIntent.objects.get_or_create(name=intent['name'], defaults=intent)
+
+
+def delete_default_intents(apps, schema_editor):
+    BotIntent = apps.get_model('support_chat', 'BotIntent')
+    BotIntent.objects.filter(name__in=[intent['name'] for intent in DEFAULT_INTENTS]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support_chat', '0004_bot_intent'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_intents, delete_default_intents),
+    ]
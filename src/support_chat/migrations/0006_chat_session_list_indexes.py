@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support_chat', '0005_default_bot_intents'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['status', 'created_at'], name='chat_session_status_ct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['created_at'], name='chat_session_created_idx'),
+        ),
+    ]
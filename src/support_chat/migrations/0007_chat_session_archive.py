@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support_chat', '0006_chat_session_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatSessionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.BinaryField(verbose_name='Mensajes Comprimidos')),
+                ('message_count', models.PositiveIntegerField(default=0, verbose_name='Cantidad de Mensajes')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True, verbose_name='Último Mensaje')),
+                ('archived_at', models.DateTimeField(auto_now=True, verbose_name='Archivado en')),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='support_chat.chatsession', verbose_name='Sesión de Chat')),
+            ],
+            options={
+                'verbose_name': 'Archivo de Sesión de Chat',
+                'verbose_name_plural': 'Archivos de Sesiones de Chat',
+            },
+        ),
+    ]
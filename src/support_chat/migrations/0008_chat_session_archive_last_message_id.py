@@ -0,0 +1,29 @@
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+def backfill_last_message_id(apps, schema_editor):
+    ChatSessionArchive = apps.get_model('support_chat', 'ChatSessionArchive')
+    for archive in ChatSessionArchive.objects.exclude(payload=b'').iterator():
+        messages = json.loads(zlib.decompress(bytes(archive.payload)))
+        if messages:
+            archive.last_message_id = max(message['id'] for message in messages)
+            archive.save(update_fields=['last_message_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support_chat', '0007_chat_session_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsessionarchive',
+            name='last_message_id',
+            field=models.BigIntegerField(default=0, verbose_name='ID Último Mensaje'),
+        ),
+        migrations.RunPython(backfill_last_message_id, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# Frases que 0005 sembró para 'reembolso' y las que las reemplazan: "cancelar pedido" no
+# coincidía con "cancelar mi pedido", que terminaba en 'estado_pedido' (por "mi pedido").
+OLD_KEYWORDS = "reembolso\ndevolucion\ndevolver\ncancelar pedido\nme cobraron"
+NEW_KEYWORDS = (
+    "reembolso\ndevolucion\ndevolver\ncancelar\ncancelar pedido\ncancelar mi pedido\n"
+    "cancelar el pedido\ncancelar la compra\nme cobraron"
+)
+
+
+def update_keywords(apps, schema_editor):
+    BotIntent = apps.get_model('support_chat', 'BotIntent')
+    # Solo si la regla no fue editada desde el admin.
+    BotIntent.objects.filter(name='reembolso', keywords=OLD_KEYWORDS).update(keywords=NEW_KEYWORDS)
+
+
+def restore_keywords(apps, schema_editor):
+    BotIntent = apps.get_model('support_chat', 'BotIntent')
+    BotIntent.objects.filter(name='reembolso', keywords=NEW_KEYWORDS).update(keywords=OLD_KEYWORDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support_chat', '0008_chat_session_archive_last_message_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(update_keywords, restore_keywords),
+    ]
@@ -3,6 +3,13 @@ Modelos de base de datos para la aplicación support_chat.
 Define la estructura de las sesiones de chat y los mensajes.
 """
 
+import json
+import zlib
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -27,6 +34,11 @@ class ChatSession(models.Model):
         verbose_name = "Sesión de Chat"
         verbose_name_plural = "Sesiones de Chat"
         ordering = ['-created_at'] # Ordenar sesiones por las más recientes primero.
+        indexes = [
+            # Soportan el listado paginado por cursor, con y sin filtro de estado.
+            models.Index(fields=['status', 'created_at'], name='chat_session_status_ct_idx'),
+            models.Index(fields=['created_at'], name='chat_session_created_idx'),
+        ]
 
     def __str__(self):
         return f"Sesión #{self.id} - {self.status} (Creada: {self.created_at.strftime('%Y-%m-%d %H:%M')})"
@@ -58,6 +70,160 @@ class ChatMessage(models.Model):
         verbose_name = "Mensaje de Chat"
         verbose_name_plural = "Mensajes de Chat"
         ordering = ['timestamp'] # Ordenar mensajes cronológicamente.
+        indexes = [
+            # Soporta la lectura incremental por cursor (mensajes de una sesión posteriores a un punto dado).
+            models.Index(fields=['session', 'timestamp'], name='chat_msg_session_ts_idx'),
+        ]
 
     def __str__(self):
         return f"Sesión {self.session.id} - {self.sender}: {self.content[:50]}"
+
+
+class ChatSessionArchive(models.Model):
+    """
+    Mensajes archivados de una sesión inactiva, guardados como un único JSON comprimido
+    para mantener pequeña la tabla de ChatMessage. Los mensajes conservan su ID original.
+    """
+    session = models.OneToOneField(
+        ChatSession,
+        on_delete=models.CASCADE,
+        related_name='archive',
+        verbose_name="Sesión de Chat"
+    )
+    # JSON comprimido con zlib: lista de mensajes {id, sender, content, timestamp} en orden cronológico.
+    payload = models.BinaryField(verbose_name="Mensajes Comprimidos")
+    message_count = models.PositiveIntegerField(default=0, verbose_name="Cantidad de Mensajes")
+    last_message_at = models.DateTimeField(null=True, blank=True, verbose_name="Último Mensaje")
+    # ID del último mensaje archivado: versión del historial sin descomprimir el payload.
+    last_message_id = models.BigIntegerField(default=0, verbose_name="ID Último Mensaje")
+    archived_at = models.DateTimeField(auto_now=True, verbose_name="Archivado en")
+
+    class Meta:
+        verbose_name = "Archivo de Sesión de Chat"
+        verbose_name_plural = "Archivos de Sesiones de Chat"
+
+    def __str__(self):
+        return f"Archivo Sesión {self.session_id} ({self.message_count} mensajes)"
+
+    def get_messages(self) -> list[dict]:
+        if not self.payload:
+            return []
+        return json.loads(zlib.decompress(bytes(self.payload)))
+
+    def set_messages(self, messages: list[dict]) -> None:
+        self.payload = zlib.compress(json.dumps(messages, cls=DjangoJSONEncoder).encode(), 9)
+        self.message_count = len(messages)
+
+
+class AgentSchedule(models.Model):
+    """
+    Horario de atención de los agentes humanos, definido en una zona horaria concreta.
+    Si hay varios horarios activos, un agente se considera disponible si lo está en cualquiera.
+    """
+    name = models.CharField(max_length=100, verbose_name="Nombre")
+    # Zona horaria IANA en la que se interpretan las horas y feriados (ej. 'America/Santiago').
+    time_zone = models.CharField(
+        max_length=64,
+        default=settings.TIME_ZONE,
+        verbose_name="Zona Horaria",
+        help_text="Zona horaria IANA del horario (ej. 'America/Santiago')."
+    )
+    is_active = models.BooleanField(default=True, verbose_name="Activo")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+
+    class Meta:
+        verbose_name = "Horario de Atención"
+        verbose_name_plural = "Horarios de Atención"
+
+    def __str__(self):
+        return f"{self.name} ({self.time_zone})"
+
+    def clean(self):
+        try:
+            ZoneInfo(self.time_zone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValidationError({'time_zone': f"Zona horaria '{self.time_zone}' no válida."})
+
+
+class AgentWorkingHours(models.Model):
+    """
+    Tramo de atención de un día de la semana dentro de un horario.
+    Si la hora de término es menor o igual a la de inicio, el tramo termina al día siguiente.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Lunes'),
+        (1, 'Martes'),
+        (2, 'Miércoles'),
+        (3, 'Jueves'),
+        (4, 'Viernes'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+
+    schedule = models.ForeignKey(
+        AgentSchedule,
+        on_delete=models.CASCADE,
+        related_name='working_hours',
+        verbose_name="Horario"
+    )
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, verbose_name="Día de la Semana")
+    start_time = models.TimeField(verbose_name="Hora de Inicio")
+    end_time = models.TimeField(verbose_name="Hora de Término")
+
+    class Meta:
+        verbose_name = "Tramo de Atención"
+        verbose_name_plural = "Tramos de Atención"
+        ordering = ['weekday', 'start_time']
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class AgentHoliday(models.Model):
+    """
+    Día sin atención de agentes dentro de un horario (feriado o cierre puntual).
+    """
+    schedule = models.ForeignKey(
+        AgentSchedule,
+        on_delete=models.CASCADE,
+        related_name='holidays',
+        verbose_name="Horario"
+    )
+    date = models.DateField(verbose_name="Fecha")
+    description = models.CharField(max_length=255, blank=True, verbose_name="Descripción")
+
+    class Meta:
+        verbose_name = "Feriado"
+        verbose_name_plural = "Feriados"
+        ordering = ['date']
+        unique_together = ('schedule', 'date')
+
+    def __str__(self):
+        return f"{self.date} - {self.description or 'Feriado'}"
+
+
+class BotIntent(models.Model):
+    """
+    Regla del bot: si el mensaje del cliente contiene alguna de las frases clave,
+    se responde con la respuesta predefinida. Ante empate gana la de mayor prioridad.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Intención")
+    keywords = models.TextField(
+        verbose_name="Frases Clave",
+        help_text="Una frase por línea; se comparan sin mayúsculas ni tildes (ej. 'reembolso', 'donde esta mi pedido')."
+    )
+    response = models.TextField(verbose_name="Respuesta")
+    priority = models.PositiveSmallIntegerField(default=0, verbose_name="Prioridad")
+    is_active = models.BooleanField(default=True, verbose_name="Activa")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+
+    class Meta:
+        verbose_name = "Intención del Bot"
+        verbose_name_plural = "Intenciones del Bot"
+        ordering = ['-priority', 'name']
+
+    def __str__(self):
+        return self.name
+
+    def get_keyword_list(self) -> list[str]:
+        return [line.strip() for line in self.keywords.splitlines() if line.strip()]
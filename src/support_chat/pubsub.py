@@ -0,0 +1,124 @@
+"""
+Canal de publicación/suscripción para el envío en tiempo real (push) de eventos.
+Los suscriptores son corrutinas ASGI; los publicadores pueden ser vistas síncronas
+ejecutándose en otro hilo, por lo que la entrega se agenda en el loop de cada suscriptor.
+"""
+
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Callable
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """
+    Suscripción a un canal: cola propia ligada al loop en el que fue creada.
+    Se consume con `async for` y debe cerrarse con close() al desconectarse el cliente.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queued: int, on_close: Callable[['Subscription'], None]):
+        self.loop = loop
+        self._queue = asyncio.Queue(maxsize=max_queued)
+        self._on_close = on_close
+
+    def deliver(self, message: dict) -> None:
+        # Se ejecuta dentro del loop del suscriptor.
+        if self._queue.full():
+            # Cliente lento: se descarta el evento más antiguo; puede resincronizar con el cursor.
+            self._queue.get_nowait()
+        self._queue.put_nowait(message)
+
+    def close(self) -> None:
+        self._on_close(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        return await self._queue.get()
+
+
+class PubSubBackend(ABC):
+    """
+    Interfaz para los backends de pub/sub.
+    Un canal es un nombre arbitrario (ej. 'chat_session:42').
+    """
+
+    @abstractmethod
+    def publish(self, channel: str, message: dict) -> None:
+        """Entrega el mensaje a todos los suscriptores actuales del canal."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def subscribe(self, channel: str) -> Subscription:
+        """
+        Registra un suscriptor en el canal de inmediato. Debe llamarse desde una corrutina:
+        los mensajes publicados a partir de este momento quedan encolados en la suscripción.
+        """
+        raise NotImplementedError
+
+
+class InMemoryPubSubBackend(PubSubBackend):
+    """
+    Backend en memoria del proceso. Válido para un único worker de uvicorn;
+    con varios procesos debe reemplazarse por un backend respaldado por un broker.
+    """
+    MAX_QUEUED_MESSAGES = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, channel: str, message: dict) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró.
+                subscription.close()
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(
+            asyncio.get_running_loop(),
+            self.MAX_QUEUED_MESSAGES,
+            on_close=lambda sub: self._remove(channel, sub),
+        )
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def subscriber_count(self, channel: str) -> int:
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+    def _remove(self, channel: str, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(channel)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[channel]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_pubsub_backend() -> PubSubBackend:
+    """
+    Devuelve la instancia compartida del backend configurado en settings.PUBSUB_BACKEND.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_path = getattr(settings, 'PUBSUB_BACKEND', 'support_chat.pubsub.InMemoryPubSubBackend')
+                _backend = import_string(backend_path)()
+    return _backend
@@ -0,0 +1,190 @@
+"""
+Compilación y caché del horario de atención de los agentes.
+El horario se precalcula como una tabla ordenada de intervalos UTC para que la
+verificación de disponibilidad sea una búsqueda binaria que no consulta la base de datos.
+"""
+
+import threading
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from time import monotonic
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+from support_chat.models import AgentSchedule
+
+
+class CompiledSchedule:
+    """
+    Tabla de intervalos [inicio, término) de atención, en segundos epoch UTC,
+    disjuntos y ordenados, válida para el rango [valid_from, valid_until).
+    """
+
+    def __init__(self, intervals: list[tuple[float, float]], valid_from: float, valid_until: float,
+                 description: str = ''):
+        self.starts = [start for start, _ in intervals]
+        self.ends = [end for _, end in intervals]
+        self.valid_from = valid_from
+        self.valid_until = valid_until
+        # Texto legible del horario (ver describe_schedules), para las respuestas del bot.
+        self.description = description
+
+    def covers(self, timestamp: float) -> bool:
+        return self.valid_from <= timestamp < self.valid_until
+
+    def is_open(self, timestamp: float) -> bool:
+        index = bisect_right(self.starts, timestamp) - 1
+        return index >= 0 and timestamp < self.ends[index]
+
+
+def _merge_intervals(intervals: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _day_intervals(tz: ZoneInfo, day: date, hours: list[tuple[time, time]]) -> list[tuple[float, float]]:
+    intervals = []
+    for start_time, end_time in hours:
+        start = datetime.combine(day, start_time, tzinfo=tz)
+        end_day = day if end_time > start_time else day + timedelta(days=1)
+        end = datetime.combine(end_day, end_time, tzinfo=tz)
+        intervals.append((start.timestamp(), end.timestamp()))
+    return intervals
+
+
+def compile_schedule(schedules: list[dict], first_day: date, days: int) -> list[tuple[float, float]]:
+    """
+    Expande los horarios semanales a intervalos UTC concretos para `days` días desde `first_day`.
+    :param schedules: Horarios como dicts con 'time_zone', 'hours' (weekday -> [(inicio, término)])
+                      y 'holidays' (conjunto de fechas locales).
+    :return: Intervalos [inicio, término) en segundos epoch, disjuntos y ordenados.
+    """
+    intervals = []
+    for schedule in schedules:
+        tz = ZoneInfo(schedule['time_zone'])
+        # Se cubre un día extra por lado para absorber la diferencia de zona horaria con UTC.
+        for offset in range(-1, days + 1):
+            day = first_day + timedelta(days=offset)
+            if day in schedule['holidays']:
+                continue
+            intervals.extend(_day_intervals(tz, day, schedule['hours'].get(day.weekday(), [])))
+    return _merge_intervals(intervals)
+
+
+WEEKDAY_NAMES = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+
+
+def _format_time(value: time) -> str:
+    return f"{value.hour}:{value.minute:02d}"
+
+
+def describe_schedules(schedules: list[dict]) -> str:
+    """
+    Describe los horarios en texto (ej. 'lunes a viernes de 9:00 a 18:00'), agrupando
+    los días consecutivos con los mismos tramos.
+    :param schedules: Horarios con el formato de load_schedules().
+    """
+    parts = []
+    for schedule in schedules:
+        runs = []  # [primer día, último día, tramos]
+        for weekday in range(7):
+            hours = sorted(schedule['hours'].get(weekday, []))
+            if not hours:
+                continue
+            if runs and runs[-1][1] == weekday - 1 and runs[-1][2] == hours:
+                runs[-1][1] = weekday
+            else:
+                runs.append([weekday, weekday, hours])
+
+        for first, last, hours in runs:
+            if (first, last) == (0, 6):
+                days = 'todos los días'
+            elif first == last:
+                days = WEEKDAY_NAMES[first]
+            else:
+                days = f"{WEEKDAY_NAMES[first]} a {WEEKDAY_NAMES[last]}"
+            ranges = ' y '.join(f"de {_format_time(start)} a {_format_time(end)}" for start, end in hours)
+            zone = f" (hora de {schedule['time_zone']})" if schedule['time_zone'] != settings.TIME_ZONE else ''
+            parts.append(f"{days} {ranges} hrs.{zone}")
+    return '; '.join(parts)
+
+
+def load_schedules() -> list[dict]:
+    """
+    Lee los horarios activos desde la base de datos (tres consultas en total).
+    Sin horarios activos devuelve el horario por defecto: todos los días de
+    SUPPORT_CHAT_DEFAULT_BUSINESS_HOURS en la zona horaria del proyecto.
+    """
+    schedules = []
+    for schedule in AgentSchedule.objects.filter(is_active=True).prefetch_related('working_hours', 'holidays'):
+        hours = {}
+        for working_hours in schedule.working_hours.all():
+            hours.setdefault(working_hours.weekday, []).append((working_hours.start_time, working_hours.end_time))
+        schedules.append({
+            'time_zone': schedule.time_zone,
+            'hours': hours,
+            'holidays': {holiday.date for holiday in schedule.holidays.all()},
+        })
+    if schedules:
+        return schedules
+
+    start_hour, end_hour = settings.SUPPORT_CHAT_DEFAULT_BUSINESS_HOURS
+    default_hours = [(time(start_hour), time(end_hour))]
+    return [{
+        'time_zone': settings.TIME_ZONE,
+        'hours': {weekday: default_hours for weekday in range(7)},
+        'holidays': set(),
+    }]
+
+
+class AgentScheduleCache:
+    """
+    Caché en memoria del horario compilado.
+    Se recompila solo cuando se invalida (al modificar un horario en este proceso),
+    cuando la consulta cae fuera del rango precalculado o cuando vence el intervalo
+    de refresco, que acota cuánto tarda en verse un cambio hecho desde otro proceso.
+    """
+    HORIZON_DAYS = 14
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._compiled_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._compiled = None
+
+    def get(self, timestamp: float) -> CompiledSchedule:
+        compiled = self._compiled
+        if compiled is not None and compiled.covers(timestamp) and not self._is_stale():
+            return compiled
+        with self._lock:
+            compiled = self._compiled
+            if compiled is None or not compiled.covers(timestamp) or self._is_stale():
+                compiled = self._compile(timestamp)
+                self._compiled = compiled
+                self._compiled_at = monotonic()
+            return compiled
+
+    def _is_stale(self) -> bool:
+        return monotonic() - self._compiled_at > settings.SUPPORT_CHAT_SCHEDULE_REFRESH_SECONDS
+
+    def _compile(self, timestamp: float) -> CompiledSchedule:
+        first_day = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc).date() - timedelta(days=1)
+        schedules = load_schedules()
+        intervals = compile_schedule(schedules, first_day, self.HORIZON_DAYS)
+        valid_from = datetime.combine(first_day, time(), tzinfo=dt_timezone.utc).timestamp()
+        valid_until = valid_from + self.HORIZON_DAYS * 86400
+        return CompiledSchedule(intervals, valid_from, valid_until, describe_schedules(schedules))
+
+
+# Instancia compartida por el proceso; las señales de support_chat.signals la invalidan.
+agent_schedule_cache = AgentScheduleCache()
@@ -15,7 +15,9 @@ class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
         fields = ['id', 'session', 'sender', 'content', 'timestamp']
-        read_only_fields = ['id', 'sender', 'timestamp'] # El remitente y la marca de tiempo se gestionan por el sistema.
+        # El remitente y la marca de tiempo se gestionan por el sistema; la sesión se toma de la URL,
+        # lo que además evita validarla con una consulta extra.
+        read_only_fields = ['id', 'session', 'sender', 'timestamp']
 
 
 class ChatSessionSerializer(serializers.ModelSerializer):
@@ -30,3 +32,14 @@ class ChatSessionSerializer(serializers.ModelSerializer):
         model = ChatSession
         fields = ['id', 'created_at', 'updated_at', 'status', 'messages']
         read_only_fields = ['id', 'created_at', 'updated_at', 'status'] # Estos campos son gestionados por el sistema.
+
+
+class ChatSessionInfoSerializer(serializers.ModelSerializer):
+    """
+    Serializador para el modelo ChatSession sin sus mensajes.
+    Se usa cuando los mensajes se entregan paginados aparte.
+    """
+    class Meta:
+        model = ChatSession
+        fields = ['id', 'created_at', 'updated_at', 'status']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'status']
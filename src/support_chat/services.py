@@ -3,22 +3,40 @@ Módulo de servicios para la lógica de negocio de la aplicación support_chat.
 Contiene clases para gestionar la disponibilidad, respuestas y persistencia de chat.
 """
 
-from datetime import datetime, time
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from time import monotonic
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
 from django.utils import timezone # Importar timezone para manejar fechas conscientes de la zona horaria
-from django.db import models
-from support_chat.models import ChatSession, ChatMessage
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce
+from support_chat.bot import BotRuleCache, bot_rule_cache
+from support_chat.models import ChatSession, ChatMessage, ChatSessionArchive
+from support_chat.pubsub import PubSubBackend, get_pubsub_backend
+from support_chat.schedule import AgentScheduleCache, agent_schedule_cache
+from support_chat.serializers import ChatMessageSerializer
 
 
 class AgentAvailabilityService:
     """
-    Determina si los agentes humanos están disponibles basándose en el horario de atención.
+    Determina si los agentes humanos están disponibles según el horario de atención configurado
+    (AgentSchedule), precompilado y cacheado en memoria por support_chat.schedule.
     """
-    BUSINESS_START_HOUR = 9
-    BUSINESS_END_HOUR = 18
+    def __init__(self, schedule_cache: AgentScheduleCache | None = None):
+        """
+        :param schedule_cache: Caché del horario compilado; por defecto la compartida del proceso.
+        """
+        self._schedule_cache = schedule_cache or agent_schedule_cache
 
     def is_agent_available(self, current_time: datetime) -> bool:
         """
         Verifica si la hora actual está dentro del horario de atención.
+        Es una búsqueda binaria sobre el horario compilado; no consulta la base de datos
+        salvo cuando el horario debe recompilarse.
         :param current_time: Objeto datetime consciente de la zona horaria.
         :return: True si un agente está disponible, False en caso contrario.
         """
@@ -26,24 +44,38 @@ class AgentAvailabilityService:
         if not timezone.is_aware(current_time):
             current_time = timezone.make_aware(current_time, timezone.get_current_timezone())
 
-        start_time = current_time.replace(hour=self.BUSINESS_START_HOUR, minute=0, second=0, microsecond=0)
-        end_time = current_time.replace(hour=self.BUSINESS_END_HOUR, minute=0, second=0, microsecond=0)
-
-        return start_time <= current_time < end_time
+        timestamp = current_time.timestamp()
+        return self._schedule_cache.get(timestamp).is_open(timestamp)
 
 
 class BotService:
     """
-    Genera respuestas automáticas del bot.
+    Genera respuestas automáticas del bot a partir de las reglas BotIntent.
     """
+    # {hours} se completa con el horario de atención configurado (AgentSchedule).
+    DEFAULT_RESPONSE = "Hola, gracias por contactarnos. Nuestro horario de atención es: {hours} " \
+                       "Un agente revisará tu consulta el próximo día hábil."
+
+    def __init__(self, rule_cache: BotRuleCache | None = None, schedule_cache: AgentScheduleCache | None = None):
+        """
+        :param rule_cache: Caché del índice de intenciones; por defecto la compartida del proceso.
+        :param schedule_cache: Caché del horario compilado, para describirlo en la respuesta predefinida.
+        """
+        self._rule_cache = rule_cache or bot_rule_cache
+        self._schedule_cache = schedule_cache or agent_schedule_cache
+
     def get_bot_response(self, message_content: str) -> str:
         """
-        Devuelve una respuesta predefinida del bot.
-        :param message_content: Contenido del mensaje del cliente (no usado por ahora).
+        Devuelve la respuesta de la intención que coincide con el mensaje,
+        o la respuesta predefinida si ninguna coincide.
+        :param message_content: Contenido del mensaje del cliente.
         :return: Una cadena de texto con la respuesta del bot.
         """
-        return "Hola, gracias por contactarnos. Nuestro horario de atención es de 9:00 a 18:00 hrs. " \
-               "Un agente revisará tu consulta el próximo día hábil."
+        intent = self._rule_cache.get().match(message_content)
+        if intent is None:
+            schedule = self._schedule_cache.get(timezone.now().timestamp())
+            return self.DEFAULT_RESPONSE.format(hours=schedule.description or "sin atención de agentes por ahora.")
+        return intent['response']
 
 
 class AgentService:
@@ -59,19 +91,228 @@ class AgentService:
         return f"Gracias por tu mensaje, estamos revisando '{message_content}'. En breve te atenderá un agente."
 
 
+class _WatchedSession:
+    """
+    Estado de espera de una sesión: condición compartida, versión y lectores registrados.
+    """
+    def __init__(self, lock: threading.Lock):
+        self.condition = threading.Condition(lock)
+        self.version = 0
+        self.waiters = 0
+
+
+class SessionWatch:
+    """
+    Registro de un lector en espera (long-poll) de nuevos mensajes de una sesión.
+    """
+    def __init__(self, watched: _WatchedSession):
+        self._watched = watched
+        self._version = watched.version
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Bloquea el hilo hasta que se escriba un mensaje en la sesión o venza el plazo.
+        Detecta también las escrituras ocurridas desde que se abrió el registro.
+        :param timeout: Tiempo máximo de espera en segundos.
+        :return: True si hubo una escritura, False si venció el plazo.
+        """
+        deadline = monotonic() + timeout
+        with self._watched.condition:
+            while self._watched.version == self._version:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    return False
+                self._watched.condition.wait(remaining)
+        return True
+
+
+class MessageWakeupService:
+    """
+    Despierta a los lectores en long-poll cuando se escribe un mensaje en su sesión,
+    de modo que las salas inactivas no generen consultas mientras esperan.
+    Es local al proceso: solo despierta a lectores atendidos por el mismo proceso que escribe.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watched_sessions: dict[int, _WatchedSession] = {}
+
+    def notify(self, session_id: int) -> None:
+        """
+        Señala que hay mensajes nuevos en la sesión. No hace nada si nadie espera.
+        :param session_id: El ID de la sesión de chat.
+        """
+        with self._lock:
+            watched = self._watched_sessions.get(session_id)
+            if watched is None:
+                return
+            watched.version += 1
+            watched.condition.notify_all()
+
+    @contextmanager
+    def watch(self, session_id: int):
+        """
+        Registra un lector antes de que consulte la base de datos, para no perder
+        escrituras que ocurran entre esa consulta y el inicio de la espera.
+        :param session_id: El ID de la sesión de chat.
+        :return: Un SessionWatch sobre el que llamar a wait().
+        """
+        with self._lock:
+            watched = self._watched_sessions.get(session_id)
+            if watched is None:
+                watched = self._watched_sessions[session_id] = _WatchedSession(self._lock)
+            watched.waiters += 1
+            watch = SessionWatch(watched)
+        try:
+            yield watch
+        finally:
+            with self._lock:
+                watched.waiters -= 1
+                if watched.waiters == 0:
+                    del self._watched_sessions[session_id]
+
+
+# Instancia compartida por todo el proceso: escritores y lectores deben usar la misma.
+message_wakeup_service = MessageWakeupService()
+
+
+class MicroBatchingMessageWriter:
+    """
+    Agrupa las inserciones de mensajes de solicitudes concurrentes (de cualquier sesión)
+    en un único bulk_create, ejecutado por un hilo escritor dedicado.
+    Cada lote se confirma en su propia transacción, independiente de la del llamador, por lo
+    que no debe usarse dentro de un transaction.atomic() (MessagePersistenceService lo evita):
+    conviene solo bajo ráfagas de carga, a cambio de hasta max_delay de latencia extra.
+    """
+    def __init__(self, max_batch_size: int = 200, max_delay: float = 0.005, timeout: float | None = None):
+        """
+        :param max_batch_size: Cantidad máxima de mensajes por lote.
+        :param max_delay: Tiempo máximo (segundos) que se espera para completar un lote.
+        :param timeout: Tiempo máximo (segundos) que write() espera la confirmación del lote;
+                        por defecto SUPPORT_CHAT_MICRO_BATCH_TIMEOUT_SECONDS.
+        """
+        self._max_batch_size = max_batch_size
+        self._max_delay = max_delay
+        self._timeout = timeout
+        self._pending = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def write(self, messages: list[ChatMessage]) -> list[ChatMessage]:
+        """
+        Encola los mensajes y bloquea hasta que el lote que los contiene se persista.
+        :param messages: Mensajes sin guardar.
+        :return: Los mismos mensajes, ya con ID y marca de tiempo.
+        :raises TimeoutError: Si el lote no se confirmó a tiempo (puede confirmarse después).
+        :raises Exception: El error de base de datos del lote, si lo hubo.
+        """
+        future = Future()
+        self._pending.put((messages, future))
+        self._ensure_started()
+        timeout = self._timeout if self._timeout is not None else settings.SUPPORT_CHAT_MICRO_BATCH_TIMEOUT_SECONDS
+        return future.result(timeout=timeout)
+
+    def _ensure_started(self) -> None:
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='chat-message-batch-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._pending.get()]
+            size = len(batch[0][0])
+            deadline = monotonic() + self._max_delay
+            while size < self._max_batch_size:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._flush(batch)
+
+    def _flush(self, batch: list[tuple[list[ChatMessage], Future]]) -> None:
+        try:
+            with transaction.atomic():
+                ChatMessage.objects.bulk_create([message for messages, _ in batch for message in messages])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for messages, future in batch:
+                future.set_result(messages)
+        finally:
+            connection.close_if_unusable_or_obsolete()
+
+
 class MessagePersistenceService:
     """
     Gestiona la persistencia de mensajes de chat en la base de datos.
     """
+    def __init__(self, wakeup_service: MessageWakeupService | None = None,
+                 batch_writer: MicroBatchingMessageWriter | None = None):
+        """
+        :param wakeup_service: Notificador de lectores en espera; por defecto el compartido del proceso.
+        :param batch_writer: Escritor por micro-lotes opcional para save_messages; sin él,
+                             cada llamada hace su propio bulk_create.
+        """
+        self._wakeup_service = wakeup_service or message_wakeup_service
+        self._batch_writer = batch_writer
+
+    @property
+    def uses_batch_writer(self) -> bool:
+        """
+        True si save_messages escribe por micro-lotes: el llamador no debe abrir una transacción
+        alrededor, o la escritura vuelve a hacerse en línea dentro de ella.
+        """
+        return self._batch_writer is not None
+
     def save_message(self, session: ChatSession, sender: str, content: str) -> ChatMessage:
         """
-        Guarda un nuevo mensaje en la base de datos.
+        Guarda un nuevo mensaje en la base de datos y, al confirmarse la transacción,
+        despierta a los lectores que esperan mensajes de la sesión.
         :param session: La sesión de chat a la que pertenece el mensaje.
         :param sender: Quién envió el mensaje ('client', 'agent', 'bot').
         :param content: El contenido del mensaje.
         :return: El objeto ChatMessage creado.
         """
-        return ChatMessage.objects.create(session=session, sender=sender, content=content)
+        message = ChatMessage.objects.create(session=session, sender=sender, content=content)
+        transaction.on_commit(lambda: self._wakeup_service.notify(session.id))
+        return message
+
+    def save_messages(self, session: ChatSession, messages: list[tuple[str, str]]) -> list[ChatMessage]:
+        """
+        Guarda varios mensajes de una sesión en un único INSERT (bulk_create)
+        y despierta una sola vez a los lectores en espera.
+        Dentro de una transacción del llamador no se usa el escritor por micro-lotes: su lote
+        se confirmaría aunque la transacción se revierta (y en SQLite esperaría su bloqueo).
+        :param session: La sesión de chat a la que pertenecen los mensajes.
+        :param messages: Pares (remitente, contenido) en orden cronológico.
+        :return: Los objetos ChatMessage creados, en el mismo orden.
+        """
+        chat_messages = [
+            ChatMessage(session=session, sender=sender, content=content)
+            for sender, content in messages
+        ]
+        if self._batch_writer is not None and not connection.in_atomic_block:
+            chat_messages = self._batch_writer.write(chat_messages)
+        else:
+            chat_messages = ChatMessage.objects.bulk_create(chat_messages)
+        transaction.on_commit(lambda: self._wakeup_service.notify(session.id))
+        return chat_messages
+
+    def watch_session(self, session: ChatSession):
+        """
+        Registra al llamador como lector en espera de nuevos mensajes de la sesión.
+        :param session: La sesión de chat.
+        :return: Context manager que entrega un SessionWatch.
+        """
+        return self._wakeup_service.watch(session.id)
 
     def get_messages_for_session(self, session: ChatSession) -> models.QuerySet:
         """
@@ -81,6 +322,212 @@ class MessagePersistenceService:
         """
         return session.messages.all().order_by('timestamp')
 
+    def get_messages_since(self, session: ChatSession, after_id: int | None = None,
+                           after_timestamp: datetime | None = None) -> models.QuerySet:
+        """
+        Recupera solo los mensajes de la sesión posteriores al cursor indicado, incluidos los
+        archivados (ChatSessionArchive) si el cursor es anterior al último mensaje archivado.
+        Sin cursor devuelve el historial completo.
+        :param session: La sesión de chat.
+        :param after_id: ID del último mensaje que el cliente ya tiene.
+        :param after_timestamp: Marca de tiempo del último mensaje que el cliente ya tiene.
+        :return: Lista de ChatMessage ordenada por ID, el mismo orden del cursor after_id,
+                 para que el último mensaje recibido sea siempre el cursor siguiente.
+        """
+        archived = []
+        archive = ChatArchiveService.get_archive(session)
+        if (archive is not None and archive.last_message_id > (after_id or 0)
+                and (after_timestamp is None or archive.last_message_at > after_timestamp)):
+            # Los archivados son siempre anteriores a los vigentes: van primero.
+            archived = [
+                ChatArchiveService.to_chat_message(session, message)
+                for message in archive.get_messages()
+                if after_id is None or message['id'] > after_id
+            ]
+            if after_timestamp is not None:
+                archived = [message for message in archived if message.timestamp > after_timestamp]
+
+        messages = session.messages.all()
+        if after_id is not None:
+            messages = messages.filter(id__gt=after_id)
+        if after_timestamp is not None:
+            messages = messages.filter(timestamp__gt=after_timestamp)
+        return archived + list(messages.order_by('id'))
+
+    def get_messages_page(self, session: ChatSession, before_id: int | None = None,
+                          limit: int = 50) -> tuple[list[ChatMessage], bool]:
+        """
+        Recupera una página del historial de la sesión, de los más recientes a los más antiguos,
+        usando el ID como cursor (keyset) para que el costo no dependa de la antigüedad de la página.
+        :param session: La sesión de chat.
+        :param before_id: Devuelve solo mensajes con ID menor a este (None para la primera página).
+        :param limit: Cantidad máxima de mensajes de la página.
+        :return: Tupla (mensajes de la página, si quedan mensajes más antiguos).
+        """
+        messages = session.messages.all()
+        if before_id is not None:
+            messages = messages.filter(id__lt=before_id)
+        # Se pide un mensaje extra solo para saber si existe una página siguiente.
+        page = list(messages.order_by('-id')[:limit + 1])
+
+        # Los mensajes archivados son siempre más antiguos que los vigentes:
+        # completan la página solo cuando los vigentes no alcanzan.
+        if len(page) <= limit:
+            archive = ChatArchiveService.get_archive(session)
+            if archive is not None:
+                lower_id = page[-1].id if page else before_id
+                archived = [
+                    message for message in reversed(archive.get_messages())
+                    if lower_id is None or message['id'] < lower_id
+                ]
+                page += [
+                    ChatArchiveService.to_chat_message(session, message)
+                    for message in archived[:limit + 1 - len(page)]
+                ]
+        return page[:limit], len(page) > limit
+
+    def get_latest_message_id(self, session: ChatSession) -> int:
+        """
+        Devuelve el ID del mensaje más reciente de la sesión, vigente o archivado (0 si no tiene mensajes).
+        Sirve como versión barata del historial para construir el ETag.
+        No lee el archivo si la sesión se obtuvo con select_related('archive').
+        :param session: La sesión de chat.
+        :return: El ID del último mensaje persistido.
+        """
+        latest_id = session.messages.order_by('-id').values_list('id', flat=True).first()
+        archive = ChatArchiveService.get_archive(session)
+        return max(latest_id or 0, archive.last_message_id if archive is not None else 0)
+
+
+class ChatArchiveService:
+    """
+    Archiva los mensajes de sesiones inactivas en ChatSessionArchive (un JSON comprimido
+    por sesión) y los elimina de la tabla de ChatMessage.
+    """
+    def archive_inactive_sessions(self, retention_days: int, batch_size: int = 100) -> tuple[int, int]:
+        """
+        Archiva las sesiones cuyo último mensaje es anterior a la ventana de retención:
+        las cerradas y también las abiertas que quedaron inactivas.
+        Cada sesión se archiva en su propia transacción.
+        :param retention_days: Días de antigüedad que debe tener el último mensaje.
+        :param batch_size: Cantidad de sesiones que se leen por consulta.
+        :return: Tupla (sesiones archivadas, mensajes archivados).
+        """
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        archived_sessions = archived_messages = 0
+        last_id = 0
+        while True:
+            session_ids = list(
+                ChatSession.objects
+                .filter(id__gt=last_id)
+                .annotate(last_message_at=models.Max('messages__timestamp'))
+                .filter(last_message_at__lt=cutoff)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not session_ids:
+                break
+            for session_id in session_ids:
+                archived_messages += self.archive_session(session_id)
+                archived_sessions += 1
+            last_id = session_ids[-1]
+        return archived_sessions, archived_messages
+
+    @transaction.atomic
+    def archive_session(self, session_id: int) -> int:
+        """
+        Mueve los mensajes vigentes de la sesión a su archivo, agregándolos a los ya archivados.
+        :param session_id: El ID de la sesión de chat.
+        :return: Cantidad de mensajes movidos.
+        """
+        session = ChatSession.objects.select_for_update().get(id=session_id)
+        messages = list(session.messages.order_by('id'))
+        if not messages:
+            return 0
+
+        archive, _ = ChatSessionArchive.objects.get_or_create(session=session)
+        archived = archive.get_messages()
+        archived += [
+            {
+                'id': message.id,
+                'sender': message.sender,
+                'content': message.content,
+                'timestamp': message.timestamp.isoformat(),
+            }
+            for message in messages
+        ]
+        archive.set_messages(archived)
+        archive.last_message_at = messages[-1].timestamp
+        archive.last_message_id = messages[-1].id
+        archive.save()
+
+        session.messages.filter(id__lte=messages[-1].id).delete()
+        return len(messages)
+
+    @staticmethod
+    def get_archive(session: ChatSession) -> ChatSessionArchive | None:
+        """
+        Devuelve el archivo de la sesión, o None si no tiene.
+        No consulta la base de datos si la sesión se obtuvo con select_related('archive').
+        """
+        try:
+            return session.archive
+        except ChatSessionArchive.DoesNotExist:
+            return None
+
+    @staticmethod
+    def to_chat_message(session: ChatSession, message: dict) -> ChatMessage:
+        """
+        Reconstruye (sin guardar) un ChatMessage a partir de un mensaje archivado.
+        """
+        return ChatMessage(
+            id=message['id'],
+            session=session,
+            sender=message['sender'],
+            content=message['content'],
+            timestamp=parse_datetime(message['timestamp']),
+        )
+
+
+class ChatBroadcastService:
+    """
+    Difunde los mensajes persistidos a los suscriptores en tiempo real de cada sesión.
+    """
+    CHANNEL_PREFIX = 'chat_session'
+
+    def __init__(self, pubsub_backend: PubSubBackend | None = None):
+        """
+        :param pubsub_backend: Backend de pub/sub; por defecto el configurado en settings.
+        """
+        self._pubsub_backend = pubsub_backend
+
+    @classmethod
+    def channel_for_session(cls, session_id: int) -> str:
+        """
+        Devuelve el nombre del canal de pub/sub de una sesión.
+        """
+        return f"{cls.CHANNEL_PREFIX}:{session_id}"
+
+    def get_backend(self) -> PubSubBackend:
+        return self._pubsub_backend or get_pubsub_backend()
+
+    def broadcast_messages(self, session: ChatSession, messages: list[ChatMessage]) -> None:
+        """
+        Publica los mensajes una vez confirmada la transacción en curso,
+        para no notificar mensajes que terminen revertidos.
+        :param session: La sesión de chat.
+        :param messages: Mensajes ya persistidos, en orden cronológico.
+        """
+        payloads = [dict(ChatMessageSerializer(message).data) for message in messages]
+        channel = self.channel_for_session(session.id)
+
+        def publish():
+            backend = self.get_backend()
+            for payload in payloads:
+                backend.publish(channel, payload)
+
+        transaction.on_commit(publish)
+
 
 class ChatSessionService:
     """
@@ -93,14 +540,75 @@ class ChatSessionService:
         """
         return ChatSession.objects.create(status='open')
 
-    def get_session(self, session_id: int) -> ChatSession:
+    def get_session(self, session_id: int, with_archive: bool = False) -> ChatSession:
         """
         Recupera una sesión de chat por su ID.
         :param session_id: El ID de la sesión.
+        :param with_archive: Trae también su archivo (sin el contenido comprimido) en la misma consulta.
         :return: El objeto ChatSession.
         :raises ChatSession.DoesNotExist: Si la sesión no existe.
         """
-        return ChatSession.objects.get(id=session_id)
+        sessions = ChatSession.objects.all()
+        if with_archive:
+            sessions = sessions.select_related('archive').defer('archive__payload')
+        return sessions.get(id=session_id)
+
+    def list_sessions(self, status: str | None = None, cursor: str | None = None,
+                      limit: int = 20) -> tuple[list[ChatSession], str | None]:
+        """
+        Lista sesiones de las más recientes a las más antiguas, paginadas por cursor (keyset)
+        sobre (created_at, id), en una sola consulta. Cada sesión incluye las anotaciones
+        message_count y last_message_at, calculadas solo para las filas de la página.
+        :param status: Filtra por estado (ej. 'open', 'closed'); None para todas.
+        :param cursor: Cursor devuelto por la página anterior; None o inválido para la primera.
+        :param limit: Cantidad máxima de sesiones por página.
+        :return: Tupla (sesiones de la página, cursor de la página siguiente o None).
+        """
+        session_messages = ChatMessage.objects.filter(session=models.OuterRef('pk'))
+        # Los totales suman los mensajes vigentes y los archivados (ChatSessionArchive).
+        sessions = ChatSession.objects.annotate(
+            message_count=Coalesce(
+                models.Subquery(
+                    session_messages.order_by().values('session').annotate(count=models.Count('id')).values('count'),
+                    output_field=models.IntegerField(),
+                ),
+                0,
+            ) + Coalesce('archive__message_count', 0),
+            last_message_at=Coalesce(
+                models.Subquery(session_messages.order_by('-timestamp').values('timestamp')[:1]),
+                'archive__last_message_at',
+            ),
+        )
+        if status:
+            sessions = sessions.filter(status=status)
+
+        position = self._parse_cursor(cursor)
+        if position is not None:
+            created_at, session_id = position
+            sessions = sessions.filter(
+                models.Q(created_at__lt=created_at) | models.Q(created_at=created_at, id__lt=session_id)
+            )
+
+        page = list(sessions.order_by('-created_at', '-id')[:limit + 1])
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = f"{page[-1].created_at.isoformat()}~{page[-1].id}"
+        return page, next_cursor
+
+    @staticmethod
+    def _parse_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+        if not cursor:
+            return None
+        created_at, _, session_id = cursor.rpartition('~')
+        try:
+            created_at = datetime.fromisoformat(created_at)
+            session_id = int(session_id)
+        except ValueError:
+            return None
+        if not timezone.is_aware(created_at):
+            return None
+        return created_at, session_id
 
 
 class ChatOrchestratorService:
@@ -112,28 +620,27 @@ class ChatOrchestratorService:
                  bot_service: BotService,
                  agent_service: AgentService,
                  message_persistence_service: MessagePersistenceService,
-                 chat_session_service: ChatSessionService):
+                 chat_session_service: ChatSessionService,
+                 chat_broadcast_service: ChatBroadcastService | None = None):
         """
         Inicializa el orquestador con los servicios dependientes.
+        El servicio de difusión es opcional: sin él no se notifica a suscriptores en tiempo real.
         """
         self._agent_availability_service = agent_availability_service
         self._bot_service = bot_service
         self._agent_service = agent_service
         self._message_persistence_service = message_persistence_service
         self._chat_session_service = chat_session_service
+        self._chat_broadcast_service = chat_broadcast_service
 
-    def handle_incoming_message(self, session_id: int, client_message_content: str) -> ChatMessage:
+    def handle_incoming_message(self, session: ChatSession, client_message_content: str) -> ChatMessage:
         """
-        Procesa un mensaje entrante del cliente, genera una respuesta y la persiste.
-        :param session_id: El ID de la sesión de chat.
+        Procesa un mensaje entrante del cliente, genera una respuesta y persiste ambos
+        mensajes en una sola escritura.
+        :param session: La sesión de chat ya obtenida por el llamador.
         :param client_message_content: Contenido del mensaje del cliente.
         :return: El objeto ChatMessage de la respuesta generada (bot o agente).
         """
-        session = self._chat_session_service.get_session(session_id)
-
-        # Persistir el mensaje del cliente
-        self._message_persistence_service.save_message(session, 'client', client_message_content)
-
         # Determinar si el agente está disponible
         current_time = timezone.now()
         if self._agent_availability_service.is_agent_available(current_time):
@@ -145,9 +652,13 @@ class ChatOrchestratorService:
             response_content = self._bot_service.get_bot_response(client_message_content)
             response_sender = 'bot'
 
-        # Persistir la respuesta generada
-        response_message = self._message_persistence_service.save_message(
-            session, response_sender, response_content
+        # Persistir el mensaje del cliente y la respuesta generada en un único INSERT
+        client_message, response_message = self._message_persistence_service.save_messages(
+            session, [('client', client_message_content), (response_sender, response_content)]
         )
 
+        # Notificar a los suscriptores en tiempo real de la sesión
+        if self._chat_broadcast_service is not None:
+            self._chat_broadcast_service.broadcast_messages(session, [client_message, response_message])
+
         return response_message
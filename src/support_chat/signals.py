@@ -0,0 +1,26 @@
+"""
+Señales de la aplicación support_chat.
+Invalidan las cachés en memoria (horario de atención compilado e índice de intenciones
+del bot) cuando cambian los datos de los que se construyen. La invalidación espera a que
+se confirme la transacción: antes, otro hilo podría recompilar con los datos anteriores.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from support_chat.bot import bot_rule_cache
+from support_chat.models import AgentHoliday, AgentSchedule, AgentWorkingHours, BotIntent
+from support_chat.schedule import agent_schedule_cache
+
+
+@receiver([post_save, post_delete], sender=AgentSchedule)
+@receiver([post_save, post_delete], sender=AgentWorkingHours)
+@receiver([post_save, post_delete], sender=AgentHoliday)
+def invalidate_agent_schedule(sender, **kwargs):
+    transaction.on_commit(agent_schedule_cache.invalidate)
+
+
+@receiver([post_save, post_delete], sender=BotIntent)
+def invalidate_bot_rules(sender, **kwargs):
+    transaction.on_commit(bot_rule_cache.invalidate)
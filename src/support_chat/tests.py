@@ -0,0 +1,429 @@
+import subprocess
+import sys
+import threading
+from datetime import date, datetime, time
+from time import monotonic
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.test import (
+    AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+
+from support_chat import schedule as schedule_module
+from support_chat.bot import IntentIndex, bot_rule_cache
+from support_chat.models import AgentHoliday, AgentSchedule, AgentWorkingHours, BotIntent, ChatMessage
+from support_chat.schedule import agent_schedule_cache
+from support_chat.serializers import ChatMessageSerializer
+
+from support_chat.services import (
+    AgentAvailabilityService, BotService, ChatArchiveService, ChatBroadcastService, ChatSessionService,
+    MessagePersistenceService, MicroBatchingMessageWriter,
+)
+from support_chat.views import chat_session_stream
+
+
+class BenchSupportChatCommandTests(SimpleTestCase):
+    """
+    Corrida mínima de bench_support_chat. El comando crea y destruye su propia base de prueba,
+    por eso se ejecuta en otro proceso y no dentro de la base de esta prueba.
+    """
+
+    def test_tiny_run_reports_each_request_kind(self):
+        result = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), "bench_support_chat", "--rooms", "2",
+             "--duration", "0.5", "--post-interval", "0.1", "--poll-interval", "0.1", "--seed", "1"],
+            capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+        summary, header, _, *rows, total = result.stdout.splitlines()
+        self.assertTrue(summary.startswith("Salas: 2 |"), summary)
+        self.assertEqual(header.split(), ["tipo", "solicitudes", "errores", "p50", "ms", "p95", "ms", "p99", "ms",
+                                          "consultas/sol", "sol/s"])
+        self.assertEqual([row.split()[0] for row in rows], ["post", "poll"])
+        for row in rows:
+            kind, count, errors, p50, p95, p99, queries, rate = row.split()
+            self.assertGreater(int(count), 0, kind)
+            self.assertEqual(int(errors), 0, kind)
+            self.assertLessEqual(float(p50), float(p95))
+            self.assertLessEqual(float(p95), float(p99))
+            self.assertGreater(float(queries), 0)
+        self.assertTrue(total.startswith("Throughput total:"), total)
+
+
+class ChatMessageHistoryTests(TestCase):
+    """
+    Cursor incremental, ETag y lectura de los mensajes archivados en GET .../messages/.
+    """
+
+    def setUp(self):
+        self.session = ChatSessionService().create_session()
+        self.persistence = MessagePersistenceService()
+        self.url = reverse("support_chat:chat-message-list-create", kwargs={"session_id": self.session.id})
+
+    def add_messages(self, *contents):
+        return [self.persistence.save_message(self.session, "client", content) for content in contents]
+
+    def get(self, **params):
+        headers = {"If-None-Match": params.pop("etag")} if "etag" in params else {}
+        return self.client.get(self.url, params, headers=headers)
+
+    def contents(self, response):
+        return [message["content"] for message in response.json()]
+
+    def test_cursor_and_etag(self):
+        first, second, third = self.add_messages("uno", "dos", "tres")
+
+        response = self.get()
+        self.assertEqual(self.contents(response), ["uno", "dos", "tres"])
+        self.assertEqual(response["ETag"], f'"{self.session.id}-{third.id}"')
+        self.assertEqual(self.contents(self.get(after_id=first.id)), ["dos", "tres"])
+        self.assertEqual(self.get(etag=response["ETag"]).status_code, 304)
+
+        self.add_messages("cuatro")
+        response = self.get(etag=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contents(self.get(after_id=third.id)), ["cuatro"])
+
+    def test_archived_messages_are_read_through(self):
+        first, second = self.add_messages("uno", "dos")
+        etag = self.get()["ETag"]
+        self.assertEqual(ChatArchiveService().archive_session(self.session.id), 2)
+        self.assertFalse(self.session.messages.exists())
+
+        response = self.get()
+        self.assertEqual(self.contents(response), ["uno", "dos"])
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.get(etag=etag).status_code, 304)
+
+        self.add_messages("tres")
+        self.assertEqual(self.contents(self.get()), ["uno", "dos", "tres"])
+        self.assertEqual(self.contents(self.get(after_id=first.id)), ["dos", "tres"])
+        self.assertEqual(self.contents(self.get(after_id=second.id)), ["tres"])
+
+
+SANTIAGO = ZoneInfo("America/Santiago")
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+class AgentScheduleTests(TestCase):
+    """
+    Horario compilado: feriados, tramos que cruzan la medianoche, cambios de horario (DST)
+    y recompilación de la caché.
+    """
+
+    def setUp(self):
+        agent_schedule_cache.invalidate()
+        self.addCleanup(agent_schedule_cache.invalidate)
+        self.service = AgentAvailabilityService()
+
+    def create_schedule(self, time_zone, hours, holidays=()):
+        schedule = AgentSchedule.objects.create(name="Soporte", time_zone=time_zone)
+        AgentWorkingHours.objects.bulk_create([
+            AgentWorkingHours(schedule=schedule, weekday=weekday, start_time=start, end_time=end)
+            for weekday, ranges in hours.items() for start, end in ranges
+        ])
+        AgentHoliday.objects.bulk_create([AgentHoliday(schedule=schedule, date=day) for day in holidays])
+        return schedule
+
+    def is_open(self, year, month, day, hour, minute=0, tz=SANTIAGO):
+        return self.service.is_agent_available(datetime(year, month, day, hour, minute, tzinfo=tz))
+
+    def test_holiday_closes_the_whole_day(self):
+        weekdays = {weekday: [(time(9), time(18))] for weekday in range(5)}
+        self.create_schedule("America/Santiago", weekdays, holidays=[date(2026, 3, 2)])
+        self.assertFalse(self.is_open(2026, 3, 2, 12))
+        self.assertTrue(self.is_open(2026, 3, 3, 12))
+        self.assertFalse(self.is_open(2026, 3, 3, 18))  # El término no se incluye.
+
+    def test_range_past_midnight_ends_the_next_day(self):
+        self.create_schedule("America/Santiago", {4: [(time(22), time(2))]})  # Viernes 22:00 a sábado 2:00.
+        self.assertFalse(self.is_open(2026, 3, 6, 21, 59))
+        self.assertTrue(self.is_open(2026, 3, 6, 23))
+        self.assertTrue(self.is_open(2026, 3, 7, 1, 59))
+        self.assertFalse(self.is_open(2026, 3, 7, 2))
+
+    def test_hours_follow_the_schedule_time_zone_across_dst(self):
+        # Nueva York pasa de UTC-5 a UTC-4 el domingo 8 de marzo de 2026.
+        self.create_schedule("America/New_York", {weekday: [(time(9), time(18))] for weekday in range(7)})
+        utc = ZoneInfo("UTC")
+        self.assertTrue(self.is_open(2026, 3, 6, 14, 0, tz=utc))    # 9:00 EST.
+        self.assertFalse(self.is_open(2026, 3, 6, 13, 30, tz=utc))  # 8:30 EST.
+        self.assertTrue(self.is_open(2026, 3, 9, 13, 30, tz=utc))   # 9:30 EDT.
+        self.assertFalse(self.is_open(2026, 3, 9, 22, 0, tz=utc))   # 18:00 EDT.
+        self.assertTrue(self.is_open(2026, 3, 8, 9, 0, tz=NEW_YORK))
+
+    def test_cache_recompiles_outside_its_horizon_and_after_the_refresh_interval(self):
+        self.create_schedule("America/Santiago", {weekday: [(time(9), time(18))] for weekday in range(7)})
+        with self.assertNumQueries(3):
+            self.assertTrue(self.is_open(2026, 3, 2, 12))
+        with self.assertNumQueries(0):
+            self.assertFalse(self.is_open(2026, 3, 10, 20))
+        with self.assertNumQueries(3):
+            self.assertTrue(self.is_open(2026, 3, 2 + agent_schedule_cache.HORIZON_DAYS, 12))
+
+        with override_settings(SUPPORT_CHAT_SCHEDULE_REFRESH_SECONDS=60):
+            later = schedule_module.monotonic() + 61
+            with mock.patch.object(schedule_module, "monotonic", return_value=later), self.assertNumQueries(3):
+                self.is_open(2026, 3, 16, 12)
+
+    def test_holiday_invalidates_the_cache_once_committed(self):
+        schedule = self.create_schedule("America/Santiago", {0: [(time(9), time(18))]})
+        self.assertTrue(self.is_open(2026, 3, 2, 12))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            AgentHoliday.objects.create(schedule=schedule, date=date(2026, 3, 2))
+            # Antes de confirmar, otro hilo que recompilara vería aún los datos anteriores.
+            self.assertTrue(self.is_open(2026, 3, 2, 12))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(self.is_open(2026, 3, 2, 12))
+
+
+class IntentIndexTests(SimpleTestCase):
+    def intent(self, name, keywords, priority=0):
+        return {"name": name, "keywords": keywords, "response": name, "priority": priority}
+
+    def test_longest_phrase_then_priority_then_load_order(self):
+        index = IntentIndex([
+            self.intent("estado", ["mi pedido"]),
+            self.intent("cancelar", ["cancelar mi pedido"]),
+            self.intent("urgente", ["ayuda"], priority=5),
+            self.intent("ayuda", ["ayuda"], priority=1),
+            self.intent("ayuda_2", ["ayuda"], priority=1),
+        ], cache_size=16)
+        self.assertEqual(index.match("Quiero CANCELAR mi pedido!")["name"], "cancelar")
+        self.assertEqual(index.match("¿Dónde está mi pedido?")["name"], "estado")
+        self.assertEqual(index.match("ayuda por favor")["name"], "urgente")
+        self.assertIsNone(index.match("hola"))
+        self.assertIsNone(index.match(""))
+
+        tie = IntentIndex([self.intent("ayuda", ["ayuda"], 1), self.intent("ayuda_2", ["ayuda"], 1)], cache_size=16)
+        self.assertEqual(tie.match("ayuda")["name"], "ayuda")
+
+    def test_messages_are_cached_by_normalized_words(self):
+        index = IntentIndex([self.intent("reembolso", ["reembolso"])], cache_size=16)
+        index.match("Reembolso")
+        index.match("  reembolso!!")
+        info = index._match_words.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+
+class BotServiceTests(TestCase):
+    """
+    Respuestas con las intenciones sembradas por las migraciones 0005 y 0009.
+    """
+
+    def setUp(self):
+        bot_rule_cache.invalidate()
+        agent_schedule_cache.invalidate()
+        self.addCleanup(bot_rule_cache.invalidate)
+        self.addCleanup(agent_schedule_cache.invalidate)
+        self.service = BotService()
+
+    def response_of(self, name):
+        return BotIntent.objects.get(name=name).response
+
+    def test_seeded_intents_match(self):
+        self.assertEqual(self.service.get_bot_response("¿Dónde está mi pedido?"), self.response_of("estado_pedido"))
+        self.assertEqual(self.service.get_bot_response("Quiero cancelar mi pedido"), self.response_of("reembolso"))
+        self.assertEqual(self.service.get_bot_response("cuanto tarda el ENVÍO"), self.response_of("envio"))
+
+    def test_no_match_describes_the_schedule(self):
+        response = self.service.get_bot_response("hola")
+        self.assertIn("todos los días de 9:00 a 18:00 hrs.", response)
+        self.assertTrue(response.startswith("Hola, gracias por contactarnos."))
+
+    def test_index_is_rebuilt_once_an_intent_change_commits(self):
+        self.assertNotEqual(self.service.get_bot_response("quiero una factura"), "Enviamos la factura por correo.")
+        with self.captureOnCommitCallbacks() as callbacks:
+            BotIntent.objects.create(name="factura", keywords="factura", response="Enviamos la factura por correo.")
+        self.assertNotEqual(self.service.get_bot_response("quiero una factura"), "Enviamos la factura por correo.")
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.service.get_bot_response("quiero una factura"), "Enviamos la factura por correo.")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BotIntent.objects.get(name="factura").delete()
+        self.assertNotEqual(self.service.get_bot_response("quiero una factura"), "Enviamos la factura por correo.")
+
+
+class ChatSessionStreamTests(TestCase):
+    """
+    Canal SSE: reanuda desde Last-Event-ID y luego entrega lo publicado en el canal de la sesión.
+    """
+
+    def setUp(self):
+        self.session = ChatSessionService().create_session()
+        persistence = MessagePersistenceService()
+        self.first = persistence.save_message(self.session, "client", "uno")
+        self.second = persistence.save_message(self.session, "bot", "dos")
+        self.url = reverse("support_chat:chat-session-stream", kwargs={"session_id": self.session.id})
+
+    def test_requires_asgi(self):
+        self.assertEqual(self.client.get(self.url).status_code, 501)
+
+    async def test_pending_messages_then_published_ones(self):
+        request = AsyncRequestFactory().get(self.url, headers={"Last-Event-ID": str(self.first.id)})
+        response = await chat_session_stream(request, self.session.id)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        try:
+            event = (await anext(stream)).decode()
+            self.assertTrue(event.startswith(f"id: {self.second.id}\n"), event)
+            self.assertIn('"content": "dos"', event)
+
+            third = await sync_to_async(MessagePersistenceService().save_message)(self.session, "agent", "tres")
+            payload = dict(await sync_to_async(lambda: ChatMessageSerializer(third).data)())
+            backend = ChatBroadcastService().get_backend()
+            channel = ChatBroadcastService.channel_for_session(self.session.id)
+            # Lo ya enviado se descarta aunque vuelva a publicarse.
+            backend.publish(channel, dict(payload, id=self.second.id))
+            backend.publish(channel, payload)
+            event = (await anext(stream)).decode()
+            self.assertTrue(event.startswith(f"id: {third.id}\n"), event)
+            self.assertIn('"content": "tres"', event)
+        finally:
+            await stream.aclose()
+
+
+class ChatMessageLongPollTests(TransactionTestCase):
+    """
+    ?wait=N: la espera termina en cuanto otro hilo confirma un mensaje en la sesión.
+    """
+
+    def setUp(self):
+        self.session = ChatSessionService().create_session()
+        self.persistence = MessagePersistenceService()
+        self.last = self.persistence.save_message(self.session, "client", "uno")
+        self.url = reverse("support_chat:chat-message-list-create", kwargs={"session_id": self.session.id})
+
+    def save_later(self, content, delay):
+        def save():
+            try:
+                self.persistence.save_message(self.session, "agent", content)
+            finally:
+                connection.close()
+        timer = threading.Timer(delay, save)
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def test_wait_is_woken_by_a_new_message(self):
+        self.save_later("dos", 0.2)
+        started = monotonic()
+        response = self.client.get(self.url, {"after_id": self.last.id, "wait": 10})
+        self.assertLess(monotonic() - started, 5)
+        self.assertEqual([message["content"] for message in response.json()], ["dos"])
+
+    def test_wait_times_out_without_messages(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, {"wait": 0.2}, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_wait_is_ignored_under_asgi(self):
+        started = monotonic()
+        response = await self.async_client.get(self.url, {"after_id": self.last.id, "wait": 10})
+        self.assertLess(monotonic() - started, 5)
+        self.assertEqual(response.json(), [])
+
+
+class ChatSessionHistoryPageTests(TestCase):
+    """
+    Páginas del historial con el cursor before_id, incluidas las que terminan en mensajes archivados.
+    """
+
+    def setUp(self):
+        self.session = ChatSessionService().create_session()
+        self.persistence = MessagePersistenceService()
+        self.url = reverse("support_chat:chat-session-detail", kwargs={"session_id": self.session.id})
+
+    def add_messages(self, *contents):
+        return [self.persistence.save_message(self.session, "client", content) for content in contents]
+
+    def page(self, **params):
+        data = self.client.get(self.url, params).json()
+        return [message["content"] for message in data["messages"]], data["pagination"]
+
+    def test_pages_follow_the_cursor(self):
+        self.add_messages("1", "2", "3", "4", "5")
+        contents, pagination = self.page(limit=2)
+        self.assertEqual(contents, ["5", "4"])
+        self.assertTrue(pagination["has_more"])
+
+        contents, pagination = self.page(limit=2, before_id=pagination["next_before_id"])
+        self.assertEqual(contents, ["3", "2"])
+        self.assertTrue(pagination["has_more"])
+
+        contents, pagination = self.page(limit=2, before_id=pagination["next_before_id"])
+        self.assertEqual(contents, ["1"])
+        self.assertEqual(pagination, {"limit": 2, "has_more": False, "next_before_id": None})
+
+    def test_exact_last_page_has_no_next_cursor(self):
+        self.add_messages("1", "2", "3", "4")
+        contents, pagination = self.page(limit=2)
+        contents, pagination = self.page(limit=2, before_id=pagination["next_before_id"])
+        self.assertEqual(contents, ["2", "1"])
+        self.assertFalse(pagination["has_more"])
+        self.assertIsNone(pagination["next_before_id"])
+
+    def test_archived_messages_complete_the_pages(self):
+        self.add_messages("1", "2", "3")
+        ChatArchiveService().archive_session(self.session.id)
+        self.add_messages("4", "5")
+
+        contents, pagination = self.page(limit=3)
+        self.assertEqual(contents, ["5", "4", "3"])
+        self.assertTrue(pagination["has_more"])
+        contents, pagination = self.page(limit=3, before_id=pagination["next_before_id"])
+        self.assertEqual(contents, ["2", "1"])
+        self.assertFalse(pagination["has_more"])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {"before_id": "abc"}).status_code, 400)
+
+
+class MicroBatchingMessageWriterTests(TransactionTestCase):
+    """
+    Los mensajes de solicitudes concurrentes se confirman en un único bulk_create del hilo escritor.
+    """
+
+    def setUp(self):
+        self.sessions = [ChatSessionService().create_session() for _ in range(3)]
+        self.writer = MicroBatchingMessageWriter(max_delay=0.5)
+        self.persistence = MessagePersistenceService(batch_writer=self.writer)
+
+    def test_concurrent_writes_share_one_insert(self):
+        barrier = threading.Barrier(len(self.sessions))
+        saved = {}
+
+        def post(session):
+            barrier.wait()
+            saved[session.id] = self.persistence.save_messages(session, [("client", "hola"), ("bot", "respuesta")])
+
+        threads = [threading.Thread(target=post, args=(session,)) for session in self.sessions]
+        with mock.patch.object(ChatMessage.objects, "bulk_create", wraps=ChatMessage.objects.bulk_create) as bulk_create:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(bulk_create.call_count, 1)
+        self.assertEqual(len(bulk_create.call_args.args[0]), 6)
+        for session in self.sessions:
+            messages = saved[session.id]
+            self.assertTrue(all(message.pk for message in messages))
+            self.assertEqual(
+                list(session.messages.order_by("id").values_list("id", "sender")),
+                [(message.pk, message.sender) for message in messages],
+            )
+
+    def test_inside_a_transaction_writes_inline(self):
+        with mock.patch.object(self.writer, "write") as write, transaction.atomic():
+            messages = self.persistence.save_messages(self.sessions[0], [("client", "hola")])
+        write.assert_not_called()
+        self.assertTrue(ChatMessage.objects.filter(pk=messages[0].pk).exists())
@@ -4,7 +4,7 @@ Mapea las rutas de la API a las vistas correspondientes.
 """
 
 from django.urls import path
-from src.support_chat.views import ChatSessionAPIView, ChatMessageAPIView, chat_session_list,create_chat_session,chat_room
+from src.support_chat.views import ChatSessionAPIView, ChatMessageAPIView, chat_session_list,create_chat_session,chat_room,chat_session_stream
 
 app_name = 'support_chat'
 
@@ -14,6 +14,8 @@ urlpatterns = [
     # Rutas para obtener una sesión específica y enviar/recibir mensajes.
     path('api/sessions/<int:session_id>/', ChatSessionAPIView.as_view(), name='chat-session-detail'),
     path('api/sessions/<int:session_id>/messages/', ChatMessageAPIView.as_view(), name='chat-message-list-create'),
+    # Canal en tiempo real (Server-Sent Events) de una sesión; requiere servir la app vía ASGI.
+    path('api/sessions/<int:session_id>/stream/', chat_session_stream, name='chat-session-stream'),
 
       path("sessions/", chat_session_list, name="chat_session_list"),
       path("sessions/new/", create_chat_session, name="create_session"),
@@ -2,18 +2,31 @@
 Vistas de la API para la aplicación support_chat.
 Manejan las solicitudes HTTP para sesiones de chat y mensajes.
 """
+import asyncio
+import json
+import math
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.db import transaction # Para asegurar la atomicidad en operaciones.
+from django.conf import settings
 from django.shortcuts import render, redirect
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from support_chat.models import ChatSession
-from support_chat.serializers import ChatSessionSerializer, ChatMessageSerializer
+from support_chat.serializers import ChatSessionSerializer, ChatSessionInfoSerializer, ChatMessageSerializer
 from support_chat.services import (
     AgentAvailabilityService, BotService, AgentService,
-    MessagePersistenceService, ChatSessionService, ChatOrchestratorService
+    MessagePersistenceService, ChatSessionService, ChatOrchestratorService, ChatBroadcastService,
+    MicroBatchingMessageWriter
 )
 
 
@@ -38,31 +51,64 @@ class ChatSessionAPIView(APIView):
             serializer = ChatSessionSerializer(session)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    # Tamaño de página por defecto y máximo del historial de mensajes.
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+
     def get(self, request, session_id):
         """
-        Obtiene los detalles de una sesión de chat específica.
+        Obtiene los detalles de una sesión de chat específica con una página de su historial,
+        de los mensajes más recientes a los más antiguos.
+        Parámetros opcionales: ?before_id= (cursor devuelto en next_before_id) y ?limit=.
         """
-        session = get_object_or_404(ChatSession, id=session_id)
-        # Asegurarse de que los mensajes se carguen para el serializador.
-        session_with_messages = ChatSession.objects.prefetch_related('messages').get(id=session_id)
-        serializer = ChatSessionSerializer(session_with_messages)
-        return Response(serializer.data)
+        try:
+            before_id = request.query_params.get('before_id')
+            before_id = int(before_id) if before_id is not None else None
+            limit = int(request.query_params.get('limit', self.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response({"detail": "Los parámetros before_id y limit deben ser enteros."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), self.MAX_PAGE_SIZE)
+
+        # El archivo (si existe) viene en la misma consulta; su contenido comprimido solo se lee si hace falta.
+        session = get_object_or_404(
+            ChatSession.objects.select_related('archive').defer('archive__payload'), id=session_id
+        )
+        messages, has_more = self._message_persistence_service.get_messages_page(
+            session, before_id=before_id, limit=limit
+        )
+
+        data = ChatSessionInfoSerializer(session).data
+        data['messages'] = ChatMessageSerializer(messages, many=True).data
+        data['pagination'] = {
+            'limit': limit,
+            'has_more': has_more,
+            'next_before_id': messages[-1].id if has_more else None,
+        }
+        return Response(data)
 
 
 class ChatMessageAPIView(APIView):
     """
     Vista para enviar mensajes a una sesión de chat y obtener todos los mensajes de una sesión.
     """
+    # Persistencia de los mensajes enviados (por micro-lotes si SUPPORT_CHAT_MICRO_BATCH_WRITES)
+    _message_writer_service = MessagePersistenceService(
+        batch_writer=MicroBatchingMessageWriter() if settings.SUPPORT_CHAT_MICRO_BATCH_WRITES else None
+    )
     # Inyección de dependencias para el orquestador de chat
     _chat_orchestrator_service = ChatOrchestratorService(
         agent_availability_service=AgentAvailabilityService(),
         bot_service=BotService(),
         agent_service=AgentService(),
-        message_persistence_service=MessagePersistenceService(),
-        chat_session_service=ChatSessionService()
+        message_persistence_service=_message_writer_service,
+        chat_session_service=ChatSessionService(),
+        chat_broadcast_service=ChatBroadcastService()
     )
     _message_persistence_service = MessagePersistenceService() # También se necesita para listar mensajes
     _chat_session_service = ChatSessionService() # Para obtener la sesión antes de listar mensajes
+    # Tope de espera del modo long-poll (?wait=N), en segundos.
+    MAX_WAIT_SECONDS = 30
 
     def post(self, request, session_id):
         """
@@ -77,10 +123,12 @@ class ChatMessageAPIView(APIView):
         if serializer.is_valid():
             client_message_content = serializer.validated_data['content']
 
-            with transaction.atomic():
+            # El escritor por micro-lotes confirma en su propia transacción: no se abre una aquí.
+            atomic = nullcontext() if self._message_writer_service.uses_batch_writer else transaction.atomic()
+            with atomic:
                 # El orquestador maneja la persistencia del mensaje del cliente y la respuesta.
                 response_message = self._chat_orchestrator_service.handle_incoming_message(
-                    session_id, client_message_content
+                    session, client_message_content
                 )
                 response_serializer = ChatMessageSerializer(response_message)
                 return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -88,21 +136,157 @@ class ChatMessageAPIView(APIView):
 
     def get(self, request, session_id):
         """
-        Obtiene todos los mensajes para una sesión de chat específica.
+        Obtiene los mensajes de una sesión de chat específica.
+        Acepta los cursores opcionales ?after_id= y ?after_timestamp= para devolver solo
+        los mensajes nuevos, y responde 304 si el ETag enviado en If-None-Match sigue vigente.
+        Con ?wait=N (long-poll) espera hasta N segundos a que llegue un mensaje nuevo
+        antes de responder; la espera no consulta la base de datos.
+        Servida por ASGI, ?wait se ignora y se responde de inmediato: allí se usa el canal SSE.
+        Los mensajes archivados se leen desde ChatSessionArchive.
         """
         try:
-            session = self._chat_session_service.get_session(session_id)
+            session = self._chat_session_service.get_session(session_id, with_archive=True)
         except ChatSession.DoesNotExist:
             return Response({"detail": "Sesión de chat no encontrada."}, status=status.HTTP_404_NOT_FOUND)
 
-        messages = self._message_persistence_service.get_messages_for_session(session)
+        after_id = request.query_params.get('after_id')
+        if after_id is not None:
+            try:
+                after_id = int(after_id)
+            except ValueError:
+                return Response({"detail": "El parámetro after_id debe ser un entero."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        after_timestamp = request.query_params.get('after_timestamp')
+        if after_timestamp is not None:
+            try:
+                after_timestamp = parse_datetime(after_timestamp)
+            except ValueError:
+                after_timestamp = None
+            if after_timestamp is None:
+                return Response({"detail": "El parámetro after_timestamp debe ser una fecha ISO 8601."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if not timezone.is_aware(after_timestamp):
+                after_timestamp = timezone.make_aware(after_timestamp, timezone.get_current_timezone())
+
+        wait = request.query_params.get('wait')
+        if wait is not None:
+            try:
+                wait = float(wait)
+                if math.isnan(wait):
+                    raise ValueError(wait)
+            except ValueError:
+                return Response({"detail": "El parámetro wait debe ser un número de segundos."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            wait = min(max(wait, 0), self.MAX_WAIT_SECONDS)
+            if isinstance(request._request, ASGIRequest):
+                # Bajo ASGI las vistas síncronas comparten hilo: esperar bloquearía a todas.
+                # Esos clientes deben usar el canal SSE (api/sessions/<id>/stream/).
+                wait = None
+
+        if_none_match = request.headers.get('If-None-Match')
+        with self._message_persistence_service.watch_session(session) as watch:
+            # El ETag identifica la versión del historial por el último mensaje persistido.
+            latest_id = self._message_persistence_service.get_latest_message_id(session)
+            etag = f'"{session.id}-{latest_id}"'
+            nothing_new = if_none_match == etag or (after_id is not None and latest_id <= after_id)
+            if wait and nothing_new and watch.wait(wait):
+                # Un escritor señaló un mensaje nuevo: releer la versión una sola vez.
+                latest_id = self._message_persistence_service.get_latest_message_id(session)
+                etag = f'"{session.id}-{latest_id}"'
+
+        if if_none_match == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        messages = self._message_persistence_service.get_messages_since(
+            session, after_id=after_id, after_timestamp=after_timestamp
+        )
         serializer = ChatMessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': etag})
+
+
+# Intervalo (segundos) entre comentarios keep-alive del stream SSE, para que
+# proxies y navegadores no cierren una conexión sin tráfico.
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _format_sse_event(payload: dict) -> str:
+    return f"id: {payload['id']}\ndata: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def _chat_event_stream(session: ChatSession, after_id: int):
+    """
+    Genera los eventos SSE de una sesión: primero los mensajes posteriores al cursor
+    y luego, sin consultar la base de datos, los que se publiquen en el canal de la sesión.
+    """
+    broadcast_service = ChatBroadcastService()
+    # Suscribirse antes de leer el pendiente para no perder mensajes entre ambas fases.
+    subscription = broadcast_service.get_backend().subscribe(
+        broadcast_service.channel_for_session(session.id)
+    )
+    try:
+        last_id = after_id
+        pending = await sync_to_async(MessagePersistenceService().get_messages_since)(session, after_id=after_id)
+        for message in pending:
+            yield _format_sse_event(ChatMessageSerializer(message).data)
+            last_id = message.id
+
+        while True:
+            try:
+                payload = await asyncio.wait_for(anext(subscription), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if payload['id'] <= last_id:
+                continue
+            yield _format_sse_event(payload)
+            last_id = payload['id']
+    finally:
+        subscription.close()
+
+
+async def chat_session_stream(request, session_id):
+    """
+    GET /support_chat/api/sessions/<session_id>/stream/
+    Envía los mensajes de la sesión en tiempo real como Server-Sent Events.
+    Reanuda desde la cabecera Last-Event-ID o el parámetro ?after_id=.
+    Solo funciona servido por ASGI (ej. `uvicorn project.asgi:application`).
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "El canal en tiempo real requiere un servidor ASGI."},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    try:
+        session = await ChatSession.objects.select_related('archive').defer('archive__payload').aget(id=session_id)
+    except ChatSession.DoesNotExist:
+        return JsonResponse({"detail": "Sesión de chat no encontrada."}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        after_id = int(request.headers.get('Last-Event-ID') or request.GET.get('after_id') or 0)
+    except ValueError:
+        return JsonResponse({"detail": "El cursor after_id debe ser un entero."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(_chat_event_stream(session, after_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Sesiones por página en el listado de la consola de agentes.
+SESSION_LIST_PAGE_SIZE = 20
 
 
 def chat_session_list(request):
-    sessions = ChatSession.objects.all()
-    return render(request, "support_chat/chat_session_list.html", {"sessions": sessions})
+    status_filter = request.GET.get("status") or None
+    sessions, next_cursor = ChatSessionService().list_sessions(
+        status=status_filter, cursor=request.GET.get("cursor"), limit=SESSION_LIST_PAGE_SIZE
+    )
+    return render(request, "support_chat/chat_session_list.html", {
+        "sessions": sessions,
+        "status_filter": status_filter,
+        "next_cursor": next_cursor,
+    })
 
 def create_chat_session(request):
     if request.method == "POST":
@@ -0,0 +1,146 @@
+"""
+Analítica de operaciones sobre los pedidos en tránsito.
+Carga las coordenadas de todos los pedidos activos en arreglos de NumPy con una sola
+consulta y calcula distancias y agregados de forma vectorizada, sin iterar fila a fila.
+NumPy es una dependencia opcional: sin ella, `is_available()` devuelve False.
+"""
+
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from tracking.geo import EARTH_RADIUS_METERS
+from tracking.models import DeliveryPerson, OrderLocation
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depende del entorno
+    np = None
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+def haversine_meters_array(lat1, lon1, lat2, lon2):
+    """
+    Versión vectorizada de tracking.geo.haversine_meters sobre arreglos en grados.
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lon2 - lon1)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+
+class ActiveOrderPositions:
+    """
+    Columnas de los pedidos en tránsito con ubicación: order_id, id del repartidor (0 sin
+    repartidor), posición actual y destino (NaN si aún no se geocodifica).
+    """
+
+    def __init__(self, order_ids, driver_pks, latitudes, longitudes, destination_latitudes, destination_longitudes):
+        self.order_ids = order_ids
+        self.driver_pks = driver_pks
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.destination_latitudes = destination_latitudes
+        self.destination_longitudes = destination_longitudes
+
+    @classmethod
+    def load(cls) -> 'ActiveOrderPositions':
+        """
+        Lee las columnas con una sola consulta; los decimales se convierten a float en SQL.
+        """
+        rows = list(
+            OrderLocation.objects
+            .filter(order__status="IN_TRANSIT")
+            .annotate(
+                lat=Cast("latitude", FloatField()),
+                lon=Cast("longitude", FloatField()),
+                dest_lat=Cast("order__destination_latitude", FloatField()),
+                dest_lon=Cast("order__destination_longitude", FloatField()),
+                driver_pk=F("order__delivery_person_id"),
+            )
+            .values_list("order__order_id", "driver_pk", "lat", "lon", "dest_lat", "dest_lon")
+        )
+        count = len(rows)
+        order_ids, driver_pks, lats, lons, dest_lats, dest_lons = zip(*rows) if rows else ((),) * 6
+        return cls(
+            np.array(order_ids, dtype=object),
+            np.fromiter((pk or 0 for pk in driver_pks), dtype=np.int64, count=count),
+            np.fromiter(lats, dtype=np.float64, count=count),
+            np.fromiter(lons, dtype=np.float64, count=count),
+            np.fromiter((value if value is not None else np.nan for value in dest_lats), dtype=np.float64, count=count),
+            np.fromiter((value if value is not None else np.nan for value in dest_lons), dtype=np.float64, count=count),
+        )
+
+    def __len__(self) -> int:
+        return len(self.order_ids)
+
+    def distances_to_destination(self):
+        """
+        :return: Distancia en metros de cada pedido a su destino (NaN sin destino).
+        """
+        return haversine_meters_array(self.latitudes, self.longitudes,
+                                      self.destination_latitudes, self.destination_longitudes)
+
+
+def summarize_active_orders(min_distance_km: float, limit: int) -> dict:
+    """
+    Resumen de los pedidos en tránsito para el panel de operaciones:
+    - distribución de la distancia al destino,
+    - pedidos a más de `min_distance_km` de su destino (los `limit` más lejanos),
+    - cantidad de pedidos y distancia promedio/máxima por repartidor (los `limit` con
+      mayor distancia promedio).
+    """
+    positions = ActiveOrderPositions.load()
+    distances_km = positions.distances_to_destination() / 1000
+    has_destination = ~np.isnan(distances_km)
+    known = distances_km[has_destination]
+
+    far_mask = has_destination & (distances_km > min_distance_km)
+    far_indexes = np.flatnonzero(far_mask)
+    far_indexes = far_indexes[np.argsort(-distances_km[far_indexes], kind="stable")][:limit]
+
+    drivers = []
+    assigned = has_destination & (positions.driver_pks > 0)
+    if assigned.any():
+        driver_pks, inverse = np.unique(positions.driver_pks[assigned], return_inverse=True)
+        driver_distances = distances_km[assigned]
+        counts = np.bincount(inverse)
+        means = np.bincount(inverse, weights=driver_distances) / counts
+        maxima = np.full(len(driver_pks), -np.inf)
+        np.maximum.at(maxima, inverse, driver_distances)
+
+        top = np.argsort(-means, kind="stable")[:limit]
+        driver_ids = DeliveryPerson.objects.in_bulk(driver_pks[top].tolist())
+        drivers = [
+            {
+                "driver_id": driver_ids[int(driver_pks[index])].driver_id,
+                "orders": int(counts[index]),
+                "mean_distance_km": round(float(means[index]), 3),
+                "max_distance_km": round(float(maxima[index]), 3),
+            }
+            for index in top
+            if int(driver_pks[index]) in driver_ids
+        ]
+
+    return {
+        "active_orders": len(positions),
+        "with_destination": int(has_destination.sum()),
+        "distance_km": {
+            "mean": round(float(known.mean()), 3) if known.size else None,
+            "p50": round(float(np.percentile(known, 50)), 3) if known.size else None,
+            "p95": round(float(np.percentile(known, 95)), 3) if known.size else None,
+            "max": round(float(known.max()), 3) if known.size else None,
+        },
+        "far_orders": {
+            "min_distance_km": min_distance_km,
+            "count": int(far_mask.sum()),
+            "orders": [
+                {"order_id": positions.order_ids[index], "distance_km": round(float(distances_km[index]), 3)}
+                for index in far_indexes
+            ],
+        },
+        "drivers": drivers,
+    }
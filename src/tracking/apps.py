@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TrackingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracking'
+
+    def ready(self):
+        # Registrar las señales que invalidan la caché de última posición.
+        from tracking import signals  # noqa: F401
@@ -0,0 +1,96 @@
+"""
+Caché en memoria de la última posición conocida de cada pedido.
+TrackingService la llena al escribir una ubicación (write-through) y la consulta al
+responder el seguimiento, de modo que los sondeos de los clientes no van a la base de datos.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+from time import monotonic
+
+from django.conf import settings
+
+from tracking.eta import eta_service
+from tracking.models import Order
+
+
+def location_version(order: Order) -> int:
+    """
+    Versión de la posición del pedido: el timestamp de su ubicación en microsegundos epoch
+    (0 si aún no tiene ubicación).
+    """
+    location = getattr(order, 'location', None)
+    return int(location.timestamp.timestamp() * 1_000_000) if location is not None else 0
+
+
+def estimate_version(order: Order) -> int:
+    """
+    Versión de la ETA del pedido: crc32 de la estimación vigente, que cambia con el destino,
+    la distancia, la velocidad y la llegada estimada (0 si no hay estimación).
+    """
+    estimate = eta_service.get_estimate(order)
+    return zlib.crc32(repr(estimate).encode()) if estimate is not None else 0
+
+
+def tracking_etag(order: Order) -> str:
+    """
+    ETag de la respuesta de seguimiento: cambia con el estado del pedido, con el
+    timestamp de su ubicación y con su ETA (incluido un cambio de destino).
+    """
+    return f'"{order.order_id}-{order.status}-{location_version(order)}-{estimate_version(order)}"'
+
+
+class LastPositionCache:
+    """
+    Pedidos (con su ubicación ya cargada) indexados por order_id, con vencimiento por TTL
+    y desalojo LRU sobre TRACKING_POSITION_CACHE_MAX_ENTRIES.
+    El TTL acota cuánto tarda en verse una escritura hecha desde otro proceso o sin señales
+    (QuerySet.update()); las hechas en este proceso con save() o por TrackingService
+    actualizan o invalidan la entrada de inmediato.
+    Las instancias guardadas se comparten entre hilos y no deben modificarse.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, order_id: str) -> tuple[Order, str] | None:
+        """
+        :return: Tupla (pedido, etag) vigente o None si no está en caché o venció.
+        """
+        with self._lock:
+            entry = self._entries.get(order_id)
+            if entry is None:
+                return None
+            order, etag, expires_at = entry
+            if monotonic() >= expires_at:
+                del self._entries[order_id]
+                return None
+            self._entries.move_to_end(order_id)
+            return order, etag
+
+    def set(self, order: Order) -> str:
+        """
+        Guarda el pedido (con `location` ya asignada, si existe) y devuelve su ETag.
+        """
+        etag = tracking_etag(order)
+        expires_at = monotonic() + settings.TRACKING_POSITION_CACHE_TTL_SECONDS
+        with self._lock:
+            self._entries[order.order_id] = (order, etag, expires_at)
+            self._entries.move_to_end(order.order_id)
+            while len(self._entries) > settings.TRACKING_POSITION_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return etag
+
+    def invalidate(self, order_id: str) -> None:
+        with self._lock:
+            self._entries.pop(order_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Instancia compartida por el proceso; las señales de tracking.signals la invalidan.
+last_position_cache = LastPositionCache()
@@ -0,0 +1,158 @@
+"""
+Estimación del tiempo de llegada (ETA) de los pedidos en tránsito.
+La estimación se recalcula de forma incremental con cada ubicación aceptada
+(distancia haversine al destino y velocidad promedio de los últimos pings) y se
+guarda en memoria por pedido, de modo que leerla no consulta la base de datos.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from tracking.geo import haversine_meters
+from tracking.models import Order, OrderLocationHistory
+
+
+class _OrderRoute:
+    """
+    Ventana de los últimos pings de un pedido con la suma de sus tramos, para
+    calcular la velocidad promedio en O(1) por ping.
+    """
+
+    def __init__(self, window: int):
+        self.points = deque()
+        self.window = window
+        self.path_meters = 0.0
+
+    def add(self, latitude: float, longitude: float, recorded_at: datetime) -> None:
+        """
+        Agrega un ping al final de la ventana. Los instantes vienen todos del reloj del servidor
+        (ver TrackingService), así que un ping no posterior al último es un duplicado o llegó
+        tarde y se ignora: la ventana solo avanza.
+        """
+        if self.points:
+            last_lat, last_lon, last_at = self.points[-1]
+            if recorded_at <= last_at:
+                return
+            self.path_meters += haversine_meters(last_lat, last_lon, latitude, longitude)
+        self.points.append((latitude, longitude, recorded_at))
+        if len(self.points) > self.window:
+            old_lat, old_lon, _ = self.points.popleft()
+            next_lat, next_lon, _ = self.points[0]
+            self.path_meters -= haversine_meters(old_lat, old_lon, next_lat, next_lon)
+
+    def average_speed(self) -> float | None:
+        """
+        :return: Velocidad promedio en m/s sobre la ventana, o None con menos de dos pings.
+        """
+        if len(self.points) < 2:
+            return None
+        elapsed = (self.points[-1][2] - self.points[0][2]).total_seconds()
+        return self.path_meters / elapsed if elapsed > 0 else None
+
+
+class EtaService:
+    """
+    Mantiene la ventana de pings y la última estimación de cada pedido (LRU acotado a
+    MAX_TRACKED_ORDERS). Sin velocidad medible se usa TRACKING_ETA_DEFAULT_SPEED_MPS, y la
+    velocidad nunca baja de TRACKING_ETA_MIN_SPEED_MPS (un repartidor detenido no da ETA infinita).
+    """
+    MAX_TRACKED_ORDERS = 50000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = OrderedDict()
+        self._estimates = {}
+
+    def observe(self, order: Order, latitude: float, longitude: float, recorded_at: datetime) -> None:
+        """
+        Agrega un ping aceptado del pedido y recalcula su estimación. Si el proceso aún no
+        seguía el pedido (ej. tras un reinicio), antes siembra la ventana desde el historial
+        de ubicaciones; esa consulta ocurre aquí, en la escritura, y nunca en la lectura.
+        """
+        with self._lock:
+            tracked = order.order_id in self._routes
+        history = [] if tracked else list(
+            OrderLocationHistory.objects
+            .filter(order_id=order.pk, recorded_at__lt=recorded_at)
+            .order_by("-recorded_at")
+            .values_list("latitude", "longitude", "recorded_at")[:settings.TRACKING_ETA_SPEED_WINDOW]
+        )
+        with self._lock:
+            route = self._get_route(order)
+            # Si otro hilo sembró la ventana entretanto, estos puntos no son posteriores y se ignoran.
+            for history_latitude, history_longitude, history_recorded_at in reversed(history):
+                route.add(float(history_latitude), float(history_longitude), history_recorded_at)
+            route.add(float(latitude), float(longitude), recorded_at)
+            self._estimates[order.order_id] = self._estimate(order, route)
+
+    def get_estimate(self, order: Order) -> dict | None:
+        """
+        Devuelve la última estimación del pedido. Si el proceso aún no lo sigue (ej. tras
+        un reinicio), estima desde su ubicación actual (ya cargada) con la velocidad por
+        defecto, sin consultar la base de datos; el siguiente ping aceptado siembra la ventana.
+        :return: Dict con distance_meters, speed_mps, eta_seconds y estimated_arrival,
+                 o None si el pedido no está en tránsito, no tiene destino o no tiene ubicación.
+        """
+        if order.status != "IN_TRANSIT" or order.destination_latitude is None or order.destination_longitude is None:
+            return None
+        with self._lock:
+            if order.order_id in self._routes:
+                return self._estimates.get(order.order_id)
+
+        location = getattr(order, "location", None)
+        if location is None:
+            return None
+        route = _OrderRoute(window=1)
+        route.add(float(location.latitude), float(location.longitude), location.timestamp)
+        return self._estimate(order, route)
+
+    def refresh(self, order: Order) -> None:
+        """
+        Recalcula la estimación de un pedido ya seguido (ej. cambió su destino).
+        """
+        with self._lock:
+            route = self._routes.get(order.order_id)
+            if route is not None:
+                self._estimates[order.order_id] = self._estimate(order, route)
+
+    def forget(self, order_id: str) -> None:
+        with self._lock:
+            self._routes.pop(order_id, None)
+            self._estimates.pop(order_id, None)
+
+    def _get_route(self, order: Order) -> _OrderRoute:
+        route = self._routes.get(order.order_id)
+        if route is None:
+            route = self._routes[order.order_id] = _OrderRoute(settings.TRACKING_ETA_SPEED_WINDOW)
+            if len(self._routes) > self.MAX_TRACKED_ORDERS:
+                evicted, _ = self._routes.popitem(last=False)
+                self._estimates.pop(evicted, None)
+        else:
+            self._routes.move_to_end(order.order_id)
+        return route
+
+    @staticmethod
+    def _estimate(order: Order, route: _OrderRoute) -> dict | None:
+        if not route.points or order.destination_latitude is None or order.destination_longitude is None:
+            return None
+        latitude, longitude, recorded_at = route.points[-1]
+        distance = haversine_meters(latitude, longitude,
+                                    float(order.destination_latitude), float(order.destination_longitude))
+        speed = route.average_speed()
+        if speed is None:
+            speed = settings.TRACKING_ETA_DEFAULT_SPEED_MPS
+        speed = max(speed, settings.TRACKING_ETA_MIN_SPEED_MPS)
+        eta_seconds = round(distance / speed)
+        return {
+            "distance_meters": round(distance),
+            "speed_mps": round(speed, 2),
+            "eta_seconds": eta_seconds,
+            "estimated_arrival": recorded_at + timedelta(seconds=eta_seconds),
+        }
+
+
+# Instancia compartida por el proceso; TrackingService la actualiza con cada ubicación aceptada.
+eta_service = EtaService()
@@ -0,0 +1,79 @@
+"""
+Geocodificación de direcciones de entrega.
+El backend es intercambiable (settings.TRACKING_GEOCODER_BACKEND); FileGeocoderBackend
+resuelve desde un archivo JSON local y sirve como reemplazo del proveedor real en
+desarrollo y pruebas.
+"""
+
+import json
+import re
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_address(address: str) -> str:
+    """
+    Clave de caché de una dirección: minúsculas, sin tildes ni puntuación y con los
+    espacios colapsados ("Av. Providencia 1234, Ñuñoa" -> "av providencia 1234 nunoa").
+    """
+    text = unicodedata.normalize("NFKD", address).encode("ascii", "ignore").decode("ascii")
+    return _NON_ALPHANUMERIC.sub(" ", text.lower()).strip()[:255]
+
+
+class GeocoderBackend(ABC):
+    """
+    Interfaz para los backends de geocodificación.
+    """
+    name = "base"
+
+    @abstractmethod
+    def geocode_many(self, addresses: list[str]) -> dict[str, tuple[Decimal, Decimal] | None]:
+        """
+        Resuelve un lote de direcciones ya normalizadas en una sola llamada al proveedor.
+        :return: Dict dirección -> (latitud, longitud), o None si no se encontró.
+        """
+        raise NotImplementedError
+
+
+class FileGeocoderBackend(GeocoderBackend):
+    """
+    Backend local: lee settings.TRACKING_GEOCODER_FILE, un objeto JSON
+    {"dirección": [latitud, longitud], ...}. Las direcciones del archivo se normalizan al cargarlo.
+    """
+    name = "file"
+
+    def __init__(self, path: str | Path | None = None):
+        path = Path(path or settings.TRACKING_GEOCODER_FILE)
+        with path.open(encoding="utf-8") as addresses_file:
+            raw = json.load(addresses_file)
+        self._coordinates = {
+            normalize_address(address): (Decimal(str(latitude)), Decimal(str(longitude)))
+            for address, (latitude, longitude) in raw.items()
+        }
+
+    def geocode_many(self, addresses: list[str]) -> dict[str, tuple[Decimal, Decimal] | None]:
+        return {address: self._coordinates.get(address) for address in addresses}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_geocoder_backend() -> GeocoderBackend:
+    """
+    Devuelve la instancia compartida del backend configurado en settings.TRACKING_GEOCODER_BACKEND.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.TRACKING_GEOCODER_BACKEND)()
+    return _backend
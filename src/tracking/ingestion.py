@@ -0,0 +1,117 @@
+"""
+Filtro de ingesta de ubicaciones: descarta los pings redundantes de los repartidores
+(detenidos o reportando demasiado seguido) antes de que lleguen a la base de datos.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+
+from tracking.geo import haversine_meters
+
+
+class LocationIngestionFilter:
+    """
+    Decide, por pedido, si un ping se escribe comparándolo con el último ping aceptado:
+    - Se escribe siempre si pasaron TRACKING_INGEST_MAX_STALENESS_SECONDS (heartbeat).
+    - Se descarta si llegó antes de TRACKING_INGEST_MIN_INTERVAL_SECONDS (o es más antiguo).
+    - Se descarta si se movió menos de TRACKING_INGEST_MIN_DISTANCE_METERS.
+    Un valor 0 desactiva el criterio correspondiente. El estado vive en memoria del proceso
+    (acotado a MAX_TRACKED_ORDERS pedidos, LRU); tras un reinicio el primer ping se acepta.
+    Todos los instantes deben estar en el reloj del servidor: mezclar relojes hace que pings
+    válidos parezcan antiguos (ver TrackingService.bulk_update_order_locations).
+    """
+    MAX_TRACKED_ORDERS = 50000
+
+    def __init__(self, min_distance_meters: float | None = None, min_interval_seconds: float | None = None,
+                 max_staleness_seconds: float | None = None):
+        """
+        :param min_distance_meters: Por defecto settings.TRACKING_INGEST_MIN_DISTANCE_METERS.
+        :param min_interval_seconds: Por defecto settings.TRACKING_INGEST_MIN_INTERVAL_SECONDS.
+        :param max_staleness_seconds: Por defecto settings.TRACKING_INGEST_MAX_STALENESS_SECONDS.
+        """
+        self._min_distance_meters = min_distance_meters
+        self._min_interval_seconds = min_interval_seconds
+        self._max_staleness_seconds = max_staleness_seconds
+        self._lock = threading.Lock()
+        self._last_accepted = OrderedDict()
+        self._counters = {"accepted": 0, "heartbeats": 0, "dropped_duplicate": 0,
+                          "dropped_throttled": 0, "dropped_out_of_order": 0}
+
+    @property
+    def min_distance_meters(self) -> float:
+        if self._min_distance_meters is None:
+            return settings.TRACKING_INGEST_MIN_DISTANCE_METERS
+        return self._min_distance_meters
+
+    @property
+    def min_interval_seconds(self) -> float:
+        if self._min_interval_seconds is None:
+            return settings.TRACKING_INGEST_MIN_INTERVAL_SECONDS
+        return self._min_interval_seconds
+
+    @property
+    def max_staleness_seconds(self) -> float:
+        if self._max_staleness_seconds is None:
+            return settings.TRACKING_INGEST_MAX_STALENESS_SECONDS
+        return self._max_staleness_seconds
+
+    def accept(self, order_id: str, latitude: Decimal, longitude: Decimal, recorded_at: datetime) -> bool:
+        """
+        Evalúa el ping y, si se acepta, lo registra como el último escrito del pedido.
+        :param order_id: Emisor del ping: el order_id, o 'driver:<driver_id>' para los
+                         pings de un repartidor.
+        :return: True si el ping debe escribirse.
+        """
+        with self._lock:
+            last = self._last_accepted.get(order_id)
+            verdict = self._evaluate(last, latitude, longitude, recorded_at)
+            self._counters[verdict] += 1
+            if verdict not in ("accepted", "heartbeats"):
+                return False
+            self._last_accepted[order_id] = (float(latitude), float(longitude), recorded_at)
+            self._last_accepted.move_to_end(order_id)
+            if len(self._last_accepted) > self.MAX_TRACKED_ORDERS:
+                self._last_accepted.popitem(last=False)
+            return True
+
+    def forget(self, order_id: str) -> None:
+        """
+        Olvida el último ping aceptado del pedido (ej. si su escritura falló).
+        """
+        with self._lock:
+            self._last_accepted.pop(order_id, None)
+
+    def stats(self) -> dict:
+        """
+        :return: Contadores de pings aceptados y descartados; `writes_saved` es el total descartado.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            counters["tracked_orders"] = len(self._last_accepted)
+        counters["writes_saved"] = (counters["dropped_duplicate"] + counters["dropped_throttled"]
+                                    + counters["dropped_out_of_order"])
+        return counters
+
+    def _evaluate(self, last, latitude, longitude, recorded_at) -> str:
+        if last is None:
+            return "accepted"
+        last_latitude, last_longitude, last_recorded_at = last
+        elapsed = (recorded_at - last_recorded_at).total_seconds()
+        if elapsed < 0:
+            return "dropped_out_of_order"
+        if self.max_staleness_seconds and elapsed >= self.max_staleness_seconds:
+            return "heartbeats"
+        if elapsed < self.min_interval_seconds:
+            return "dropped_throttled"
+        distance = haversine_meters(last_latitude, last_longitude, float(latitude), float(longitude))
+        if distance < self.min_distance_meters:
+            return "dropped_duplicate"
+        return "accepted"
+
+
+# Instancia compartida por el proceso.
+location_ingestion_filter = LocationIngestionFilter()
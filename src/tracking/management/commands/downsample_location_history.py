@@ -0,0 +1,32 @@
+"""
+Reduce la resolución del historial de ubicaciones fuera de la ventana de 24 horas.
+
+Pensado para ejecutarse periódicamente (cron) o en bucle con --interval:
+    python manage.py downsample_location_history
+    python manage.py downsample_location_history --interval 3600
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracking.services import LocationHistoryService
+
+
+class Command(BaseCommand):
+    help = "Submuestrea los días completos del historial de ubicaciones que ya salieron de la ventana de resolución completa."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=None,
+                            help="Repite el proceso cada N segundos en lugar de ejecutarlo una sola vez.")
+
+    def handle(self, *args, **options):
+        service = LocationHistoryService()
+        while True:
+            for partition in service.downsample():
+                self.stdout.write(
+                    f"{partition.day}: {partition.points_before} -> {partition.points_after} puntos"
+                )
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,54 @@
+"""
+Comando de gestión para geocodificar las direcciones de entrega de los pedidos nuevos.
+
+Uso puntual (ej. desde cron):
+    python manage.py geocode_orders
+Como proceso programado de larga duración:
+    python manage.py geocode_orders --interval 60
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracking.services import GeocodingService
+
+
+class Command(BaseCommand):
+    help = (
+        "Completa las coordenadas de destino de los pedidos que aún no las tienen, resolviendo "
+        "sus direcciones por lotes a través de la caché de geocodificación."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Cantidad de pedidos geocodificados por lote.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Si es mayor que 0, repite la geocodificación cada N segundos hasta que se detenga el proceso.",
+        )
+        parser.add_argument(
+            "--retry-not-found",
+            action="store_true",
+            help="Vuelve a consultar las direcciones que el geocodificador no encontró antes.",
+        )
+
+    def handle(self, *args, **options):
+        service = GeocodingService()
+        if options["retry_not_found"]:
+            deleted = service.reset_not_found()
+            self.stdout.write(f"Direcciones no encontradas a reintentar: {deleted}.")
+        while True:
+            geocoded, not_found = service.geocode_pending_orders(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Pedidos geocodificados: {geocoded}. Direcciones no encontradas: {not_found}."
+            ))
+            if options["interval"] <= 0:
+                break
+            time.sleep(options["interval"])
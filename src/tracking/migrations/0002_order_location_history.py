@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLocationHistoryPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='Día (UTC)')),
+                ('downsampled_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Reducido en')),
+                ('points_before', models.PositiveIntegerField(default=0, verbose_name='Puntos Antes')),
+                ('points_after', models.PositiveIntegerField(default=0, verbose_name='Puntos Después')),
+            ],
+            options={
+                'verbose_name': 'Partición de Historial',
+                'verbose_name_plural': 'Particiones de Historial',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderLocationHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día (UTC)')),
+                ('recorded_at', models.DateTimeField(verbose_name='Registrado en')),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='Latitud')),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='Longitud')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_history', to='tracking.order', verbose_name='Pedido')),
+            ],
+            options={
+                'verbose_name': 'Historial de Ubicación',
+                'verbose_name_plural': 'Historial de Ubicaciones',
+                'indexes': [models.Index(fields=['order', 'recorded_at'], name='tracking_hist_order_rec_idx'), models.Index(fields=['day'], name='tracking_hist_day_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:44
+
+from django.db import migrations, models
+
+# Copia del codificador de tracking.geo al crear la migración: las migraciones no deben
+# depender de código de la aplicación que puede cambiar.
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude, longitude, precision=9):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            value_range[0] = middle
+        else:
+            bits <<= 1
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def fill_geohash(apps, schema_editor):
+    DeliveryPerson = apps.get_model('tracking', 'DeliveryPerson')
+    drivers = list(DeliveryPerson.objects.filter(current_latitude__isnull=False, current_longitude__isnull=False))
+    for driver in drivers:
+        driver.geohash = geohash_encode(float(driver.current_latitude), float(driver.current_longitude))
+    DeliveryPerson.objects.bulk_update(drivers, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0002_order_location_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryperson',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddField(
+            model_name='deliveryperson',
+            name='is_available',
+            field=models.BooleanField(default=True, verbose_name='Disponible'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0003_delivery_person_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='destination_latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Latitud Destino'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='destination_longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Longitud Destino'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0004_order_destination'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodedAddress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_address', models.CharField(max_length=255, unique=True, verbose_name='Dirección Normalizada')),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Latitud')),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Longitud')),
+                ('provider', models.CharField(max_length=100, verbose_name='Geocodificador')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Geocodificada en')),
+            ],
+            options={
+                'verbose_name': 'Dirección Geocodificada',
+                'verbose_name_plural': 'Direcciones Geocodificadas',
+            },
+        ),
+    ]
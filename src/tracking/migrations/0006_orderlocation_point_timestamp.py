@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0005_geocoded_address'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderlocation',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Actualizado en'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0006_orderlocation_point_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderlocationhistorypartition',
+            name='last_point_id',
+            field=models.BigIntegerField(default=0, verbose_name='ID Último Punto'),
+        ),
+    ]
@@ -20,6 +20,9 @@ class DeliveryPerson(models.Model):
     last_updated = models.DateTimeField(
         null=True, blank=True, verbose_name="Última Actualización Ubicación"
     )
+    # Geohash de la ubicación actual; se recalcula al guardar (ver tracking.signals).
+    geohash = models.CharField(max_length=12, blank=True, default="", db_index=True, verbose_name="Geohash")
+    is_available = models.BooleanField(default=True, verbose_name="Disponible")
 
     class Meta:
         verbose_name = "Repartidor"
@@ -59,6 +62,13 @@ class Order(models.Model):
     )
 
     delivery_address = models.CharField(max_length=255, verbose_name="Dirección de Entrega")
+    # Coordenadas de delivery_address (destino para distancia y ETA); nulas si aún no se geocodifica.
+    destination_latitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True, verbose_name="Latitud Destino"
+    )
+    destination_longitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True, verbose_name="Longitud Destino"
+    )
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha Creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
@@ -70,6 +80,15 @@ class Order(models.Model):
     def __str__(self):
         return f"Pedido: {self.order_id} - Estado: {self.get_status_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Dirección y destino guardados: la señal pre_save detecta un cambio de dirección sin releerlos.
+        names = ("delivery_address", "destination_latitude", "destination_longitude")
+        if all(name in instance.__dict__ for name in names):
+            instance._persisted_destination = tuple(instance.__dict__[name] for name in names)
+        return instance
+
     def is_in_transit(self):
         return self.status == 'IN_TRANSIT'
 
@@ -90,7 +109,8 @@ class OrderLocation(models.Model):
     )
     latitude = models.DecimalField(max_digits=9, decimal_places=6, verbose_name="Latitud")
     longitude = models.DecimalField(max_digits=9, decimal_places=6, verbose_name="Longitud")
-    timestamp = models.DateTimeField(auto_now=True, verbose_name="Actualizado en")
+    # Instante del punto guardado (no el de la escritura): un punto más antiguo no lo reemplaza.
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name="Actualizado en")
 
     class Meta:
         verbose_name = "Ubicación de Pedido"
@@ -98,3 +118,77 @@ class OrderLocation(models.Model):
 
     def __str__(self):
         return f"Ubicación Pedido {self.order.order_id} - ({self.latitude}, {self.longitude})"
+
+
+class OrderLocationHistory(models.Model):
+    """
+    Historial de ubicaciones de un pedido (solo inserciones), separado de OrderLocation
+    para no agrandar la tabla que se consulta en cada seguimiento.
+    Las filas se agrupan por día (`day`): el día es la unidad de depuración y de
+    reducción de resolución (ver LocationHistoryService.downsample).
+    """
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='location_history',
+        verbose_name="Pedido"
+    )
+    day = models.DateField(verbose_name="Día (UTC)")
+    recorded_at = models.DateTimeField(verbose_name="Registrado en")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, verbose_name="Latitud")
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, verbose_name="Longitud")
+
+    class Meta:
+        verbose_name = "Historial de Ubicación"
+        verbose_name_plural = "Historial de Ubicaciones"
+        indexes = [
+            models.Index(fields=['order', 'recorded_at'], name='tracking_hist_order_rec_idx'),
+            models.Index(fields=['day'], name='tracking_hist_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pedido {self.order_id} - ({self.latitude}, {self.longitude}) en {self.recorded_at}"
+
+
+class OrderLocationHistoryPartition(models.Model):
+    """
+    Registro de los días del historial que ya fueron reducidos de resolución.
+    `last_point_id` es el mayor id del día al reducirlo: un punto con id mayor llegó tarde
+    y el día se vuelve a reducir.
+    """
+    day = models.DateField(unique=True, verbose_name="Día (UTC)")
+    downsampled_at = models.DateTimeField(default=timezone.now, verbose_name="Reducido en")
+    points_before = models.PositiveIntegerField(default=0, verbose_name="Puntos Antes")
+    points_after = models.PositiveIntegerField(default=0, verbose_name="Puntos Después")
+    last_point_id = models.BigIntegerField(default=0, verbose_name="ID Último Punto")
+
+    class Meta:
+        verbose_name = "Partición de Historial"
+        verbose_name_plural = "Particiones de Historial"
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day}: {self.points_before} -> {self.points_after} puntos"
+
+
+class GeocodedAddress(models.Model):
+    """
+    Caché persistente de geocodificación: coordenadas de cada dirección normalizada
+    (ver tracking.geocoding.normalize_address), para geocodificar cada dirección una sola vez.
+    Coordenadas nulas indican que el geocodificador no encontró la dirección.
+    """
+    normalized_address = models.CharField(max_length=255, unique=True, verbose_name="Dirección Normalizada")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, verbose_name="Latitud")
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, verbose_name="Longitud")
+    provider = models.CharField(max_length=100, verbose_name="Geocodificador")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Geocodificada en")
+
+    class Meta:
+        verbose_name = "Dirección Geocodificada"
+        verbose_name_plural = "Direcciones Geocodificadas"
+
+    def __str__(self):
+        return f"{self.normalized_address} - ({self.latitude}, {self.longitude})"
+
+    def is_found(self):
+        return self.latitude is not None and self.longitude is not None
@@ -0,0 +1,31 @@
+"""
+Codificación de rutas en el formato "Encoded Polyline" de Google, que comprime una
+secuencia de coordenadas como diferencias entre puntos consecutivos en texto ASCII.
+"""
+
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+
+def _encode_value(value: int) -> str:
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def iter_encoded_polyline(points: Iterable[tuple[Decimal, Decimal]], precision: int = 6) -> Iterator[str]:
+    """
+    Codifica los puntos (latitud, longitud) de forma incremental: produce un fragmento
+    por punto, de modo que la ruta se puede transmitir sin cargarla completa en memoria.
+    """
+    factor = 10 ** precision
+    previous_lat = previous_lng = 0
+    for latitude, longitude in points:
+        lat = int(round(latitude * factor))
+        lng = int(round(longitude * factor))
+        yield _encode_value(lat - previous_lat) + _encode_value(lng - previous_lng)
+        previous_lat, previous_lng = lat, lng
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from tracking.models import Order, OrderLocation
+from tracking.eta import eta_service
+from tracking.models import DeliveryPerson, Order, OrderLocation
 
 
 class OrderLocationSerializer(serializers.ModelSerializer):
@@ -16,10 +17,15 @@ class OrderTrackingSerializer(serializers.ModelSerializer):
     Devuelve la ubicación del pedido si existe.
     """
     location = OrderLocationSerializer(read_only=True)
+    eta = serializers.SerializerMethodField()
 
     class Meta:
         model = Order
-        fields = ['order_id', 'status', 'location']
+        fields = ['order_id', 'status', 'location', 'eta']
+
+    def get_eta(self, order):
+        # Estimación ya calculada al recibir la última ubicación (ver tracking.eta).
+        return eta_service.get_estimate(order)
 
 
 class OrderLocationUpdateSerializer(serializers.Serializer):
@@ -29,3 +35,67 @@ class OrderLocationUpdateSerializer(serializers.Serializer):
     """
     latitude = serializers.DecimalField(max_digits=9, decimal_places=6)
     longitude = serializers.DecimalField(max_digits=9, decimal_places=6)
+
+
+class OrderLocationPointSerializer(serializers.Serializer):
+    """
+    Un punto GPS dentro de una carga masiva de ubicaciones.
+    `timestamp` es el instante en que el dispositivo registró el punto.
+    """
+    order_id = serializers.CharField(max_length=100)
+    latitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-90, max_value=90)
+    longitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-180, max_value=180)
+    timestamp = serializers.DateTimeField()
+
+
+class OrderLocationBatchSerializer(serializers.Serializer):
+    """
+    Carga masiva de ubicaciones (ej. pings que la app del repartidor acumuló sin conexión).
+    Los puntos se validan uno a uno en la vista para aceptar los válidos y reportar los demás.
+    `sent_at` es el instante de envío según el reloj del dispositivo; permite corregir su desfase.
+    """
+    MAX_POINTS = 1000
+
+    points = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=MAX_POINTS,
+    )
+    sent_at = serializers.DateTimeField(required=False)
+
+
+class DriverLocationUpdateSerializer(serializers.Serializer):
+    """
+    Posición actual enviada por la app del repartidor.
+    """
+    latitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-90, max_value=90)
+    longitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-180, max_value=180)
+
+
+class NearestDriversQuerySerializer(serializers.Serializer):
+    """
+    Parámetros de la búsqueda de repartidores disponibles cercanos a un punto.
+    """
+    MAX_RESULTS = 50
+
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    k = serializers.IntegerField(min_value=1, max_value=MAX_RESULTS, default=5)
+    max_distance = serializers.FloatField(min_value=0, required=False, help_text="Radio máximo en metros.")
+
+
+class NearestDriverSerializer(serializers.ModelSerializer):
+    """Repartidor cercano con su distancia al punto consultado."""
+    distance_meters = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = DeliveryPerson
+        fields = ['driver_id', 'name', 'current_latitude', 'current_longitude', 'last_updated', 'distance_meters']
+
+
+class ActiveOrdersAnalyticsQuerySerializer(serializers.Serializer):
+    """
+    Parámetros del resumen de pedidos en tránsito del panel de operaciones.
+    """
+    min_distance_km = serializers.FloatField(min_value=0, default=5.0)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
@@ -1,35 +1,372 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from typing import Iterator
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
 from django.shortcuts import get_object_or_404
-from tracking.models import Order, OrderLocation
+from django.utils import timezone
+
+from support_chat.pubsub import PubSubBackend, get_pubsub_backend
+from tracking.cache import LastPositionCache, last_position_cache, location_version
+from tracking.eta import EtaService, eta_service
+from tracking.geocoding import GeocoderBackend, get_geocoder_backend, normalize_address
+from tracking.ingestion import LocationIngestionFilter, location_ingestion_filter
+from tracking.models import (
+    DeliveryPerson, GeocodedAddress, Order, OrderLocation, OrderLocationHistory, OrderLocationHistoryPartition,
+)
+from tracking.serializers import OrderTrackingSerializer
+from tracking.spatial import DriverSpatialIndex, driver_spatial_index
+
+
+class LocationHistoryService:
+    """
+    Historial de ubicaciones por pedido: inserción, lectura de rutas y reducción de resolución.
+    """
+    # Antigüedad a partir de la cual un día del historial se reduce de resolución.
+    FULL_RESOLUTION_HOURS = 24
+    # Tras la reducción se conserva a lo más un punto por pedido cada este intervalo.
+    DOWNSAMPLE_INTERVAL_SECONDS = 30
+    DELETE_CHUNK_SIZE = 500
+
+    def record_points(self, points: list[tuple[Order, Decimal, Decimal, datetime]]) -> None:
+        """
+        Agrega puntos al historial con un único INSERT.
+        :param points: Tuplas (pedido, latitud, longitud, instante del punto).
+        """
+        OrderLocationHistory.objects.bulk_create([
+            OrderLocationHistory(
+                order=order,
+                day=recorded_at.astimezone(dt_timezone.utc).date(),
+                recorded_at=recorded_at,
+                latitude=latitude,
+                longitude=longitude,
+            )
+            for order, latitude, longitude, recorded_at in points
+        ])
+
+    def iter_route(self, order: Order, start: datetime | None = None,
+                   end: datetime | None = None) -> Iterator[tuple[Decimal, Decimal]]:
+        """
+        Recorre la ruta del pedido en orden cronológico, leyendo por bloques desde la base de datos.
+        :return: Iterador de tuplas (latitud, longitud).
+        """
+        history = OrderLocationHistory.objects.filter(order=order)
+        if start is not None:
+            history = history.filter(recorded_at__gte=start)
+        if end is not None:
+            history = history.filter(recorded_at__lt=end)
+        return history.order_by('recorded_at', 'id').values_list('latitude', 'longitude').iterator(chunk_size=2000)
+
+    def downsample(self, now: datetime | None = None) -> list[OrderLocationHistoryPartition]:
+        """
+        Reduce la resolución de los días del historial que quedaron completos fuera de la
+        ventana de resolución completa y que aún no se procesaron, o que recibieron puntos
+        después de procesarse (ej. cargas acumuladas sin conexión que llegaron tarde).
+        :return: Los registros de partición creados o actualizados (uno por día procesado).
+        """
+        now = now or timezone.now()
+        last_day = (now - timedelta(hours=self.FULL_RESOLUTION_HOURS)).astimezone(dt_timezone.utc).date() - timedelta(days=1)
+        already_reduced = OrderLocationHistoryPartition.objects.filter(
+            day=OuterRef('day'), last_point_id__gte=OuterRef('id')
+        )
+        pending_days = (
+            OrderLocationHistory.objects
+            .filter(day__lte=last_day)
+            .exclude(Exists(already_reduced))
+            .values_list('day', flat=True)
+            .distinct()
+            .order_by('day')
+        )
+        return [self._downsample_day(day) for day in pending_days]
+
+    @transaction.atomic
+    def _downsample_day(self, day) -> OrderLocationHistoryPartition:
+        points = (
+            OrderLocationHistory.objects
+            .filter(day=day)
+            .order_by('order_id', 'recorded_at', 'id')
+            .values_list('id', 'order_id', 'recorded_at')
+        )
+        total = 0
+        last_point_id = 0
+        to_delete = []
+        last_bucket = None
+        for point_id, order_id, recorded_at in points.iterator(chunk_size=2000):
+            total += 1
+            last_point_id = max(last_point_id, point_id)
+            bucket = (order_id, int(recorded_at.timestamp() // self.DOWNSAMPLE_INTERVAL_SECONDS))
+            if bucket == last_bucket:
+                to_delete.append(point_id)
+            last_bucket = bucket
+
+        for start in range(0, len(to_delete), self.DELETE_CHUNK_SIZE):
+            OrderLocationHistory.objects.filter(id__in=to_delete[start:start + self.DELETE_CHUNK_SIZE]).delete()
+
+        partition, _ = OrderLocationHistoryPartition.objects.update_or_create(
+            day=day,
+            defaults={
+                "downsampled_at": timezone.now(),
+                "points_before": total,
+                "points_after": total - len(to_delete),
+                "last_point_id": last_point_id,
+            },
+        )
+        return partition
+
+
+class TrackingBroadcastService:
+    """
+    Difunde las posiciones aceptadas a los clientes suscritos en tiempo real a cada pedido.
+    """
+    CHANNEL_PREFIX = 'order_tracking'
+
+    def __init__(self, pubsub_backend: PubSubBackend | None = None):
+        """
+        :param pubsub_backend: Backend de pub/sub; por defecto el configurado en settings.
+        """
+        self._pubsub_backend = pubsub_backend
+
+    @classmethod
+    def channel_for_order(cls, order_id: str) -> str:
+        """
+        Devuelve el nombre del canal de pub/sub de un pedido.
+        """
+        return f"{cls.CHANNEL_PREFIX}:{order_id}"
+
+    def get_backend(self) -> PubSubBackend:
+        return self._pubsub_backend or get_pubsub_backend()
+
+    @staticmethod
+    def build_event(order: Order) -> dict:
+        """
+        Evento de seguimiento: la misma representación que OrderTrackingAPIView más su versión.
+        """
+        return {"version": location_version(order), "data": dict(OrderTrackingSerializer(order).data)}
+
+    def broadcast_orders(self, orders: list[Order]) -> None:
+        """
+        Publica la posición actual de cada pedido (con `location` ya asignada).
+        Debe llamarse con la transacción ya confirmada.
+        """
+        backend = self.get_backend()
+        for order in orders:
+            backend.publish(self.channel_for_order(order.order_id), self.build_event(order))
 
 
 class TrackingService:
     """
     Lógica de negocio para el seguimiento de pedidos en tiempo real (MVP).
     """
+    # Filas por sentencia del upsert de OrderLocation (4 parámetros por fila).
+    UPSERT_BATCH_SIZE = 500
 
-    def get_order_tracking_info(self, order_id: str) -> Order:
+    def __init__(self, position_cache: LastPositionCache | None = None,
+                 broadcast_service: TrackingBroadcastService | None = None,
+                 ingestion_filter: LocationIngestionFilter | None = None,
+                 eta: EtaService | None = None):
+        self.history_service = LocationHistoryService()
+        self.position_cache = position_cache or last_position_cache
+        self.broadcast_service = broadcast_service or TrackingBroadcastService()
+        self.ingestion_filter = ingestion_filter or location_ingestion_filter
+        self.eta_service = eta or eta_service
+
+    def get_order_tracking_info(self, order_id: str) -> tuple[Order, str]:
         """
         Obtiene el pedido solicitado, incluyendo su ubicación actual (OrderLocation).
+        Se sirve desde la caché de última posición; solo va a la base de datos si no está o venció.
+        :return: Tupla (pedido, etag de la respuesta de seguimiento).
         """
-        return get_object_or_404(Order.objects.select_related("location"), order_id=order_id)
+        cached = self.position_cache.get(order_id)
+        if cached is not None:
+            return cached
+        order = get_object_or_404(Order.objects.select_related("location"), order_id=order_id)
+        return order, self.position_cache.set(order)
 
-    def update_order_location(self, order_id: str, latitude: float, longitude: float) -> OrderLocation:
+    def update_order_location(self, order_id: str, latitude: float, longitude: float) -> tuple[OrderLocation, bool]:
         """
         Actualiza (o crea) la ubicación del pedido.
         Esta es la pieza clave para el tracking real del MVP.
+        Los pings redundantes (ver LocationIngestionFilter) no se escriben.
+        :return: Tupla (ubicación vigente del pedido, True si se escribió el ping).
         """
+        now = timezone.now()
+        if not self.ingestion_filter.accept(order_id, latitude, longitude, now):
+            order, _ = self.get_order_tracking_info(order_id)
+            location = getattr(order, "location", None)
+            if location is not None:
+                return location, False
+
+        try:
+            return self._write_order_location(order_id, latitude, longitude, now)
+        except Exception:
+            self.ingestion_filter.forget(order_id)
+            raise
+
+    @transaction.atomic
+    def _write_order_location(self, order_id: str, latitude: float, longitude: float,
+                              now: datetime) -> tuple[OrderLocation, bool]:
         order = get_object_or_404(Order, order_id=order_id)
+        point = {"order_id": order_id, "latitude": latitude, "longitude": longitude, "timestamp": now}
+        written = self.write_order_locations({order_id: order}, {order_id: point}, [point])
+        if order_id in written:
+            return written[order_id], True
+        # La ubicación guardada es más reciente que este ping.
+        return OrderLocation.objects.get(order=order), False
 
-        # Obtiene o crea registro de ubicación del pedido
-        location, _ = OrderLocation.objects.update_or_create(
-            order=order,
-            defaults={
-                "latitude": latitude,
-                "longitude": longitude,
-            }
-        )
+    def bulk_update_order_locations(self, points: list[dict], sent_at: datetime | None = None) -> dict:
+        """
+        Aplica una carga masiva de ubicaciones ya validadas.
+        Resuelve todos los pedidos con una sola consulta IN y hace el upsert de las
+        ubicaciones con un único INSERT ... ON CONFLICT; de cada pedido solo se guarda
+        su punto más reciente.
+        Los puntos redundantes (ver LocationIngestionFilter) se descartan antes de escribir.
+        Los timestamps del dispositivo se llevan al reloj del servidor (ver `_to_server_clock`),
+        el mismo que usa `update_order_location`, antes de pasar por el filtro y de guardarse.
+        :param points: Dicts con order_id, latitude, longitude y timestamp.
+        :param sent_at: Instante de envío según el reloj del dispositivo, si lo informó.
+        :return: Dict con los order_id actualizados, los sin cambios (todos sus puntos
+                 descartados) y los no encontrados.
+        """
+        points = self._to_server_clock(points, sent_at)
+        orders = Order.objects.in_bulk({point["order_id"] for point in points}, field_name="order_id")
+        unknown = sorted({point["order_id"] for point in points if point["order_id"] not in orders})
+
+        accepted_points = []
+        latest_points = {}
+        for point in sorted(points, key=lambda point: point["timestamp"]):
+            if point["order_id"] not in orders:
+                continue
+            if self.ingestion_filter.accept(point["order_id"], point["latitude"], point["longitude"],
+                                            point["timestamp"]):
+                accepted_points.append(point)
+                latest_points[point["order_id"]] = point
+
+        written = {}
+        if accepted_points:
+            try:
+                written = self.write_order_locations(orders, latest_points, accepted_points)
+            except Exception:
+                for order_id in latest_points:
+                    self.ingestion_filter.forget(order_id)
+                raise
+
+        return {
+            "updated": sorted(written),
+            "unchanged": sorted(order_id for order_id in orders if order_id not in written),
+            "unknown": unknown,
+        }
+
+    @staticmethod
+    def _to_server_clock(points: list[dict], sent_at: datetime | None) -> list[dict]:
+        """
+        Traduce los timestamps del dispositivo al reloj del servidor: con `sent_at` se corrige el
+        desfase entre ambos relojes (recepción - envío); en cualquier caso ningún punto queda
+        en el futuro respecto a la recepción.
+        :param points: Dicts con order_id, latitude, longitude y timestamp (reloj del dispositivo).
+        :param sent_at: Instante de envío según el reloj del dispositivo, o None.
+        :return: Copias de los puntos con el timestamp en el reloj del servidor.
+        """
+        received_at = timezone.now()
+        offset = received_at - sent_at if sent_at is not None else timedelta(0)
+        return [{**point, "timestamp": min(point["timestamp"] + offset, received_at)} for point in points]
+
+    @transaction.atomic
+    def write_order_locations(self, orders: dict[str, Order], latest_points: dict[str, dict],
+                              accepted_points: list[dict]) -> dict[str, OrderLocation]:
+        """
+        Escribe las posiciones sin pasar por el filtro de ingesta: un único upsert de
+        OrderLocation, un único INSERT al historial y, tras confirmar, caché y difusión.
+        La ubicación actual guarda el instante del punto y solo se reemplaza por un punto más
+        reciente: uno antiguo que llega tarde (ej. acumulado sin conexión) solo va al historial.
+        :param orders: Pedidos por order_id.
+        :param latest_points: Punto a guardar como ubicación actual, por order_id.
+        :param accepted_points: Todos los puntos a registrar en el historial.
+        :return: Ubicaciones actuales escritas, por order_id.
+        """
+        locations = self._upsert_newer_locations([
+            OrderLocation(
+                order=orders[order_id],
+                latitude=point["latitude"],
+                longitude=point["longitude"],
+                timestamp=point["timestamp"],
+            )
+            for order_id, point in latest_points.items()
+        ])
+
+        # Todos los puntos aceptados (no solo el último) van al historial de rutas.
+        self.history_service.record_points([
+            (orders[point["order_id"]], point["latitude"], point["longitude"], point["timestamp"])
+            for point in accepted_points
+        ])
+
+        updated_orders = []
+        for location in locations:
+            location.order.location = location
+            updated_orders.append(location.order)
+        self._publish_positions(updated_orders, [
+            (orders[point["order_id"]], point["latitude"], point["longitude"], point["timestamp"])
+            for point in accepted_points
+        ])
+        return {location.order.order_id: location for location in locations}
+
+    def _upsert_newer_locations(self, locations: list[OrderLocation]) -> list[OrderLocation]:
+        """
+        INSERT ... ON CONFLICT DO UPDATE ... WHERE: la fila existente solo se reemplaza si el
+        punto nuevo es más reciente, también cuando dos escrituras concurrentes crean a la vez
+        la ubicación de un pedido. bulk_create(update_conflicts=True) no admite esa condición.
+        Requiere ON CONFLICT y RETURNING (PostgreSQL o SQLite >= 3.35).
+        :return: Las ubicaciones insertadas o reemplazadas, con su pk.
+        """
+        meta = OrderLocation._meta
+        quote = connection.ops.quote_name
+        fields = [meta.get_field(name) for name in ("order", "latitude", "longitude", "timestamp")]
+        table = quote(meta.db_table)
+        order_column, *value_columns = [quote(field.column) for field in fields]
+        timestamp_column = value_columns[-1]
+        row = "(" + ", ".join(["%s"] * len(fields)) + ")"
+
+        written = {}
+        with connection.cursor() as cursor:
+            for start in range(0, len(locations), self.UPSERT_BATCH_SIZE):
+                batch = locations[start:start + self.UPSERT_BATCH_SIZE]
+                cursor.execute(
+                    f"INSERT INTO {table} ({order_column}, {', '.join(value_columns)}) VALUES {', '.join([row] * len(batch))} "
+                    f"ON CONFLICT ({order_column}) DO UPDATE SET "
+                    f"{', '.join(f'{column} = excluded.{column}' for column in value_columns)} "
+                    f"WHERE {table}.{timestamp_column} < excluded.{timestamp_column} "
+                    f"RETURNING {quote(meta.pk.column)}, {order_column}",
+                    [field.get_db_prep_save(getattr(location, field.attname), connection)
+                     for location in batch for field in fields],
+                )
+                written.update((order_pk, pk) for pk, order_pk in cursor.fetchall())
+
+        upserted = []
+        for location in locations:
+            if location.order_id in written:
+                location.pk = written[location.order_id]
+                location._state.adding = False
+                upserted.append(location)
+        return upserted
+
+    def _publish_positions(self, orders: list[Order], points: list[tuple[Order, Decimal, Decimal, datetime]]) -> None:
+        """
+        Una vez confirmada la transacción, alimenta la ETA con los puntos aceptados, actualiza
+        la caché de última posición (write-through) y difunde las nuevas posiciones a los
+        suscriptores en tiempo real.
+        :param orders: Pedidos con `location` ya asignada.
+        :param points: Puntos aceptados como tuplas (pedido, latitud, longitud, instante).
+        """
+        def publish():
+            for order, latitude, longitude, recorded_at in sorted(points, key=lambda point: point[3]):
+                self.eta_service.observe(order, latitude, longitude, recorded_at)
+            for order in orders:
+                self.position_cache.set(order)
+            self.broadcast_service.broadcast_orders(orders)
 
-        return location
+        transaction.on_commit(publish)
 
     def mark_order_as_delivered(self, order_id: str) -> Order:
         """
@@ -41,3 +378,185 @@ class TrackingService:
             order.status = 'DELIVERED'
             order.save()
         return order
+
+
+class DriverLocationService:
+    """
+    Ubicación de los repartidores y búsqueda de los disponibles más cercanos a un punto.
+    """
+
+    def __init__(self, spatial_index: DriverSpatialIndex | None = None,
+                 tracking_service: TrackingService | None = None):
+        """
+        :param spatial_index: Índice espacial de repartidores; por defecto el compartido del proceso.
+        :param tracking_service: Servicio con el que se propagan las posiciones a los pedidos.
+        """
+        self.spatial_index = spatial_index or driver_spatial_index
+        self.tracking_service = tracking_service or TrackingService()
+
+    def update_driver_location(self, driver_id: str, latitude: Decimal,
+                               longitude: Decimal) -> tuple[DeliveryPerson, list[str] | None]:
+        """
+        Guarda la posición actual del repartidor y la propaga a todos sus pedidos en tránsito:
+        un repartidor con N pedidos es un solo punto físico, así que un ping reemplaza N.
+        El geohash se recalcula y el índice espacial se actualiza al guardar (ver tracking.signals).
+        Los pings redundantes (ver LocationIngestionFilter) no se escriben.
+        :return: Tupla (repartidor, order_id actualizados o None si el ping se descartó).
+        """
+        ingestion_filter = self.tracking_service.ingestion_filter
+        filter_key = f"driver:{driver_id}"
+        if not ingestion_filter.accept(filter_key, latitude, longitude, timezone.now()):
+            return get_object_or_404(DeliveryPerson, driver_id=driver_id), None
+
+        try:
+            return self._write_driver_location(driver_id, latitude, longitude)
+        except Exception:
+            ingestion_filter.forget(filter_key)
+            raise
+
+    @transaction.atomic
+    def _write_driver_location(self, driver_id: str, latitude: Decimal,
+                               longitude: Decimal) -> tuple[DeliveryPerson, list[str]]:
+        driver = get_object_or_404(DeliveryPerson, driver_id=driver_id)
+        driver.current_latitude = latitude
+        driver.current_longitude = longitude
+        driver.last_updated = timezone.now()
+        driver.save(update_fields=["current_latitude", "current_longitude", "geohash", "last_updated"])
+
+        orders = {
+            order.order_id: order
+            for order in driver.assigned_orders.filter(status="IN_TRANSIT")
+        }
+        if orders:
+            points = {
+                order_id: {"order_id": order_id, "latitude": latitude, "longitude": longitude,
+                           "timestamp": driver.last_updated}
+                for order_id in orders
+            }
+            orders = self.tracking_service.write_order_locations(orders, points, list(points.values()))
+        return driver, sorted(orders)
+
+    def find_nearest_available_drivers(self, latitude: float, longitude: float, k: int = 5,
+                                       max_distance_meters: float | None = None) -> list[DeliveryPerson]:
+        """
+        Busca en el índice espacial los k repartidores disponibles más cercanos y los carga
+        con una sola consulta.
+        :param max_distance_meters: Radio máximo; por defecto TRACKING_NEAREST_DRIVERS_MAX_DISTANCE_METERS.
+        :return: Repartidores ordenados por distancia, con el atributo `distance_meters`.
+        """
+        if max_distance_meters is None:
+            max_distance_meters = settings.TRACKING_NEAREST_DRIVERS_MAX_DISTANCE_METERS
+        nearest = self.spatial_index.nearest(latitude, longitude, k, max_distance_meters)
+        drivers = DeliveryPerson.objects.in_bulk([driver_id for driver_id, _ in nearest], field_name="driver_id")
+
+        result = []
+        for driver_id, distance in nearest:
+            driver = drivers.get(driver_id)
+            # El índice puede ir un refresco atrasado respecto de otros procesos.
+            if driver is None or not driver.is_available:
+                continue
+            driver.distance_meters = round(distance, 1)
+            result.append(driver)
+        return result
+
+
+class GeocodingService:
+    """
+    Resuelve las coordenadas de las direcciones de entrega pasando primero por la caché
+    persistente (GeocodedAddress): cada dirección normalizada se envía al geocodificador
+    una sola vez, y las que faltan se piden en lote.
+    """
+
+    def __init__(self, backend: GeocoderBackend | None = None, position_cache: LastPositionCache | None = None,
+                 eta: EtaService | None = None):
+        """
+        :param backend: Geocodificador; por defecto el configurado en settings.TRACKING_GEOCODER_BACKEND.
+        """
+        self._backend = backend
+        self.position_cache = position_cache or last_position_cache
+        self.eta_service = eta or eta_service
+
+    def get_backend(self) -> GeocoderBackend:
+        return self._backend or get_geocoder_backend()
+
+    def geocode_addresses(self, addresses: list[str]) -> dict[str, tuple[Decimal, Decimal] | None]:
+        """
+        Geocodifica un lote de direcciones con una consulta a la caché y, para las que
+        no están, una llamada al geocodificador cuyo resultado se guarda con un único INSERT.
+        :return: Dict dirección normalizada -> (latitud, longitud), o None si no se encontró.
+        """
+        keys = {normalize_address(address) for address in addresses} - {""}
+        coordinates = {
+            row.normalized_address: (row.latitude, row.longitude) if row.is_found() else None
+            for row in GeocodedAddress.objects.filter(normalized_address__in=keys)
+        }
+
+        missing = sorted(keys - coordinates.keys())
+        if missing:
+            backend = self.get_backend()
+            resolved = backend.geocode_many(missing)
+            GeocodedAddress.objects.bulk_create(
+                [
+                    GeocodedAddress(
+                        normalized_address=key,
+                        latitude=resolved[key][0] if resolved.get(key) else None,
+                        longitude=resolved[key][1] if resolved.get(key) else None,
+                        provider=backend.name,
+                    )
+                    for key in missing
+                ],
+                ignore_conflicts=True,
+            )
+            coordinates.update({key: resolved.get(key) for key in missing})
+        return coordinates
+
+    def geocode_pending_orders(self, batch_size: int = 500) -> tuple[int, int]:
+        """
+        Completa el destino de los pedidos que aún no lo tienen (nuevos, o cuya dirección cambió
+        y la señal pre_save borró el anterior), por lotes: una consulta de pedidos, una búsqueda
+        en lote de sus direcciones y un único UPDATE por lote.
+        :return: Tupla (pedidos geocodificados, pedidos cuya dirección no se encontró).
+        """
+        geocoded = 0
+        not_found = 0
+        last_id = 0
+        while True:
+            orders = list(
+                Order.objects
+                .filter(destination_latitude__isnull=True, id__gt=last_id)
+                .order_by("id")[:batch_size]
+            )
+            if not orders:
+                break
+            last_id = orders[-1].id
+
+            coordinates = self.geocode_addresses([order.delivery_address for order in orders])
+            found = []
+            for order in orders:
+                point = coordinates.get(normalize_address(order.delivery_address))
+                if point is None:
+                    not_found += 1
+                    continue
+                order.destination_latitude, order.destination_longitude = point
+                found.append(order)
+
+            with transaction.atomic():
+                Order.objects.bulk_update(found, ["destination_latitude", "destination_longitude"])
+                transaction.on_commit(lambda found=found: self._refresh_orders(found))
+            geocoded += len(found)
+        return geocoded, not_found
+
+    def reset_not_found(self) -> int:
+        """
+        Borra de la caché las direcciones no encontradas para que se vuelvan a consultar
+        (ej. tras cambiar de geocodificador).
+        :return: Cantidad de entradas borradas.
+        """
+        deleted, _ = GeocodedAddress.objects.filter(latitude__isnull=True).delete()
+        return deleted
+
+    def _refresh_orders(self, orders: list[Order]) -> None:
+        # bulk_update no emite señales: se reflejan aquí los nuevos destinos.
+        for order in orders:
+            self.position_cache.invalidate(order.order_id)
+            self.eta_service.refresh(order)
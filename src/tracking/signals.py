@@ -0,0 +1,88 @@
+"""
+Señales de la aplicación tracking.
+Invalidan la caché de última posición cuando un pedido cambia fuera de TrackingService
+(ej. cambio de estado desde el admin o eliminación), olvidan el estado del filtro de
+ingesta y de ETA de los pedidos, borran el destino de un pedido cuya dirección cambió,
+y mantienen al día el geohash y el índice espacial de los repartidores.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from tracking.cache import last_position_cache
+from tracking.eta import eta_service
+from tracking.geo import geohash_encode
+from tracking.geocoding import normalize_address
+from tracking.ingestion import location_ingestion_filter
+from tracking.models import DeliveryPerson, Order
+from tracking.spatial import driver_spatial_index
+
+
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_last_position(sender, instance, **kwargs):
+    last_position_cache.invalidate(instance.order_id)
+
+
+@receiver(post_delete, sender=Order)
+def forget_ingestion_state(sender, instance, **kwargs):
+    location_ingestion_filter.forget(instance.order_id)
+    eta_service.forget(instance.order_id)
+
+
+@receiver(post_save, sender=Order)
+def refresh_order_eta(sender, instance, **kwargs):
+    eta_service.refresh(instance)
+
+
+DESTINATION_FIELDS = ("delivery_address", "destination_latitude", "destination_longitude")
+
+
+@receiver(pre_save, sender=Order)
+def clear_stale_destination(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Si cambia delivery_address, las coordenadas de destino ya no le corresponden: se borran
+    para que `geocode_orders` resuelva la nueva dirección, salvo que se asignen junto con ella.
+    QuerySet.update() no pasa por aquí.
+    """
+    if raw or instance._state.adding or (update_fields is not None and "delivery_address" not in update_fields):
+        return
+    stored = getattr(instance, "_persisted_destination", None)
+    if stored is None:
+        stored = Order._base_manager.filter(pk=instance.pk).values_list(*DESTINATION_FIELDS).first()
+        if stored is None:
+            return
+    address, latitude, longitude = stored
+    if normalize_address(address) == normalize_address(instance.delivery_address):
+        return
+    if (instance.destination_latitude, instance.destination_longitude) != (latitude, longitude):
+        return
+    instance.destination_latitude = instance.destination_longitude = None
+    if update_fields is not None and not {"destination_latitude", "destination_longitude"} <= set(update_fields):
+        Order._base_manager.filter(pk=instance.pk).update(destination_latitude=None, destination_longitude=None)
+
+
+@receiver(post_save, sender=Order)
+def snapshot_destination(sender, instance, **kwargs):
+    if all(name in instance.__dict__ for name in DESTINATION_FIELDS):
+        instance._persisted_destination = tuple(instance.__dict__[name] for name in DESTINATION_FIELDS)
+    else:
+        instance.__dict__.pop("_persisted_destination", None)
+
+
+@receiver(pre_save, sender=DeliveryPerson)
+def refresh_driver_geohash(sender, instance, **kwargs):
+    if instance.current_latitude is None or instance.current_longitude is None:
+        instance.geohash = ""
+    else:
+        instance.geohash = geohash_encode(float(instance.current_latitude), float(instance.current_longitude))
+
+
+@receiver(post_save, sender=DeliveryPerson)
+def sync_driver_spatial_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: driver_spatial_index.sync_driver(instance))
+
+
+@receiver(post_delete, sender=DeliveryPerson)
+def remove_driver_from_spatial_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: driver_spatial_index.remove(instance.driver_id))
@@ -0,0 +1,199 @@
+"""
+Índice espacial en memoria de los repartidores disponibles.
+Agrupa a los repartidores en una grilla de celdas geohash para responder "los K más
+cercanos a un punto" revisando solo las celdas alrededor del punto, sin consultar la
+base de datos ni recorrer todos los repartidores.
+"""
+
+import heapq
+import math
+import threading
+from time import monotonic
+
+from django.conf import settings
+
+from tracking.geo import EARTH_RADIUS_METERS, geohash_cell_size, geohash_encode, haversine_meters
+from tracking.models import DeliveryPerson
+
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180
+
+
+class DriverSpatialIndex:
+    """
+    Grilla de repartidores disponibles con ubicación, indexada por el prefijo de
+    CELL_PRECISION caracteres de su geohash (celdas de ~1,2 x 0,6 km).
+    Se construye desde la base de datos la primera vez y cuando vence
+    TRACKING_DRIVER_INDEX_REFRESH_SECONDS (cambios hechos desde otros procesos); los cambios
+    de este proceso se aplican de forma incremental con upsert()/remove(); los que ocurren
+    mientras se lee la base de datos para reconstruir se vuelven a aplicar sobre el índice nuevo.
+    """
+    CELL_PRECISION = 6
+    # Tope de anillos por búsqueda (cerca de los polos la cota por anillo casi no crece).
+    MAX_RINGS = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cells = {}
+        self._drivers = {}
+        self._built_at = None
+        self._build_lock = threading.Lock()
+        self._changes_during_build = None
+        self._cell_height, self._cell_width = geohash_cell_size(self.CELL_PRECISION)
+
+    def upsert(self, driver_id: str, latitude: float, longitude: float) -> None:
+        """
+        Agrega o mueve a un repartidor disponible.
+        """
+        cell = geohash_encode(latitude, longitude, self.CELL_PRECISION)
+        with self._lock:
+            self._upsert_locked(driver_id, latitude, longitude, cell)
+            if self._changes_during_build is not None:
+                self._changes_during_build.append((driver_id, (latitude, longitude, cell)))
+
+    def remove(self, driver_id: str) -> None:
+        """
+        Quita a un repartidor (ej. dejó de estar disponible).
+        """
+        with self._lock:
+            self._remove_locked(driver_id)
+            if self._changes_during_build is not None:
+                self._changes_during_build.append((driver_id, None))
+
+    def sync_driver(self, driver: DeliveryPerson) -> None:
+        """
+        Refleja el estado guardado del repartidor: lo indexa si está disponible y tiene ubicación.
+        """
+        if driver.is_available and driver.current_latitude is not None and driver.current_longitude is not None:
+            self.upsert(driver.driver_id, float(driver.current_latitude), float(driver.current_longitude))
+        else:
+            self.remove(driver.driver_id)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def nearest(self, latitude: float, longitude: float, k: int,
+                max_distance_meters: float) -> list[tuple[str, float]]:
+        """
+        Busca los k repartidores disponibles más cercanos, recorriendo anillos de celdas
+        alrededor del punto hasta que ningún repartidor fuera de ellos pueda estar más cerca.
+        :return: Tuplas (driver_id, distancia en metros) ordenadas por distancia.
+        """
+        self._ensure_built()
+        best = []  # Max-heap de los k mejores como (-distancia, driver_id).
+        visited = set()
+        ring = 0
+        with self._lock:
+            remaining = len(self._drivers)
+            while remaining:
+                for cell in self._ring_cells(latitude, longitude, ring):
+                    if cell in visited:
+                        continue
+                    visited.add(cell)
+                    drivers = self._cells.get(cell)
+                    if not drivers:
+                        continue
+                    remaining -= len(drivers)
+                    for driver_id, (driver_lat, driver_lon) in drivers.items():
+                        distance = haversine_meters(latitude, longitude, driver_lat, driver_lon)
+                        if distance > max_distance_meters:
+                            continue
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, driver_id))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, driver_id))
+
+                # Cota inferior de la distancia a cualquier repartidor fuera de los anillos revisados.
+                bound = self._ring_bound(latitude, ring)
+                if bound > max_distance_meters or (len(best) == k and -best[0][0] <= bound):
+                    break
+                if ring >= self.MAX_RINGS:
+                    break
+                ring += 1
+        return sorted(((driver_id, -neg_distance) for neg_distance, driver_id in best), key=lambda item: item[1])
+
+    def __len__(self) -> int:
+        return len(self._drivers)
+
+    def _is_fresh(self) -> bool:
+        built_at = self._built_at
+        return built_at is not None and monotonic() - built_at <= settings.TRACKING_DRIVER_INDEX_REFRESH_SECONDS
+
+    def _ensure_built(self) -> None:
+        """
+        Reconstruye el índice desde la base de datos si venció. La lectura se hace fuera de
+        `_lock` para no bloquear las búsquedas; los upsert()/remove() de ese intervalo se
+        registran y se vuelven a aplicar sobre el índice nuevo antes de publicarlo.
+        """
+        if self._is_fresh():
+            return
+        with self._build_lock:
+            if self._is_fresh():
+                return  # Otro hilo lo reconstruyó mientras se esperaba.
+            with self._lock:
+                self._changes_during_build = []
+            try:
+                rows = (
+                    DeliveryPerson.objects
+                    .filter(is_available=True, current_latitude__isnull=False, current_longitude__isnull=False)
+                    .values_list("driver_id", "current_latitude", "current_longitude")
+                )
+                cells = {}
+                drivers = {}
+                for driver_id, latitude, longitude in rows.iterator(chunk_size=2000):
+                    cell = geohash_encode(float(latitude), float(longitude), self.CELL_PRECISION)
+                    drivers[driver_id] = cell
+                    cells.setdefault(cell, {})[driver_id] = (float(latitude), float(longitude))
+                with self._lock:
+                    self._cells = cells
+                    self._drivers = drivers
+                    for driver_id, position in self._changes_during_build:
+                        if position is None:
+                            self._remove_locked(driver_id)
+                        else:
+                            self._upsert_locked(driver_id, *position)
+                    self._built_at = monotonic()
+            finally:
+                with self._lock:
+                    self._changes_during_build = None
+
+    def _upsert_locked(self, driver_id: str, latitude: float, longitude: float, cell: str) -> None:
+        self._remove_locked(driver_id)
+        self._drivers[driver_id] = cell
+        self._cells.setdefault(cell, {})[driver_id] = (latitude, longitude)
+
+    def _remove_locked(self, driver_id: str) -> None:
+        cell = self._drivers.pop(driver_id, None)
+        if cell is None:
+            return
+        drivers = self._cells[cell]
+        drivers.pop(driver_id, None)
+        if not drivers:
+            del self._cells[cell]
+
+    def _ring_cells(self, latitude: float, longitude: float, ring: int):
+        for d_lat in range(-ring, ring + 1):
+            cell_lat = latitude + d_lat * self._cell_height
+            if not -90 <= cell_lat <= 90:
+                continue
+            # Borde superior e inferior completos; columnas laterales solo en los extremos.
+            step = 1 if abs(d_lat) == ring else 2 * ring
+            for d_lon in range(-ring, ring + 1, step):
+                cell_lon = (longitude + d_lon * self._cell_width + 180) % 360 - 180
+                yield geohash_encode(cell_lat, cell_lon, self.CELL_PRECISION)
+
+    def _ring_bound(self, latitude: float, ring: int) -> float:
+        """
+        Un punto fuera de los anillos 0..ring está al menos a `ring` celdas completas en
+        latitud o en longitud; el ancho en metros se toma en la latitud más extrema del área.
+        """
+        if ring == 0:
+            return 0.0
+        extreme_lat = min(90.0, abs(latitude) + (ring + 1) * self._cell_height)
+        height = ring * self._cell_height * _METERS_PER_DEGREE
+        width = ring * self._cell_width * _METERS_PER_DEGREE * math.cos(math.radians(extreme_lat))
+        return min(height, width)
+
+
+# Instancia compartida por el proceso; las señales de tracking.signals la mantienen al día.
+driver_spatial_index = DriverSpatialIndex()
@@ -1,3 +1,539 @@
-from django.test import TestCase
+import json
+import random
+import statistics
+import unittest
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tracking import analytics, cache as cache_module, spatial
+from tracking.cache import last_position_cache
+from tracking.eta import EtaService
+from tracking.geo import haversine_meters
+from tracking.geocoding import GeocoderBackend
+from tracking.ingestion import LocationIngestionFilter
+from tracking.models import DeliveryPerson, Order, OrderLocation, OrderLocationHistory
+from tracking.services import DriverLocationService, GeocodingService, LocationHistoryService, TrackingService
+from tracking.spatial import DriverSpatialIndex, driver_spatial_index
+from tracking.views import order_tracking_stream
+
+
+class DriverSpatialIndexTests(TestCase):
+    """
+    El índice debe devolver exactamente los mismos repartidores que recorrerlos a todos.
+    """
+    DRIVERS = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(16)
+        # Santiago y alrededores (~70 x 55 km), con un 10% de repartidores no disponibles.
+        DeliveryPerson.objects.bulk_create([
+            DeliveryPerson(
+                driver_id=f"D{i}",
+                name=f"Repartidor {i}",
+                current_latitude=Decimal(f"{rng.uniform(-33.75, -33.25):.6f}"),
+                current_longitude=Decimal(f"{rng.uniform(-70.95, -70.35):.6f}"),
+                is_available=rng.random() >= 0.1,
+            )
+            for i in range(cls.DRIVERS)
+        ], batch_size=2000)
+
+    def brute_force(self, latitude, longitude, k, max_distance_meters):
+        distances = sorted(
+            (haversine_meters(latitude, longitude, float(lat), float(lon)), driver_id)
+            for driver_id, lat, lon in DeliveryPerson.objects.filter(is_available=True)
+            .values_list("driver_id", "current_latitude", "current_longitude")
+        )
+        return [(driver_id, distance) for distance, driver_id in distances if distance <= max_distance_meters][:k]
+
+    def assert_same_drivers(self, found, expected):
+        self.assertEqual([driver_id for driver_id, _ in found], [driver_id for driver_id, _ in expected])
+        for (_, found_distance), (_, expected_distance) in zip(found, expected):
+            self.assertAlmostEqual(found_distance, expected_distance, places=6)
+
+    def test_nearest_matches_brute_force(self):
+        index = DriverSpatialIndex()
+        rng = random.Random(61)
+        for _ in range(25):
+            latitude, longitude = rng.uniform(-33.8, -33.2), rng.uniform(-71.0, -70.3)
+            k = rng.choice([1, 5, 20])
+            max_distance = rng.choice([500, 3000, 20000])
+            self.assert_same_drivers(index.nearest(latitude, longitude, k, max_distance),
+                                     self.brute_force(latitude, longitude, k, max_distance))
+
+    def test_far_from_every_driver(self):
+        self.assertEqual(DriverSpatialIndex().nearest(10.0, 10.0, 5, 20000), [])
+
+    def test_changes_during_rebuild_are_replayed(self):
+        index = DriverSpatialIndex()
+        removed = DeliveryPerson.objects.filter(is_available=True).order_by("pk").first()
+        encode = spatial.geohash_encode
+        changes = []
+
+        def encode_and_change(latitude, longitude, precision):
+            # Simula upsert()/remove() de otros hilos mientras se lee la base de datos.
+            if not changes:
+                changes.append(True)
+                index.upsert("NEW", -33.45, -70.65)
+                index.remove(removed.driver_id)
+            return encode(latitude, longitude, precision)
+
+        with mock.patch.object(spatial, "geohash_encode", side_effect=encode_and_change):
+            found = index.nearest(-33.45, -70.65, 1, 20000)
+
+        self.assertEqual(found[0][0], "NEW")
+        nearest_to_removed = index.nearest(float(removed.current_latitude), float(removed.current_longitude), 1, 20000)
+        self.assertNotEqual(nearest_to_removed[0][0], removed.driver_id)
+        self.assertEqual(len(index), DeliveryPerson.objects.filter(is_available=True).count())
+
+
+class LocationHistoryDownsampleTests(TestCase):
+    """
+    Un día se reduce una vez y se vuelve a reducir si recibe puntos después.
+    """
+
+    def setUp(self):
+        self.service = LocationHistoryService()
+        self.order = Order.objects.create(order_id="H1", delivery_address="Calle 1")
+        self.day_start = datetime(2026, 1, 10, 12, 0, tzinfo=dt_timezone.utc)
+        self.now = self.day_start + timedelta(days=3)
+
+    def record_every_five_seconds(self, count, offset_seconds=0):
+        self.service.record_points([
+            (self.order, Decimal("-33.4"), Decimal("-70.6"), self.day_start + timedelta(seconds=offset_seconds + 5 * i))
+            for i in range(count)
+        ])
+
+    def test_late_points_are_downsampled(self):
+        self.record_every_five_seconds(60)  # 5 minutos: 10 tramos de 30 s.
+        [partition] = self.service.downsample(now=self.now)
+        self.assertEqual((partition.points_before, partition.points_after), (60, 10))
+        self.assertEqual(self.service.downsample(now=self.now), [])
+
+        self.record_every_five_seconds(60, offset_seconds=3600)  # Llegan tarde, otra hora del mismo día.
+        [partition] = self.service.downsample(now=self.now)
+        self.assertEqual((partition.points_before, partition.points_after), (70, 20))
+        self.assertEqual(OrderLocationHistory.objects.filter(order=self.order).count(), 20)
+        self.assertEqual(self.service.downsample(now=self.now), [])
+
+
+@unittest.skipUnless(analytics.is_available(), "NumPy no está instalado")
+class ActiveOrderAnalyticsTests(TestCase):
+    """
+    El resumen vectorizado debe coincidir con el cálculo fila a fila.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(20)
+        drivers = DeliveryPerson.objects.bulk_create([
+            DeliveryPerson(driver_id=f"D{i}", name=f"Repartidor {i}") for i in range(5)
+        ])
+        orders = Order.objects.bulk_create([
+            Order(
+                order_id=f"A{i}",
+                delivery_address="Calle 1",
+                status="IN_TRANSIT" if i % 10 else "DELIVERED",
+                delivery_person=drivers[i % 6] if i % 6 < 5 else None,
+                destination_latitude=Decimal(f"{rng.uniform(-33.6, -33.3):.6f}") if i % 7 else None,
+                destination_longitude=Decimal(f"{rng.uniform(-70.8, -70.5):.6f}") if i % 7 else None,
+            )
+            for i in range(300)
+        ])
+        OrderLocation.objects.bulk_create([
+            OrderLocation(order=order, latitude=Decimal(f"{rng.uniform(-33.6, -33.3):.6f}"),
+                          longitude=Decimal(f"{rng.uniform(-70.8, -70.5):.6f}"))
+            for order in orders
+        ])
+
+    def test_summary_matches_row_by_row(self):
+        distances = {}
+        by_driver = {}
+        for location in OrderLocation.objects.select_related("order__delivery_person").filter(order__status="IN_TRANSIT"):
+            order = location.order
+            if order.destination_latitude is None:
+                continue
+            distance = haversine_meters(float(location.latitude), float(location.longitude),
+                                        float(order.destination_latitude), float(order.destination_longitude)) / 1000
+            distances[order.order_id] = distance
+            if order.delivery_person is not None:
+                by_driver.setdefault(order.delivery_person.driver_id, []).append(distance)
+
+        summary = analytics.summarize_active_orders(min_distance_km=15, limit=3)
+
+        self.assertEqual(summary["active_orders"], 270)
+        self.assertEqual(summary["with_destination"], len(distances))
+        self.assertAlmostEqual(summary["distance_km"]["mean"], statistics.mean(distances.values()), places=3)
+        self.assertAlmostEqual(summary["distance_km"]["max"], max(distances.values()), places=3)
+        far = sorted((distance, order_id) for order_id, distance in distances.items() if distance > 15)
+        self.assertEqual(summary["far_orders"]["count"], len(far))
+        self.assertEqual([item["order_id"] for item in summary["far_orders"]["orders"]],
+                         [order_id for _, order_id in sorted(far, reverse=True)[:3]])
+        top = sorted(by_driver.items(), key=lambda item: -statistics.mean(item[1]))[:3]
+        self.assertEqual([(item["driver_id"], item["orders"]) for item in summary["drivers"]],
+                         [(driver_id, len(values)) for driver_id, values in top])
+
+
+class LocationIngestionFilterTests(SimpleTestCase):
+    def setUp(self):
+        self.filter = LocationIngestionFilter(min_distance_meters=10, min_interval_seconds=2, max_staleness_seconds=60)
+        self.start = datetime(2026, 1, 10, 12, 0, tzinfo=dt_timezone.utc)
+
+    def accept(self, latitude, seconds):
+        return self.filter.accept("P1", Decimal(latitude), Decimal("-70.6"), self.start + timedelta(seconds=seconds))
+
+    def test_drops_redundant_pings(self):
+        self.assertTrue(self.accept("-33.400000", 0))
+        self.assertFalse(self.accept("-33.401000", 1))   # Antes del intervalo mínimo.
+        self.assertFalse(self.accept("-33.400050", 5))   # ~5,5 m: sin movimiento real.
+        self.assertTrue(self.accept("-33.401000", 6))    # ~111 m.
+        self.assertFalse(self.accept("-33.402000", 3))   # Más antiguo que el último aceptado.
+        self.assertTrue(self.accept("-33.401000", 70))   # Heartbeat aunque no se movió.
+        stats = self.filter.stats()
+        self.assertEqual(
+            {name: stats[name] for name in ("accepted", "heartbeats", "dropped_throttled", "dropped_duplicate",
+                                            "dropped_out_of_order", "writes_saved")},
+            {"accepted": 2, "heartbeats": 1, "dropped_throttled": 1, "dropped_duplicate": 1,
+             "dropped_out_of_order": 1, "writes_saved": 3},
+        )
+
+    def test_forget_accepts_the_next_ping(self):
+        self.assertTrue(self.accept("-33.400000", 0))
+        self.filter.forget("P1")
+        self.assertTrue(self.accept("-33.400000", 1))
+
+
+class OrderLocationBatchTests(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(order_id=f"B-{self._testMethodName}", delivery_address="Calle 1",
+                                          status="IN_TRANSIT")
+
+    def post_batch(self, points, **extra):
+        for point in points:
+            point.setdefault("order_id", self.order.order_id)
+            point["timestamp"] = point["timestamp"].isoformat()
+        response = self.client.post(reverse("order-location-batch-update"), {"points": points, **extra},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_older_point_does_not_replace_current_location(self):
+        now = timezone.now()
+        self.post_batch([{"latitude": "-33.40", "longitude": "-70.60", "timestamp": now - timedelta(minutes=1)}])
+        body = self.post_batch([{"latitude": "-33.50", "longitude": "-70.60", "timestamp": now - timedelta(minutes=10)}])
+        self.assertEqual(body["updated_orders"], [])
+        location = OrderLocation.objects.get(order=self.order)
+        self.assertEqual(location.latitude, Decimal("-33.400000"))
+
+    def test_device_clock_is_translated_to_server_clock(self):
+        device_now = timezone.now() - timedelta(hours=3)  # Reloj del dispositivo atrasado.
+        body = self.post_batch(
+            [{"latitude": "-33.40", "longitude": "-70.60", "timestamp": device_now - timedelta(seconds=30)}],
+            sent_at=device_now.isoformat(),
+        )
+        self.assertEqual(body["updated_orders"], [self.order.order_id])
+        age = timezone.now() - OrderLocation.objects.get(order=self.order).timestamp
+        self.assertTrue(timedelta(seconds=29) < age < timedelta(seconds=40), age)
+
+    def test_future_points_are_clamped_and_duplicates_dropped(self):
+        future = timezone.now() + timedelta(hours=1)
+        body = self.post_batch([
+            {"latitude": "-33.40", "longitude": "-70.60", "timestamp": future},
+            {"latitude": "-33.40", "longitude": "-70.60", "timestamp": future + timedelta(seconds=1)},
+            {"order_id": "missing", "latitude": "-33.40", "longitude": "-70.60", "timestamp": future},
+            {"latitude": "100", "longitude": "-70.60", "timestamp": future},
+        ])
+        self.assertEqual((body["updated_orders"], body["unknown_orders"], len(body["rejected"])),
+                         ([self.order.order_id], ["missing"], 1))
+        self.assertLessEqual(OrderLocation.objects.get(order=self.order).timestamp, timezone.now())
+        self.assertEqual(OrderLocationHistory.objects.filter(order=self.order).count(), 1)
+
+    def test_out_of_order_first_writes_keep_the_newer_point(self):
+        # Dos primeras escrituras del pedido (ej. concurrentes): la más antigua llega al final.
+        now = timezone.now()
+        newer = {"order_id": self.order.order_id, "latitude": Decimal("-33.40"), "longitude": Decimal("-70.60"),
+                 "timestamp": now}
+        older = {**newer, "latitude": Decimal("-33.50"), "timestamp": now - timedelta(minutes=5)}
+        service = TrackingService()
+        orders = {self.order.order_id: self.order}
+
+        self.assertEqual(list(service.write_order_locations(orders, {self.order.order_id: newer}, [newer])),
+                         [self.order.order_id])
+        self.assertEqual(service.write_order_locations(orders, {self.order.order_id: older}, [older]), {})
+        location = OrderLocation.objects.get(order=self.order)
+        self.assertEqual((location.latitude, location.timestamp), (Decimal("-33.400000"), now))
+        self.assertEqual(OrderLocationHistory.objects.filter(order=self.order).count(), 2)
+
+
+class StaticGeocoder(GeocoderBackend):
+    name = "static"
+
+    def __init__(self, coordinates):
+        self.coordinates = coordinates
+
+    def geocode_many(self, addresses):
+        return {address: self.coordinates.get(address) for address in addresses}
+
+
+class OrderDestinationTests(TestCase):
+    """
+    Cambiar la dirección de entrega borra el destino anterior para volver a geocodificarlo.
+    """
+
+    def setUp(self):
+        self.order = Order.objects.create(order_id="G1", delivery_address="Calle 1",
+                                          destination_latitude=Decimal("-33.400000"),
+                                          destination_longitude=Decimal("-70.600000"))
+
+    def destination(self):
+        return tuple(Order.objects.filter(pk=self.order.pk).values_list("destination_latitude", "destination_longitude").get())
+
+    def test_new_address_clears_the_destination_and_is_geocoded_again(self):
+        self.order.delivery_address = "  calle 1 "  # Misma dirección normalizada.
+        self.order.save()
+        self.assertEqual(self.destination(), (Decimal("-33.400000"), Decimal("-70.600000")))
+
+        order = Order.objects.get(pk=self.order.pk)
+        order.delivery_address = "Avenida 2"
+        order.save(update_fields=["delivery_address"])
+        self.assertEqual(self.destination(), (None, None))
+
+        backend = StaticGeocoder({"avenida 2": (Decimal("-33.5"), Decimal("-70.7"))})
+        self.assertEqual(GeocodingService(backend=backend).geocode_pending_orders(), (1, 0))
+        self.assertEqual(self.destination(), (Decimal("-33.500000"), Decimal("-70.700000")))
+
+    def test_coordinates_given_with_the_new_address_are_kept(self):
+        self.order.delivery_address = "Avenida 2"
+        self.order.destination_latitude, self.order.destination_longitude = Decimal("-33.5"), Decimal("-70.7")
+        self.order.save()
+        self.assertEqual(self.destination(), (Decimal("-33.500000"), Decimal("-70.700000")))
+
+
+class OrderTrackingCacheTests(TestCase):
+    """
+    GET /tracking/orders/<id>/ se sirve desde la caché de última posición con su ETag.
+    """
+
+    def setUp(self):
+        last_position_cache.clear()
+        self.addCleanup(last_position_cache.clear)
+        self.order = Order.objects.create(order_id="C1", delivery_address="Calle 1", status="IN_TRANSIT")
+        self.url = reverse("order-tracking", kwargs={"order_id": self.order.order_id})
+
+    def get(self, etag=None):
+        return self.client.get(self.url, headers={"If-None-Match": etag} if etag else {})
+
+    def write_location(self, latitude):
+        with self.captureOnCommitCallbacks(execute=True):
+            TrackingService().write_order_locations(
+                {self.order.order_id: self.order},
+                {self.order.order_id: {"latitude": Decimal(latitude), "longitude": Decimal("-70.6"), "timestamp": timezone.now()}},
+                [],
+            )
+
+    def test_cache_hit_and_not_modified(self):
+        etag = self.get()["ETag"]
+        with self.assertNumQueries(0):
+            response = self.get()
+            self.assertEqual((response.status_code, response["ETag"]), (200, etag))
+            response = self.get(etag)
+            self.assertEqual((response.status_code, response["ETag"]), (304, etag))
+
+    def test_status_and_location_changes_give_a_new_etag(self):
+        etag = self.get()["ETag"]
+
+        self.write_location("-33.40")
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["location"]["latitude"], "-33.400000")
+        self.assertNotEqual(response["ETag"], etag)
+        etag = response["ETag"]
+
+        self.order.status = "DELIVERED"
+        self.order.save()
+        response = self.get(etag)
+        self.assertEqual((response.status_code, response.json()["status"]), (200, "DELIVERED"))
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_update_that_skips_signals_is_seen_after_the_ttl(self):
+        etag = self.get()["ETag"]
+        Order.objects.filter(pk=self.order.pk).update(status="DELIVERED")
+        self.assertEqual(self.get(etag).status_code, 304)  # QuerySet.update() no invalida la caché.
+
+        later = cache_module.monotonic() + settings.TRACKING_POSITION_CACHE_TTL_SECONDS + 1
+        with mock.patch.object(cache_module, "monotonic", return_value=later):
+            response = self.get(etag)
+        self.assertEqual((response.status_code, response.json()["status"]), (200, "DELIVERED"))
+
+
+@override_settings(TRACKING_ETA_SPEED_WINDOW=5, TRACKING_ETA_DEFAULT_SPEED_MPS=6.0, TRACKING_ETA_MIN_SPEED_MPS=1.0)
+class EtaServiceTests(TestCase):
+    """
+    Estimaciones con instantes fijos: siembra desde el historial, pings que no avanzan y pedidos sin destino.
+    """
+    START = datetime(2026, 1, 10, 12, 0, tzinfo=dt_timezone.utc)
+    DESTINATION = (Decimal("-33.500000"), Decimal("-70.600000"))
+
+    def setUp(self):
+        self.eta = EtaService()
+        self.order = Order.objects.create(order_id="E1", delivery_address="Calle 1", status="IN_TRANSIT",
+                                          destination_latitude=self.DESTINATION[0],
+                                          destination_longitude=self.DESTINATION[1])
+
+    def at(self, seconds):
+        return self.START + timedelta(seconds=seconds)
+
+    def observe(self, latitude, seconds):
+        self.eta.observe(self.order, Decimal(latitude), Decimal("-70.6"), self.at(seconds))
+
+    def meters(self, from_latitude, to_latitude):
+        return haversine_meters(float(from_latitude), -70.6, float(to_latitude), -70.6)
+
+    def test_window_is_seeded_from_history(self):
+        LocationHistoryService().record_points([
+            (self.order, Decimal("-33.400"), Decimal("-70.6"), self.at(0)),
+            (self.order, Decimal("-33.405"), Decimal("-70.6"), self.at(60)),
+            (self.order, Decimal("-33.499"), Decimal("-70.6"), self.at(600)),  # Posterior al ping: no siembra.
+        ])
+        self.observe("-33.410", 120)
+
+        estimate = self.eta.get_estimate(self.order)
+        speed = self.meters("-33.400", "-33.410") / 120
+        distance = self.meters("-33.410", self.DESTINATION[0])
+        self.assertEqual(estimate["speed_mps"], round(speed, 2))
+        self.assertEqual(estimate["distance_meters"], round(distance))
+        self.assertEqual(estimate["eta_seconds"], round(distance / speed))
+        self.assertEqual(estimate["estimated_arrival"], self.at(120 + round(distance / speed)))
+
+    def test_pings_that_do_not_advance_are_ignored(self):
+        self.observe("-33.400", 0)
+        self.observe("-33.410", 100)
+        estimate = self.eta.get_estimate(self.order)
+
+        self.observe("-33.450", 50)   # Llegó tarde.
+        self.observe("-33.450", 100)  # Mismo instante que el último.
+        self.assertEqual(self.eta.get_estimate(self.order), estimate)
+
+        self.observe("-33.410", 200)  # Detenido: el tiempo avanza sin distancia y la velocidad baja.
+        self.assertEqual(self.eta.get_estimate(self.order)["speed_mps"], round(self.meters("-33.400", "-33.410") / 200, 2))
+
+    def test_no_destination_no_estimate_until_it_is_set(self):
+        Order.objects.filter(pk=self.order.pk).update(destination_latitude=None, destination_longitude=None)
+        self.order.refresh_from_db()
+        self.observe("-33.400", 0)
+        self.assertIsNone(self.eta.get_estimate(self.order))
+
+        self.order.destination_latitude, self.order.destination_longitude = self.DESTINATION
+        self.eta.refresh(self.order)
+        estimate = self.eta.get_estimate(self.order)
+        self.assertEqual(estimate["speed_mps"], 6.0)
+        self.assertEqual(estimate["distance_meters"], round(self.meters("-33.400", self.DESTINATION[0])))
+
+    def test_untracked_order_is_estimated_from_its_location_without_queries(self):
+        OrderLocation.objects.create(order=self.order, latitude=Decimal("-33.400000"), longitude=Decimal("-70.600000"),
+                                     timestamp=self.at(0))
+        order = Order.objects.select_related("location").get(pk=self.order.pk)
+        with self.assertNumQueries(0):
+            estimate = self.eta.get_estimate(order)
+        distance = self.meters("-33.400", self.DESTINATION[0])
+        self.assertEqual((estimate["speed_mps"], estimate["eta_seconds"]), (6.0, round(distance / 6.0)))
+
+        order.status = "DELIVERED"
+        self.assertIsNone(self.eta.get_estimate(order))
+
+
+class DriverLocationFanOutTests(TestCase):
+    """
+    Un ping del repartidor se escribe en todos sus pedidos en tránsito y actualiza el índice espacial.
+    """
+
+    def setUp(self):
+        driver_spatial_index.invalidate()
+        self.addCleanup(driver_spatial_index.invalidate)
+        self.driver = DeliveryPerson.objects.create(driver_id="F1", name="Repartidor", is_available=True)
+        other = DeliveryPerson.objects.create(driver_id="F2", name="Otro")
+        self.in_transit = [
+            Order.objects.create(order_id=f"F-{i}", delivery_address="Calle 1", status="IN_TRANSIT", delivery_person=self.driver)
+            for i in range(3)
+        ]
+        Order.objects.create(order_id="F-done", delivery_address="Calle 1", status="DELIVERED", delivery_person=self.driver)
+        Order.objects.create(order_id="F-other", delivery_address="Calle 1", status="IN_TRANSIT", delivery_person=other)
+        self.ingestion_filter = LocationIngestionFilter(min_distance_meters=10, min_interval_seconds=0, max_staleness_seconds=60)
+        self.service = DriverLocationService(tracking_service=TrackingService(ingestion_filter=self.ingestion_filter))
+
+    def test_position_reaches_only_in_transit_orders(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            driver, updated = self.service.update_driver_location("F1", Decimal("-33.45"), Decimal("-70.65"))
+
+        self.assertEqual(updated, ["F-0", "F-1", "F-2"])
+        self.assertEqual(set(OrderLocation.objects.values_list("order__order_id", flat=True)), {"F-0", "F-1", "F-2"})
+        self.assertEqual(OrderLocationHistory.objects.count(), 3)
+        self.assertEqual(OrderLocation.objects.filter(timestamp=driver.last_updated).count(), 3)
+        self.assertEqual(driver_spatial_index.nearest(-33.45, -70.65, 1, 100)[0][0], "F1")
+
+        # El filtro de ingesta se aplicó con la clave del repartidor, no con la de cada pedido.
+        _, updated = self.service.update_driver_location("F1", Decimal("-33.45"), Decimal("-70.65"))
+        self.assertIsNone(updated)
+        self.assertTrue(self.ingestion_filter.accept("F-0", Decimal("-33.45"), Decimal("-70.65"), timezone.now()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            _, updated = self.service.update_driver_location("F1", Decimal("-33.46"), Decimal("-70.65"))
+        self.assertEqual(updated, ["F-0", "F-1", "F-2"])
+        self.assertEqual(driver_spatial_index.nearest(-33.46, -70.65, 1, 100)[0][0], "F1")
+
+
+class OrderTrackingStreamTests(TestCase):
+    """
+    Canal SSE de un pedido: la posición actual primero y luego cada posición aceptada.
+    """
+
+    def setUp(self):
+        last_position_cache.clear()
+        self.addCleanup(last_position_cache.clear)
+        self.order = Order.objects.create(order_id="S1", delivery_address="Calle 1", status="IN_TRANSIT")
+        self.write_location("-33.40")
+        self.url = reverse("order-tracking-stream", kwargs={"order_id": self.order.order_id})
+
+    def write_location(self, latitude):
+        with self.captureOnCommitCallbacks(execute=True):
+            TrackingService().write_order_locations(
+                {self.order.order_id: self.order},
+                {self.order.order_id: {"latitude": Decimal(latitude), "longitude": Decimal("-70.6"), "timestamp": timezone.now()}},
+                [],
+            )
+
+    def parse(self, event):
+        event_id, data = event.decode().rstrip("\n").split("\n")
+        return int(event_id.removeprefix("id: ")), json.loads(data.removeprefix("data: "))
+
+    def test_requires_asgi(self):
+        self.assertEqual(self.client.get(self.url).status_code, 501)
+
+    async def test_unknown_order(self):
+        request = AsyncRequestFactory().get("/tracking/orders/nope/stream/")
+        response = await order_tracking_stream(request, "nope")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_current_position_then_accepted_updates(self):
+        response = await order_tracking_stream(AsyncRequestFactory().get(self.url), self.order.order_id)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        try:
+            first_version, data = self.parse(await anext(stream))
+            self.assertEqual(data["order_id"], "S1")
+            self.assertEqual(Decimal(str(data["location"]["latitude"])), Decimal("-33.40"))
+
+            await sync_to_async(self.write_location)("-33.41")
+            version, data = self.parse(await anext(stream))
+            self.assertGreater(version, first_version)
+            self.assertEqual(Decimal(str(data["location"]["latitude"])), Decimal("-33.41"))
+        finally:
+            await stream.aclose()
@@ -2,6 +2,13 @@ from django.urls import path
 from tracking.views import (
     OrderTrackingAPIView,
     OrderLocationUpdateAPIView,
+    OrderLocationBatchUpdateAPIView,
+    OrderRouteAPIView,
+    LocationIngestionStatsAPIView,
+    DriverLocationUpdateAPIView,
+    NearestDriversAPIView,
+    ActiveOrdersAnalyticsAPIView,
+    order_tracking_stream,
     tracking_demo_view
 )
 
@@ -11,6 +18,22 @@ urlpatterns = [
 
     # Actualizar ubicación del pedido (simulado por repartidor o backend)
     path('orders/<str:order_id>/update/', OrderLocationUpdateAPIView.as_view(), name='order-location-update'),
+
+    # Posición del pedido en tiempo real (Server-Sent Events, requiere ASGI)
+    path('orders/<str:order_id>/stream/', order_tracking_stream, name='order-tracking-stream'),
+
+    # Ruta histórica del pedido (Encoded Polyline)
+    path('orders/<str:order_id>/route/', OrderRouteAPIView.as_view(), name='order-route'),
+
+    # Carga masiva de ubicaciones de varios pedidos (pings acumulados por la app del repartidor)
+    path('locations/batch/', OrderLocationBatchUpdateAPIView.as_view(), name='order-location-batch-update'),
+    # Contadores del filtro de ingesta (pings descartados por redundantes)
+    path('locations/ingestion-stats/', LocationIngestionStatsAPIView.as_view(), name='location-ingestion-stats'),
+    # Repartidores: posición actual y búsqueda de los disponibles más cercanos a un punto
+    path('drivers/nearest/', NearestDriversAPIView.as_view(), name='nearest-drivers'),
+    path('drivers/<str:driver_id>/location/', DriverLocationUpdateAPIView.as_view(), name='driver-location-update'),
+    # Panel de operaciones (solo staff): distancias y agregados de los pedidos en tránsito
+    path('ops/analytics/', ActiveOrdersAnalyticsAPIView.as_view(), name='tracking-ops-analytics'),
     path("demo/", tracking_demo_view, name="tracking-demo"),
 
 ]
@@ -1,30 +1,51 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 
 
-from tracking.services import TrackingService
+from tracking import analytics
+from tracking.services import DriverLocationService, TrackingBroadcastService, TrackingService
 from tracking.serializers import (
+    ActiveOrdersAnalyticsQuerySerializer,
+    DriverLocationUpdateSerializer,
+    NearestDriverSerializer,
+    NearestDriversQuerySerializer,
     OrderTrackingSerializer,
-    OrderLocationUpdateSerializer
+    OrderLocationUpdateSerializer,
+    OrderLocationBatchSerializer,
+    OrderLocationPointSerializer
 )
 from tracking.models import Order
+from tracking.polyline import iter_encoded_polyline
 
 
 class OrderTrackingAPIView(APIView):
     """
     GET /tracking/<order_id>/
     Devuelve la ubicación actual del pedido.
+    Responde 304 si el ETag enviado en If-None-Match sigue vigente.
     """
     service = TrackingService()
 
     def get(self, request, order_id):
         try:
-            order = self.service.get_order_tracking_info(order_id)
+            order, etag = self.service.get_order_tracking_info(order_id)
+            if request.headers.get("If-None-Match") == etag:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
             serializer = OrderTrackingSerializer(order)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(serializer.data, status=status.HTTP_200_OK, headers={"ETag": etag})
         except Order.DoesNotExist:
             return Response({"detail": "Pedido no encontrado."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -47,11 +68,13 @@ class OrderLocationUpdateAPIView(APIView):
             latitude = serializer.validated_data["latitude"]
             longitude = serializer.validated_data["longitude"]
 
-            location = self.service.update_order_location(order_id, latitude, longitude)
+            location, written = self.service.update_order_location(order_id, latitude, longitude)
 
             return Response(
                 {
-                    "message": "Ubicación del pedido actualizada correctamente.",
+                    "message": ("Ubicación del pedido actualizada correctamente." if written
+                                else "Ubicación sin cambios relevantes; se conserva la última registrada."),
+                    "written": written,
                     "location": {
                         "latitude": str(location.latitude),
                         "longitude": str(location.longitude),
@@ -65,5 +88,239 @@ class OrderLocationUpdateAPIView(APIView):
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class OrderLocationBatchUpdateAPIView(APIView):
+    """
+    POST /tracking/locations/batch/
+    Recibe muchas ubicaciones en una sola solicitud:
+    {"points": [{order_id, latitude, longitude, timestamp}, ...], "sent_at": <opcional>}.
+    Aplica los puntos válidos y reporta los inválidos y los pedidos inexistentes.
+    """
+    service = TrackingService()
+
+    def post(self, request):
+        batch_serializer = OrderLocationBatchSerializer(data=request.data)
+        if not batch_serializer.is_valid():
+            return Response(batch_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        valid_points = []
+        rejected = []
+        for index, raw_point in enumerate(batch_serializer.validated_data["points"]):
+            point_serializer = OrderLocationPointSerializer(data=raw_point)
+            if point_serializer.is_valid():
+                valid_points.append(point_serializer.validated_data)
+            else:
+                rejected.append({"index": index, "errors": point_serializer.errors})
+
+        result = {"updated": [], "unchanged": [], "unknown": []}
+        if valid_points:
+            result = self.service.bulk_update_order_locations(
+                valid_points, sent_at=batch_serializer.validated_data.get("sent_at"),
+            )
+
+        return Response(
+            {
+                "message": "Ubicaciones procesadas.",
+                "received": len(batch_serializer.validated_data["points"]),
+                "updated_orders": result["updated"],
+                "unchanged_orders": result["unchanged"],
+                "unknown_orders": result["unknown"],
+                "rejected": rejected,
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class LocationIngestionStatsAPIView(APIView):
+    """
+    GET /tracking/locations/ingestion-stats/
+    Contadores del filtro de ingesta de este proceso: pings aceptados, heartbeats
+    y escrituras ahorradas por descartar pings redundantes.
+    """
+    service = TrackingService()
+
+    def get(self, request):
+        return Response(self.service.ingestion_filter.stats(), status=status.HTTP_200_OK)
+
+
+class DriverLocationUpdateAPIView(APIView):
+    """
+    POST /tracking/drivers/<driver_id>/location/
+    Actualiza la posición actual del repartidor (y su geohash) y la de todos sus
+    pedidos en tránsito.
+    """
+    service = DriverLocationService()
+
+    def post(self, request, driver_id):
+        serializer = DriverLocationUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        driver, updated_orders = self.service.update_driver_location(
+            driver_id, serializer.validated_data["latitude"], serializer.validated_data["longitude"]
+        )
+        written = updated_orders is not None
+
+        return Response(
+            {
+                "message": ("Ubicación del repartidor actualizada correctamente." if written
+                            else "Ubicación sin cambios relevantes; se conserva la última registrada."),
+                "written": written,
+                "updated_orders": updated_orders or [],
+                "location": {
+                    "latitude": str(driver.current_latitude),
+                    "longitude": str(driver.current_longitude),
+                    "timestamp": driver.last_updated,
+                },
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class NearestDriversAPIView(APIView):
+    """
+    GET /tracking/drivers/nearest/?latitude=<lat>&longitude=<lon>&k=<n>&max_distance=<metros>
+    Devuelve los k repartidores disponibles más cercanos al punto, ordenados por distancia.
+    """
+    service = DriverLocationService()
+
+    def get(self, request):
+        query = NearestDriversQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = query.validated_data
+        drivers = self.service.find_nearest_available_drivers(
+            params["latitude"], params["longitude"], params["k"], params.get("max_distance")
+        )
+        return Response(NearestDriverSerializer(drivers, many=True).data, status=status.HTTP_200_OK)
+
+
+class ActiveOrdersAnalyticsAPIView(APIView):
+    """
+    GET /tracking/ops/analytics/?min_distance_km=<km>&limit=<n>
+    Panel de operaciones: distancia al destino de los pedidos en tránsito, los que están
+    a más de min_distance_km y la distancia promedio por repartidor. Requiere NumPy.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        if not analytics.is_available():
+            return Response({"detail": "La analítica de seguimiento requiere NumPy instalado."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        query = ActiveOrdersAnalyticsQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        started_at = time.perf_counter()
+        summary = analytics.summarize_active_orders(**query.validated_data)
+        summary["computed_in_ms"] = round((time.perf_counter() - started_at) * 1000, 1)
+        return Response(summary, status=status.HTTP_200_OK)
+
+
+class OrderRouteAPIView(APIView):
+    """
+    GET /tracking/orders/<order_id>/route/?start=<ISO 8601>&end=<ISO 8601>
+    Transmite la ruta histórica del pedido como Encoded Polyline (precisión 6),
+    codificada y enviada por bloques sin cargar la ruta completa en memoria.
+    """
+    service = TrackingService()
+    POLYLINE_PRECISION = 6
+
+    def get(self, request, order_id):
+        order = get_object_or_404(Order, order_id=order_id)
+
+        bounds = {}
+        for name in ("start", "end"):
+            value = request.query_params.get(name)
+            if value is None:
+                continue
+            try:
+                bounds[name] = parse_datetime(value)
+            except ValueError:
+                bounds[name] = None
+            if bounds[name] is None:
+                return Response({"detail": f"El parámetro {name} debe ser una fecha ISO 8601."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        points = self.service.history_service.iter_route(order, **bounds)
+        return StreamingHttpResponse(
+            self._stream(order.order_id, points), content_type="application/json"
+        )
+
+    def _stream(self, order_id, points):
+        yield '{"order_id": %s, "precision": %d, "polyline": "' % (json.dumps(order_id), self.POLYLINE_PRECISION)
+        buffer = []
+        for chunk in iter_encoded_polyline(points, self.POLYLINE_PRECISION):
+            buffer.append(chunk)
+            if len(buffer) >= 500:
+                # La codificación usa '\\', que debe escaparse dentro de un string JSON.
+                yield "".join(buffer).replace("\\", "\\\\")
+                buffer = []
+        yield "".join(buffer).replace("\\", "\\\\") + '"}'
+
+
+# Segundos sin eventos tras los que se envía un comentario SSE para mantener viva la conexión.
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _format_sse_event(event: dict) -> str:
+    return f"id: {event['version']}\ndata: {json.dumps(event['data'], cls=DjangoJSONEncoder)}\n\n"
+
+
+async def _tracking_event_stream(subscription, initial_event: dict):
+    """
+    Genera los eventos SSE de un pedido: primero su posición actual y luego, sin consultar
+    la base de datos, las que se publiquen en el canal del pedido.
+    """
+    try:
+        yield _format_sse_event(initial_event)
+        last_version = initial_event["version"]
+
+        while True:
+            try:
+                event = await asyncio.wait_for(anext(subscription), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event["version"] < last_version:
+                continue
+            yield _format_sse_event(event)
+            last_version = event["version"]
+    finally:
+        subscription.close()
+
+
+async def order_tracking_stream(request, order_id):
+    """
+    GET /tracking/orders/<order_id>/stream/
+    Envía la posición del pedido en tiempo real como Server-Sent Events: un evento
+    inicial con la posición actual y uno por cada actualización aceptada.
+    Solo funciona servido por ASGI (ej. `uvicorn project.asgi:application`).
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "El canal en tiempo real requiere un servidor ASGI."},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    broadcast_service = TrackingBroadcastService()
+    # Suscribirse antes de leer la posición actual para no perder actualizaciones entre ambas fases.
+    subscription = broadcast_service.get_backend().subscribe(broadcast_service.channel_for_order(order_id))
+    try:
+        order, _ = await sync_to_async(TrackingService().get_order_tracking_info)(order_id)
+        initial_event = await sync_to_async(TrackingBroadcastService.build_event)(order)
+    except Http404:
+        subscription.close()
+        return JsonResponse({"detail": "Pedido no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception:
+        subscription.close()
+        raise
+
+    response = StreamingHttpResponse(_tracking_event_stream(subscription, initial_event),
+                                     content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 def tracking_demo_view(request):
     return render(request, "tracking/tracking.html")
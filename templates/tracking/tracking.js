@@ -56,43 +56,81 @@ function animateMarker(oldLatLng, newLatLng, duration = 800) {
     requestAnimationFrame(frame);
 }
 
-// --- Función principal ---
-async function fetchLocation() {
-    try {
-        const res = await fetch(API_URL);
-        const data = await res.json();
+// ETag de la última respuesta: si la posición no cambió, el servidor responde 304 sin cuerpo
+let lastEtag = null;
+
+// --- Dibujo de la posición recibida (por sondeo o en tiempo real) ---
+function applyTracking(data) {
+    // Actualizar estado visualmente
+    updateStatusColor(data.status);
 
-        // Actualizar estado visualmente
-        updateStatusColor(data.status);
+    if (!data.location) return;
 
-        if (!data.location) return;
+    const lat = parseFloat(data.location.latitude);
+    const lng = parseFloat(data.location.longitude);
+    const newLatLng = L.latLng(lat, lng);
+    const oldLatLng = marker.getLatLng();
 
-        const lat = parseFloat(data.location.latitude);
-        const lng = parseFloat(data.location.longitude);
-        const newLatLng = L.latLng(lat, lng);
-        const oldLatLng = marker.getLatLng();
+    // Animación del marcador
+    animateMarker(oldLatLng, newLatLng);
 
-        // Animación del marcador
-        animateMarker(oldLatLng, newLatLng);
+    // Animación del mapa hacia la nueva posición
+    map.flyTo(newLatLng, map.getZoom(), { duration: 0.6 });
 
-        // Animación del mapa hacia la nueva posición
-        map.flyTo(newLatLng, map.getZoom(), { duration: 0.6 });
+    // Agregar punto a la ruta
+    routePoints.push(newLatLng);
+    routeLine.setLatLngs(routePoints);
 
-        // Agregar punto a la ruta
-        routePoints.push(newLatLng);
-        routeLine.setLatLngs(routePoints);
+    // Actualizar timestamp
+    document.getElementById("timestamp").innerText =
+        data.location.timestamp || "-";
 
-        // Actualizar timestamp
-        document.getElementById("timestamp").innerText =
-            data.location.timestamp || "-";
+    // Llegada estimada (minutos restantes y distancia al destino)
+    document.getElementById("eta").innerText = data.eta
+        ? `${Math.max(1, Math.round(data.eta.eta_seconds / 60))} min (${(data.eta.distance_meters / 1000).toFixed(1)} km)`
+        : "-";
+}
 
+// --- Sondeo periódico (respaldo si no hay canal en tiempo real) ---
+async function fetchLocation() {
+    try {
+        const headers = lastEtag ? { "If-None-Match": lastEtag } : {};
+        const res = await fetch(API_URL, { headers, cache: "no-store" });
+        if (res.status === 304 || !res.ok) return;
+        lastEtag = res.headers.get("ETag");
+        applyTracking(await res.json());
     } catch (error) {
         console.error("Error obteniendo ubicación:", error);
     }
 }
 
-// Primera carga
-fetchLocation();
+let pollTimer = null;
+
+function startPolling() {
+    if (pollTimer) return;
+    fetchLocation();
+    // Actualizar cada 5 segundos
+    pollTimer = setInterval(fetchLocation, 5000);
+}
+
+// --- Canal en tiempo real (SSE); si el servidor no lo soporta se vuelve al sondeo ---
+function startStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const source = new EventSource(API_URL + "stream/");
+    let opened = false;
+
+    source.onopen = () => { opened = true; };
+    source.onmessage = (event) => applyTracking(JSON.parse(event.data));
+    source.onerror = () => {
+        // Si nunca se abrió (ej. servidor WSGI) o el navegador dejó de reintentar, sondear.
+        if (!opened || source.readyState === EventSource.CLOSED) {
+            source.close();
+            startPolling();
+        }
+    };
+}
 
-// Actualizar cada 5 segundos
-setInterval(fetchLocation, 5000);
+startStream();